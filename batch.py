@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import sys
+import json
+import time
+import random
+import asyncio
+
+BATCH_CONCURRENCY = 8
+JOB_TIMEOUT = 120
+JOB_RETRIES = 2
+RETRY_BACKOFF = 2.0
+
+def read_jobs(path):
+    """One job per line from a file, or from stdin when path is '-'; blank lines and # comments are skipped"""
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+def write_record(record, out=None):
+    out = out or sys.stdout
+    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    out.flush()
+
+async def run_job(job, run, timeout, retries, backoff):
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            results = await asyncio.wait_for(run(job), timeout)
+            return {'job': job, 'ok': True, 'attempts': attempt,
+                    'seconds': round(time.perf_counter() - start, 3), 'results': results}
+        except Exception as e:
+            if attempt > retries:
+                error = 'timed out' if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                return {'job': job, 'ok': False, 'attempts': attempt,
+                        'seconds': round(time.perf_counter() - start, 3), 'error': error}
+            # Exponential backoff with some jitter so retries don't line up
+            await asyncio.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+async def run_batch(jobs, run, concurrency=BATCH_CONCURRENCY, timeout=JOB_TIMEOUT, retries=JOB_RETRIES,
+                    backoff=RETRY_BACKOFF, out=None, on_record=None):
+    """Run run(job) for every job with at most `concurrency` in flight
+
+    Every finished job is written out as one NDJSON line right away, in
+    completion order, and passed to on_record() if given. Returns
+    (succeeded, failed) counts.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(job):
+        async with semaphore:
+            return await run_job(job, run, timeout, retries, backoff)
+
+    succeeded = failed = 0
+    for finished in asyncio.as_completed([limited(job) for job in jobs]):
+        record = await finished
+        write_record(record, out)
+        if on_record:
+            on_record(record)
+        if record['ok']:
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+def add_batch_arguments(parser):
+    parser.add_argument('--batch', metavar='FILE', help="Run one job per line of FILE ('-' for stdin), NDJSON output")
+    parser.add_argument('--jobs', type=int, default=BATCH_CONCURRENCY, help='Batch jobs running at the same time')
+    parser.add_argument('--timeout', type=float, default=JOB_TIMEOUT, help='Seconds before a batch job is given up')
+    parser.add_argument('--retries', type=int, default=JOB_RETRIES, help='Retries for a failed batch job')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Compare per-handle vs batched extraction of eBay result cards on a saved page"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from playwright.async_api import async_playwright, Page, ElementHandle
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ebay_search import extract_items, extract_items_batched  # noqa: E402
+
+FIXTURE = ROOT / 'fixtures' / 'ebay_results.html'
+
+# Every call on these goes over CDP to the browser and back
+ROUND_TRIP_METHODS = {
+    Page: ['evaluate', 'query_selector_all', 'eval_on_selector_all'],
+    ElementHandle: ['evaluate', 'query_selector'],
+}
+round_trips = 0
+
+def count_round_trips():
+    def counted(func):
+        async def wrapper(*args, **kwargs):
+            global round_trips
+            round_trips += 1
+            return await func(*args, **kwargs)
+        return wrapper
+
+    for cls, names in ROUND_TRIP_METHODS.items():
+        for name in names:
+            setattr(cls, name, counted(getattr(cls, name)))
+
+async def measure(page, extractor, max_results, repeat):
+    global round_trips
+    round_trips = 0
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = await extractor(page, max_results)
+        timings.append(time.perf_counter() - start)
+    return results, round_trips // repeat, min(timings), sum(timings) / len(timings)
+
+async def main(max_results, repeat):
+    count_round_trips()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.goto(FIXTURE.as_uri())
+
+        rows = []
+        outputs = {}
+        for name, extractor in [('per-handle', extract_items), ('batched', extract_items_batched)]:
+            results, trips, best, mean = await measure(page, extractor, max_results, repeat)
+            outputs[name] = results
+            rows.append((name, len(results), trips, best, mean))
+
+        await browser.close()
+
+    print(f"{'path':<12} {'rows':>5} {'round trips':>12} {'best ms':>9} {'mean ms':>9}")
+    for name, count, trips, best, mean in rows:
+        print(f"{name:<12} {count:>5} {trips:>12} {best * 1000:>9.1f} {mean * 1000:>9.1f}")
+
+    if outputs['per-handle'] != outputs['batched']:
+        print("WARNING: batched and per-handle results differ")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='eBay extraction benchmark')
+    parser.add_argument('--max', type=int, default=200, help='Max number of results')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per extraction path')
+    args = parser.parse_args()
+    asyncio.run(main(args.max, args.repeat))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare the old replace() chain with the locale-aware price parser on a price corpus
+
+Every corpus line is checked first (the run fails on a wrong value), then
+the corpus times --copies is parsed by the old chain, by the parser without
+its cache and by the cached bulk path the scrapers use. The same is timed
+for the prices of the saved result pages, which is what the scrapers see
+(the corpus is mostly edge cases).
+"""
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from prices import parse_price, parse_prices, parse_shipping  # noqa: E402
+
+FIXTURE = ROOT / 'fixtures' / 'price_strings.tsv'
+# Saved result page -> pattern of its price elements
+RESULT_PAGES = {
+    'ebay_results.html': re.compile(r'class="s-item__price"[^>]*>(.*?)</span>'),
+    'amazon_results.html': re.compile(r'class="a-offscreen"[^>]*>(.*?)</span>'),
+}
+TAG_RE = re.compile(r'<[^>]+>')
+
+def load_corpus(path=FIXTURE):
+    """(kind, text, min, max, currency) per line; empty columns are None"""
+    corpus = []
+    for line in path.read_text(encoding='utf-8').splitlines():
+        if not line or line.startswith('#'):
+            continue
+        kind, text, low, high, currency = (line.split('\t') + [''] * 5)[:5]
+        text = text.encode('ascii', 'backslashreplace').decode('unicode_escape')
+        corpus.append((kind, text, float(low) if low else None, float(high) if high else None, currency or None))
+    return corpus
+
+def page_prices():
+    """Price strings of the saved result pages"""
+    texts = []
+    for filename, pattern in RESULT_PAGES.items():
+        html = (ROOT / 'fixtures' / filename).read_text(encoding='utf-8')
+        texts += [TAG_RE.sub('', text) for text in pattern.findall(html)]
+    return texts
+
+def old_parse_price(price_text):
+    """The parsing sites.py used before, kept here as the baseline"""
+    clean_price = price_text.replace('EUR', '').replace('€', '').replace(',', '.').replace(' ', '')
+    if 'bis' in clean_price:
+        clean_price = clean_price.split('bis')[0].strip()
+    try:
+        return float(clean_price)
+    except ValueError:
+        return 0.0
+
+def check(corpus):
+    """Lines whose parsed value differs from the expected one"""
+    wrong = []
+    for kind, text, low, high, currency in corpus:
+        if kind == 'shipping':
+            got, expected = parse_shipping(text), low
+        else:
+            got, expected = tuple(parse_price(text)), (low, high, currency)
+        if got != expected:
+            wrong.append(f"{kind} {text!r}: {got} != {expected}")
+    return wrong
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+def main(copies, repeat):
+    corpus = load_corpus()
+    wrong = check(corpus)
+    for line in wrong:
+        print(f"WRONG: {line}")
+
+    strings = [text for kind, text, *_ in corpus if kind == 'price']
+    old_right = sum(old_parse_price(text) == (low or 0.0) for kind, text, low, *_ in corpus if kind == 'price')
+    print(f"{len(corpus) - len(wrong)}/{len(corpus)} corpus lines right "
+          f"(old chain: {old_right}/{len(strings)} prices)")
+
+    for label, unique in (('corpus', strings), ('result pages', page_prices())):
+        texts = unique * copies
+        paths = [
+            ('replace chain', lambda: [old_parse_price(text) for text in texts]),
+            ('parser', lambda: [parse_price.__wrapped__(text) for text in texts]),
+            ('parser, cached', lambda: parse_prices(texts)),
+        ]
+        print(f"\n{label}: {len(texts)} prices ({len(unique)} strings x {copies})")
+        print(f"{'path':<16} {'best ms':>9} {'mean ms':>9} {'us/price':>9}")
+        for name, func in paths:
+            best, mean = measure(func, repeat)
+            print(f"{name:<16} {best * 1000:>9.2f} {mean * 1000:>9.2f} {best / len(texts) * 1e6:>9.2f}")
+
+    if wrong:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Price parser benchmark')
+    parser.add_argument('--copies', type=int, default=2000, help='Copies of the corpus prices per run')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per path')
+    args = parser.parse_args()
+    main(args.copies, args.repeat)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Time-to-first-card and bytes loaded per route profile against the fixture server"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from playwright.async_api import async_playwright
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from routing import apply_profile, ROUTE_PROFILES  # noqa: E402
+from fixture_server import serve  # noqa: E402
+
+PAGES = {
+    'ebay': ('/sch/i.html?_nkw=nintendo+switch', '.s-item'),
+    'amazon': ('/s?k=powerbank', '.s-result-item'),
+}
+
+async def measure(browser, url, selector, profile):
+    context = await browser.new_context()
+    stats = await apply_profile(context, profile)
+    page = await context.new_page()
+
+    start = time.perf_counter()
+    await page.goto(url, wait_until='commit')
+    await page.wait_for_selector(selector)
+    first_card = time.perf_counter() - start
+    await page.wait_for_load_state('load')
+    loaded = time.perf_counter() - start
+
+    await context.close()
+    return first_card, loaded, stats
+
+async def main(repeat, delay):
+    server, base_url = serve(delay=delay)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        print(f"{'site':<7} {'profile':<10} {'first card ms':>14} {'load ms':>9} {'requests':>9} {'KiB loaded':>11} {'blocked':>8}")
+        for site, (path, selector) in PAGES.items():
+            for profile in ROUTE_PROFILES:
+                runs = [await measure(browser, base_url + path, selector, profile) for _ in range(repeat)]
+                first_card = sorted(r[0] for r in runs)[len(runs) // 2]
+                loaded = sorted(r[1] for r in runs)[len(runs) // 2]
+                stats = runs[-1][2]
+                print(f"{site:<7} {profile:<10} {first_card * 1000:>14.1f} {loaded * 1000:>9.1f} {stats.requests:>9} "
+                      f"{stats.bytes_loaded / 1024:>11.0f} {sum(stats.blocked.values()):>8}")
+        await browser.close()
+    server.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Route profile benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per site and profile (median is reported)')
+    parser.add_argument('--delay', type=float, default=0.02, help='Seconds the fixture server waits per request')
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat, args.delay))
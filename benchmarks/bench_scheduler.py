@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Block detection, circuit breaking and adaptive rate of the scheduler against the fixture server
+
+Has the fixture server answer like a site that blocks us and checks that a
+search fails in milliseconds instead of waiting out the card timeout, that
+the next one fails without a request while the circuit is open, that a
+probe after the backoff closes it again, and how fast pages go out once
+the rate has adapted:
+
+    python benchmarks/bench_scheduler.py --searches 5
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Open circuits of benchmark runs must not end up in the real cache
+os.environ['PLAYWRIGHT_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench-cache-')
+
+import scraper  # noqa: E402
+from sites import EBAY  # noqa: E402
+from readiness import FIRST_CARD_TIMEOUT  # noqa: E402
+from scheduler import SCHEDULER, Blocked, CircuitOpen  # noqa: E402
+from fixture_server import serve, FIXTURE_PAGES  # noqa: E402
+
+QUERY = 'nintendo switch'
+
+async def timed_search(browser, base_url, pages=None):
+    """(seconds, results or the Blocked error)"""
+    start = time.perf_counter()
+    try:
+        results = await scraper.search(EBAY, QUERY, 20, browser, base_url=base_url, route_profile='full', pages=pages)
+    except Blocked as e:
+        return time.perf_counter() - start, e
+    return time.perf_counter() - start, results
+
+async def main(args):
+    scraper.console.quiet = True
+    SCHEDULER.backoff = args.backoff
+    server, base_url = serve(delay=args.delay, block='page')
+    handler = server.RequestHandlerClass
+    rows, failures = [], []
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        try:
+            # What a robot check page used to cost: the full card timeout
+            page = await browser.new_page()
+            start = time.perf_counter()
+            await page.goto(EBAY.search_url(QUERY, base_url=base_url))
+            try:
+                await page.wait_for_selector(EBAY.ready_selector, state='attached', timeout=args.timeout)
+            except PlaywrightTimeoutError:
+                pass
+            rows.append(('robot check, waiting for cards', time.perf_counter() - start))
+            await page.close()
+
+            seconds, outcome = await timed_search(browser, base_url)
+            rows.append(('robot check page, detected', seconds))
+            if not isinstance(outcome, Blocked) or isinstance(outcome, CircuitOpen):
+                failures.append(f"robot check page gave {outcome!r}")
+
+            requests = handler.requests
+            seconds, outcome = await timed_search(browser, base_url)
+            rows.append(('circuit open', seconds))
+            if not isinstance(outcome, CircuitOpen) or handler.requests != requests:
+                failures.append(f"search while the circuit is open gave {outcome!r} "
+                                f"after {handler.requests - requests} requests")
+
+            # localhost is a domain of its own, with a circuit of its own
+            handler.block = 'status'
+            seconds, outcome = await timed_search(browser, base_url.replace('127.0.0.1', 'localhost'))
+            rows.append(('503 with Retry-After', seconds))
+            if not isinstance(outcome, Blocked) or outcome.retry_after is None:
+                failures.append(f"503 gave {outcome!r}")
+
+            # After the backoff one probe goes out and closes the circuit
+            handler.block = None
+            await asyncio.sleep(args.backoff)
+            seconds, outcome = await timed_search(browser, base_url)
+            rows.append(('probe after the backoff', seconds))
+            if isinstance(outcome, Exception) or SCHEDULER.domain(base_url).opened:
+                failures.append(f"probe after the backoff gave {outcome!r}")
+
+            # Sustained: every page of a few ranked searches, rate adapting as they go
+            requests = handler.requests
+            start = time.perf_counter()
+            for _ in range(args.searches):
+                await timed_search(browser, base_url, pages=FIXTURE_PAGES)
+            sustained = time.perf_counter() - start
+            pages_per_second = (handler.requests - requests) / sustained
+        finally:
+            await browser.close()
+            server.shutdown()
+
+    print(f"{'case':<34} {'seconds':>8}")
+    for name, seconds in rows:
+        print(f"{name:<34} {seconds:>8.3f}")
+    print(f"{args.searches} searches of {FIXTURE_PAGES} pages: {pages_per_second:.1f} pages/s, "
+          f"{SCHEDULER.summary(base_url)}")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scheduler checks against the fixture server')
+    parser.add_argument('--searches', type=int, default=5, help='Searches run after the circuit closed')
+    parser.add_argument('--backoff', type=float, default=1.0, help='Seconds a circuit stays open the first time')
+    parser.add_argument('--timeout', type=int, default=FIRST_CARD_TIMEOUT, help='Card timeout of the old wait in ms')
+    parser.add_argument('--delay', type=float, default=0.02, help='Seconds the fixture server waits per request')
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Disk used by recurring screenshots of one page: plain files vs the screenshot store
+
+Simulates --captures runs of a long page where most runs change nothing,
+some change a small area (a price, a counter) and a few change a lot, and
+times the "has it changed?" check against writing a file.
+"""
+import io
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from PIL import Image, ImageDraw  # noqa: E402
+from screenshot_store import ScreenshotStore  # noqa: E402
+
+def page_image(rng, width=1280, height=6000):
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(400):
+        x, y = rng.randrange(width - 200), rng.randrange(height - 120)
+        draw.rectangle([x, y, x + rng.randrange(20, 200), y + rng.randrange(10, 120)], fill=(rng.randrange(256),) * 3)
+    return image
+
+def encode(image):
+    out = io.BytesIO()
+    image.save(out, 'PNG')
+    return out.getvalue()
+
+def captures(count, seed=1):
+    """PNG bytes of count runs: mostly unchanged, 20% a small change, 5% a large one"""
+    rng = random.Random(seed)
+    current = page_image(rng)
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            current = current.copy()
+            ImageDraw.Draw(current).rectangle([0, 0, current.width, current.height // 2], fill=(rng.randrange(256),) * 3)
+        elif roll < 0.25:
+            current = current.copy()
+            x, y = rng.randrange(current.width - 80), rng.randrange(current.height - 30)
+            ImageDraw.Draw(current).rectangle([x, y, x + 80, y + 30], fill='red')
+        yield encode(current)
+
+def main(count, threshold):
+    images = list(captures(count))
+    plain = sum(len(data) for data in images)
+    print(f"{count} captures, {plain / 1024 / 1024:.1f} MiB as plain files")
+
+    for region_diffs in (False, True):
+        with tempfile.TemporaryDirectory() as out_dir:
+            store = ScreenshotStore(out_dir, threshold, region_diffs)
+            checking = adding = 0
+            results = []
+            # Like a monitoring run: ask first, then store
+            for i, data in enumerate(images):
+                start = time.perf_counter()
+                store.has_changed('https://example.com/', data)
+                checking += time.perf_counter() - start
+                results.append(store.add('https://example.com/', data, taken=i))
+                adding += time.perf_counter() - start
+            stored = sum(r['stored'] for r in results)
+            kept = sum(r['status'] in ('new', 'changed') for r in results)
+            label = 'store + region diffs' if region_diffs else 'store'
+            print(f"{label:<22} {stored / 1024 / 1024:>7.2f} MiB, {kept} kept, "
+                  f"{(adding - checking) / count * 1000:.1f} ms/add, {checking / count * 1000:.1f} ms/has_changed()")
+            store.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Screenshot store benchmark')
+    parser.add_argument('--captures', type=int, default=100, help='Simulated runs of the same page')
+    parser.add_argument('--threshold', type=int, default=0, help='dHash bits that still count as unchanged')
+    args = parser.parse_args()
+    main(args.captures, args.threshold)
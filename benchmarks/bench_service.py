@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""The scraper service against the fixture server: coalescing, backpressure and latency
+
+Starts the fixture server and the service in this process, then checks
+that concurrent identical searches share one scrape, that a burst of
+different ones beyond the queue gets 429s, and compares a warm request
+with running ebay_search.py as a new process:
+
+    python benchmarks/bench_service.py --burst 20
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from urllib.parse import quote
+from playwright.async_api import async_playwright
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ['PLAYWRIGHT_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench-cache-')
+# The fixture server has no rate limit to find, start where the scheduler would end up
+os.environ['SCRAPER_RATE'] = '10'
+
+import scraper  # noqa: E402
+from sites import EBAY  # noqa: E402
+from service import ScrapeService, fixture_urls  # noqa: E402
+from screenshot_store import ScreenshotStore  # noqa: E402
+from fixture_server import serve, TRACKING_SAMPLE_NUMBER  # noqa: E402
+
+QUERY = 'nintendo switch'
+
+async def http_get(port, path):
+    """(status, headers text, body bytes) of one GET"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b'\r\n\r\n')
+    return int(head.split()[1]), head.decode('latin-1'), body
+
+async def timed_get(port, path):
+    start = time.perf_counter()
+    status, head, body = await http_get(port, path)
+    return status, body, time.perf_counter() - start
+
+async def main(args):
+    scraper.console.quiet = True
+    server, base_url = serve(delay=args.delay)
+    failures = []
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        with tempfile.TemporaryDirectory() as store_dir:
+            service = ScrapeService(browser, args.workers, args.queue_size, base_url=fixture_urls(base_url),
+                                    route_profile='full', store=ScreenshotStore(store_dir))
+            ready = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(service.serve('127.0.0.1:0', ready.set_result))
+            port = await ready
+            search = f"/search/ebay?q={QUERY.replace(' ', '+')}&max=20"
+            try:
+                # Cold request: consent, first page load
+                status, body, cold = await timed_get(port, search)
+                if status != 200:
+                    failures.append(f"cold search answered {status}: {body[:200]!r}")
+
+                # Identical concurrent requests share one scrape
+                jobs_before = service.jobs['search']
+                answers = await asyncio.gather(*(timed_get(port, search) for _ in range(args.concurrent)))
+                scrapes = service.jobs['search'] - jobs_before
+                bodies = {body for status, body, seconds in answers}
+                if any(status != 200 for status, body, seconds in answers) or len(bodies) != 1 or scrapes != 1:
+                    failures.append(f"{args.concurrent} identical searches: {scrapes} scrapes, {len(bodies)} distinct answers")
+                warm = max(seconds for status, body, seconds in answers)
+
+                # A burst of different searches beyond workers + queue gets 429s
+                burst = await asyncio.gather(*(http_get(port, f"/search/ebay?q=burst+{i}&max=5")
+                                               for i in range(args.burst)))
+                statuses = [status for status, head, body in burst]
+                if args.burst > args.workers + args.queue_size and 429 not in statuses:
+                    failures.append(f"burst of {args.burst} got no 429 ({statuses})")
+                if any('Retry-After' not in head for status, head, body in burst if status == 429):
+                    failures.append('429 without Retry-After')
+
+                status, body, tracking = await timed_get(port, f"/track?number={TRACKING_SAMPLE_NUMBER}")
+                if status != 200 or not json.loads(body).get('events'):
+                    failures.append(f"tracking answered {status}: {body[:200]!r}")
+                page_url = quote(EBAY.search_url(QUERY, base_url=base_url), safe='')
+                status, body, shot = await timed_get(port, f"/screenshot?url={page_url}")
+                if status != 200:
+                    failures.append(f"screenshot answered {status}: {body[:200]!r}")
+                status, head, metrics = await http_get(port, '/metrics')
+                if b'scraper_service_coalesced{endpoint="search"}' not in metrics:
+                    failures.append('/metrics has no coalesced count')
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await browser.close()
+
+    # The same search as a one-shot process: interpreter, imports, browser launch
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(ROOT / 'ebay_search.py'), QUERY, '--max', '20', '--headless', '--no-cache',
+                    '--profile', 'full', '--base-url', base_url], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   check=False)
+    process = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"{'request':<34} {'seconds':>8}")
+    print(f"{'search, cold':<34} {cold:>8.2f}")
+    print(f"{f'search, {args.concurrent} identical at once':<34} {warm:>8.2f}")
+    print(f"{'search as a new process':<34} {process:>8.2f}")
+    print(f"{'tracking':<34} {tracking:>8.2f}")
+    print(f"{'screenshot':<34} {shot:>8.2f}")
+    print(f"burst of {args.burst}: {statuses.count(200)} answered, {statuses.count(429)} turned away with 429")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scraper service checks against the fixture server')
+    parser.add_argument('--concurrent', type=int, default=10, help='Identical searches sent at once')
+    parser.add_argument('--burst', type=int, default=20, help='Different searches sent at once')
+    parser.add_argument('--workers', type=int, default=2, help='Service workers')
+    parser.add_argument('--queue-size', type=int, default=4, help='Service queue size')
+    parser.add_argument('--delay', type=float, default=0.02, help='Seconds the fixture server waits per request')
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args)))
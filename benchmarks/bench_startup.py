@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Startup cost of the scripts: import time per command and time to the first navigation
+
+Imports each command's module in a fresh interpreter under -X importtime,
+times `cli.py --help`, and runs `cli.py ebay ... --json` against the fixture
+server to see how long a process takes to ask for its first result page
+(and that the --json path never imports rich). Fails when a number is
+above its threshold in thresholds.json, like bench_suite.py:
+
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --update-thresholds
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cli import COMMANDS  # noqa: E402
+from fixture_server import serve  # noqa: E402
+
+THRESHOLDS = Path(__file__).resolve().parent / 'thresholds.json'
+HEADROOM = 1.25
+QUERY = 'nintendo switch'
+FIRST_NAVIGATION_TIMEOUT = 60
+
+def environment():
+    # Cookies of benchmark runs must not mix with the real cache; no rate limit to find locally
+    return dict(os.environ, PLAYWRIGHT_CACHE_DIR=tempfile.mkdtemp(prefix='bench-cache-'), SCRAPER_RATE='10')
+
+def parse_importtime(stderr):
+    """{module: (self us, cumulative us)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+def import_time(module):
+    """(ms to import module in a fresh interpreter, its slowest imports as (name, ms))"""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=ROOT,
+                             env=environment(), capture_output=True, text=True, check=True)
+    modules = parse_importtime(process.stderr)
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:3]
+    return modules[module][1] / 1000, [(name, own / 1000) for name, (own, cumulative) in slowest]
+
+def help_time():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'cli.py', '--help'], cwd=ROOT, env=environment(), stdout=subprocess.DEVNULL,
+                   check=True)
+    return (time.perf_counter() - start) * 1000
+
+def first_navigation(server, base_url, importtime=False):
+    """(ms until the first result page request, ms until the process is done, rich imported, JSON lines)
+
+    Whether rich was imported is only known with importtime.
+    """
+    handler = server.RequestHandlerClass
+    handler.requests = 0
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *(['-X', 'importtime'] if importtime else []), 'cli.py', 'ebay', QUERY,
+                                '--json', '--headless', '--no-cache', '--max', '5', '--profile', 'full',
+                                '--base-url', base_url],
+                               cwd=ROOT, env=environment(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    first = None
+    while first is None and time.perf_counter() - start < FIRST_NAVIGATION_TIMEOUT:
+        if handler.requests:
+            first = (time.perf_counter() - start) * 1000
+        elif process.poll() is not None:
+            break
+        time.sleep(0.002)
+    stdout, stderr = process.communicate()
+    done = (time.perf_counter() - start) * 1000
+    rows = [json.loads(line) for line in stdout.splitlines() if line.strip()]
+    return first, done, 'rich' in parse_importtime(stderr), rows
+
+def check(results, thresholds):
+    failures = []
+    for name, result in results.items():
+        for key, limit in thresholds.get(name, {}).items():
+            if result.get(key, 0) > limit:
+                failures.append(f"{name} {key} {result[key]} > {limit}")
+    return failures
+
+def main(args):
+    results, failures = {}, []
+    print(f"{'import':<16} {'median ms':>10}  slowest imports")
+    for module, summary in COMMANDS.values():
+        runs = [import_time(module) for _ in range(args.repeat)]
+        ms = round(statistics.median(ms for ms, slowest in runs), 1)
+        results[f"import_{module}"] = {'import_ms': ms}
+        slowest = ', '.join(f"{name} {own:.0f}ms" for name, own in runs[-1][1])
+        print(f"{module:<16} {ms:>10.1f}  {slowest}")
+
+    results['cli_help'] = {'process_ms': round(statistics.median(help_time() for _ in range(args.repeat)), 1)}
+    print(f"{'cli.py --help':<16} {results['cli_help']['process_ms']:>10.1f}")
+
+    server, base_url = serve(delay=args.delay)
+    try:
+        # One untimed run under -X importtime, to see what the --json path loads
+        first, done, rich, rows = first_navigation(server, base_url, importtime=True)
+        if rich:
+            failures.append('cli.py ebay --json imported rich')
+        runs = [first_navigation(server, base_url) for _ in range(args.repeat)]
+    finally:
+        server.shutdown()
+    if any(first is None for first, done, rich, rows in runs):
+        failures.append('cli.py ebay --json never asked for a result page')
+    else:
+        results['cli_ebay_json'] = {
+            'first_navigation_ms': round(statistics.median(first for first, done, rich, rows in runs), 1),
+            'process_ms': round(statistics.median(done for first, done, rich, rows in runs), 1),
+        }
+        print(f"cli.py ebay --json: first navigation after {results['cli_ebay_json']['first_navigation_ms']:.0f}ms, "
+              f"done after {results['cli_ebay_json']['process_ms']:.0f}ms")
+    if any(not rows for first, done, rich, rows in runs):
+        failures.append('cli.py ebay --json printed no results')
+
+    stored = json.loads(THRESHOLDS.read_text()) if THRESHOLDS.exists() else {}
+    if args.update_thresholds:
+        stored['startup'] = {name: {key: round(value * HEADROOM, 1) for key, value in r.items()}
+                             for name, r in results.items()}
+        THRESHOLDS.write_text(json.dumps(stored, indent=2) + '\n')
+        print(f"Thresholds written to {THRESHOLDS}")
+        regressions = []
+    else:
+        regressions = check(results, stored.get('startup', {}))
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if failures or regressions else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Startup time of the scripts')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (the median counts)')
+    parser.add_argument('--delay', type=float, default=0.02, help='Seconds the fixture server waits per request')
+    parser.add_argument('--update-thresholds', action='store_true', help='Store the numbers of this run (plus headroom) as thresholds')
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Offline benchmarks of the whole scraping flows, with regression thresholds
+
+Every scenario runs against the local fixture server (default) or against
+HAR files recorded once from the live sites, so a run needs no network:
+
+    python benchmarks/bench_suite.py                        # fixture server
+    python benchmarks/bench_suite.py --record-har fixtures/har   # once, live
+    python benchmarks/bench_suite.py --har fixtures/har     # replay
+
+For each scenario it reports p50/p95 latency, protocol round trips to the
+browser and the peak JS heap, and fails when one of them is above its
+threshold in thresholds.json (--update-thresholds writes new ones from this
+run, with some headroom).
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from playwright.async_api import async_playwright
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Cookies and consent of benchmark runs must not mix with the real cache
+os.environ['PLAYWRIGHT_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench-cache-')
+# The fixture server has no rate limit to find, start where the scheduler would end up
+os.environ['SCRAPER_RATE'] = '10'
+
+import scraper  # noqa: E402
+import ebay_search  # noqa: E402
+import search_amazon  # noqa: E402
+from screenshot import capture  # noqa: E402
+from tracking import TrackingSession, POST_URL  # noqa: E402
+from metrics import RunMetrics  # noqa: E402
+from fixture_server import serve, FIXTURE_PAGES, TRACKING_PATH, TRACKING_SAMPLE_NUMBER  # noqa: E402
+
+THRESHOLDS = Path(__file__).resolve().parent / 'thresholds.json'
+HEADROOM = 1.25
+SEARCH_QUERY = 'nintendo switch'
+MAX_RESULTS = 60
+MEMORY_SAMPLE_TRIPS = 4  # new_cdp_session, Performance.enable, Performance.getMetrics, detach
+
+round_trips = 0
+
+def count_round_trips():
+    """Count every call the client makes to the Playwright driver (each one waits for its answer)"""
+    from playwright._impl._connection import Channel
+
+    def counted(func):
+        async def wrapper(*args, **kwargs):
+            global round_trips
+            round_trips += 1
+            return await func(*args, **kwargs)
+        return wrapper
+
+    for name in ('send', 'send_return_as_dict'):
+        if hasattr(Channel, name):
+            setattr(Channel, name, counted(getattr(Channel, name)))
+
+class HarBrowser:
+    """A Browser whose new contexts record to, or replay from, one HAR file"""
+
+    def __init__(self, browser, har, record=False):
+        self.browser = browser
+        self.har = Path(har)
+        self.record = record
+
+    async def new_context(self, **options):
+        if self.record:
+            self.har.parent.mkdir(parents=True, exist_ok=True)
+            return await self.browser.new_context(record_har_path=str(self.har), record_har_content='embed', **options)
+        context = await self.browser.new_context(**options)
+        # Anything not in the recording fails instead of going to the network
+        await context.route_from_har(str(self.har), not_found='abort')
+        return context
+
+    def __getattr__(self, name):
+        return getattr(self.browser, name)
+
+async def run_ebay(browser, base_url, metrics, batched=True):
+    return await ebay_search.ebay_search(SEARCH_QUERY, MAX_RESULTS, batched=batched, base_url=base_url,
+                                         browser=browser, route_profile='full', metrics=metrics)
+
+async def run_ebay_per_item(browser, base_url, metrics):
+    return await run_ebay(browser, base_url, metrics, batched=False)
+
+async def run_ebay_ranked(browser, base_url, metrics):
+    # Cheapest listings of every result page, so nothing can stop paging early
+    return await ebay_search.ebay_search(SEARCH_QUERY, MAX_RESULTS, base_url=base_url, browser=browser,
+                                         route_profile='full', metrics=metrics, sort='price', pages=FIXTURE_PAGES)
+
+async def run_amazon(browser, base_url, metrics):
+    return await search_amazon.amazon_search(SEARCH_QUERY, MAX_RESULTS, base_url=base_url, browser=browser,
+                                             route_profile='full', metrics=metrics)
+
+async def run_screenshot(browser, base_url, metrics):
+    with tempfile.TemporaryDirectory() as out_dir:
+        result = await capture(browser, ebay_search.build_search_url(SEARCH_QUERY, base_url=base_url),
+                               str(Path(out_dir) / 'page.png'), {'format': 'png'}, metrics)
+    if not result['ok']:
+        raise RuntimeError(result['error'])
+    return result
+
+async def run_tracking(browser, base_url, metrics):
+    url = base_url + TRACKING_PATH if base_url else POST_URL
+    async with TrackingSession(browser, tabs=1, metrics=metrics, url=url) as session:
+        return await session.track(TRACKING_SAMPLE_NUMBER)
+
+# name -> (site, run(browser, base_url, metrics)); a HAR replay uses the
+# real site URLs, the fixture server its own
+SCENARIOS = {
+    'ebay_search': ('ebay', run_ebay),
+    'ebay_search_per_item': ('ebay', run_ebay_per_item),
+    'ebay_search_ranked': ('ebay', run_ebay_ranked),
+    'amazon_search': ('amazon', run_amazon),
+    'screenshot': ('ebay', run_screenshot),
+    'tracking': ('post', run_tracking),
+}
+LIVE_URLS = {'ebay': ebay_search.EBAY_BASE_URL, 'amazon': search_amazon.AMAZON_BASE_URL, 'post': None}
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+async def measure(browser, base_url, run, repeat):
+    global round_trips
+    await run(browser, base_url, None)  # Warm-up: consent, caches, JIT
+    timings, trips, heaps = [], [], []
+    for _ in range(repeat):
+        metrics = RunMetrics('bench')
+        round_trips = 0
+        start = time.perf_counter()
+        await run(browser, base_url, metrics)
+        timings.append(time.perf_counter() - start)
+        # Sampling the heap costs round trips of its own, don't count them
+        trips.append(round_trips - metrics.memory_samples * MEMORY_SAMPLE_TRIPS)
+        heaps.append(metrics.peak_heap_used)
+    return {
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 1),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 1),
+        'round_trips': max(trips),
+        'heap_mib': round(max(heaps) / 1024 / 1024, 1),
+    }
+
+def check(results, thresholds):
+    """Names of the numbers above their threshold, e.g. ['ebay_search p95_ms 812.0 > 700']"""
+    failures = []
+    for name, result in results.items():
+        for key, limit in thresholds.get(name, {}).items():
+            if result.get(key, 0) > limit:
+                failures.append(f"{name} {key} {result[key]} > {limit}")
+    return failures
+
+async def main(args):
+    count_round_trips()
+    scraper.console.quiet = True
+    names = args.only or list(SCENARIOS)
+
+    server = None
+    if not (args.har or args.record_har):
+        server, base_url = serve(delay=args.delay)
+
+    results = {}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            for name in names:
+                site, run = SCENARIOS[name]
+                if args.record_har:
+                    await run(HarBrowser(browser, Path(args.record_har) / f"{name}.har", record=True), LIVE_URLS[site], None)
+                    print(f"recorded {name}")
+                    continue
+                if args.har:
+                    target, url = HarBrowser(browser, Path(args.har) / f"{name}.har"), LIVE_URLS[site]
+                else:
+                    target, url = browser, base_url
+                results[name] = await measure(target, url, run, args.repeat)
+        finally:
+            await browser.close()
+            if server:
+                server.shutdown()
+
+    if args.record_har:
+        return 0
+
+    thresholds = json.loads(THRESHOLDS.read_text()) if THRESHOLDS.exists() else {}
+    source = 'har' if args.har else 'server'
+    thresholds = thresholds.get(source, {})
+    print(f"{'scenario':<22} {'p50 ms':>9} {'p95 ms':>9} {'round trips':>12} {'heap MiB':>9}")
+    for name, r in results.items():
+        print(f"{name:<22} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['round_trips']:>12} {r['heap_mib']:>9.1f}")
+
+    if args.update_thresholds:
+        stored = json.loads(THRESHOLDS.read_text()) if THRESHOLDS.exists() else {}
+        stored.setdefault(source, {}).update({
+            name: {key: round(value * HEADROOM, 1) if key != 'round_trips' else math.ceil(value * HEADROOM)
+                   for key, value in r.items() if key != 'p50_ms'}
+            for name, r in results.items()
+        })
+        THRESHOLDS.write_text(json.dumps(stored, indent=2) + '\n')
+        print(f"Thresholds written to {THRESHOLDS}")
+        return 0
+
+    failures = check(results, thresholds)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline scraper benchmark suite')
+    parser.add_argument('--only', nargs='+', choices=SCENARIOS, help='Scenarios to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=10, help='Measured runs per scenario (after one warm-up)')
+    parser.add_argument('--delay', type=float, default=0.02, help='Seconds the fixture server waits per request')
+    parser.add_argument('--har', metavar='DIR', help='Replay the HAR files in DIR instead of using the fixture server')
+    parser.add_argument('--record-har', metavar='DIR', help='Record one live run of every scenario into DIR (needs network)')
+    parser.add_argument('--update-thresholds', action='store_true', help='Store the numbers of this run (plus headroom) as thresholds')
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args)))
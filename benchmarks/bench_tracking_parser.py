@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Compare the old replace() chain with the compiled tracking parser on saved result texts"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tracking import parse_many, parse_tracking  # noqa: E402
+
+FIXTURE = ROOT / 'fixtures' / 'tracking_details.txt'
+
+def load_samples(path=FIXTURE):
+    """Result texts of the fixture file, separated by ---- lines (# lines are comments)"""
+    lines = [line for line in path.read_text(encoding='utf-8').splitlines() if not line.startswith('#')]
+    samples, current = [], []
+    for line in lines:
+        if line.strip() == '----':
+            samples.append('\n'.join(current).strip('\n'))
+            current = []
+        else:
+            current.append(line)
+    samples.append('\n'.join(current).strip('\n'))
+    return [sample for sample in samples if sample]
+
+def format_info(info, trackingNumber):
+    """The clean up post.py used before, kept here as the baseline"""
+    return [i
+        .replace(',', '\n')
+        .replace('Show senderDestination postcode:', '\n  ')
+        .replace('Sender:', ' ')
+        .replace('Postal code 2005', 'Postal code 2005 ')
+        .replace('Item detailsTracking number:', 'Item detailsTracking number: ')
+        .replace('cm', 'cm ').replace('kg', 'kg\n  ')
+        .replace('The sender has provided electronic shipment information', ' The sender has provided electronic shipment information ')
+        .replace('AT', '')
+        .replace(f'Item detailsTracking number: {trackingNumber}', '')
+        .replace('Item delivered to consignee', '\nItem delivered to consignee ')
+        .replace('Postal code 1700', 'Postal code 1700 ')
+        .replace('Postal code 1220', 'Postal code 1220 ')
+        .replace('Item is out for delivery', ' Item is out for delivery ')
+        .replace('Item distributed', ' Item distributed ')
+        .replace('Item delivered', ' Item delivered')
+        .replace('Show destination postcode', 'Show destination postcode INSERT-VARIABLE-HERE ')
+        .replace('Weight', 'Weight ')
+        .replace('Jan', ' Jan ')
+        .replace('Feb', ' Feb ')
+        .replace('Mar', ' Mar ')
+        .replace('Apr', ' Apr ')
+        .replace('May', ' May ')
+        .replace('Jun', ' Jun ')
+        .replace('Jul', ' Jul ')
+        .replace('Aug', ' Aug ')
+        .replace('Sep', ' Sep ')
+        .replace('Oct', ' Oct ')
+        .replace('Nov', ' Nov ')
+        .replace('Dec', ' Dec ')
+        .replace('Dimensions', ' Dimensions ')
+        for i in info]
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+def main(copies, repeat):
+    samples = load_samples()
+    texts = samples * copies
+    parsed = [parse_tracking(text) for text in samples]
+    numbers = [p['tracking_number'] or '' for p in parsed] * copies
+
+    paths = [
+        ('replace chain', lambda: [format_info([text], number) for text, number in zip(texts, numbers)]),
+        ('compiled regex', lambda: parse_many(texts)),
+    ]
+    print(f"{len(texts)} texts ({len(samples)} samples x {copies})")
+    print(f"{'path':<16} {'best ms':>9} {'mean ms':>9} {'us/text':>9}")
+    for name, func in paths:
+        best, mean = measure(func, repeat)
+        print(f"{name:<16} {best * 1000:>9.2f} {mean * 1000:>9.2f} {best / len(texts) * 1e6:>9.2f}")
+
+    # Every sample, innerText or glued textContent, has to yield a number and events
+    incomplete = [p for p in parsed if not p['tracking_number'] or not p['events']]
+    if incomplete:
+        print(f"WARNING: {len(incomplete)} samples parsed without tracking number or events")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tracking text parser benchmark')
+    parser.add_argument('--copies', type=int, default=500, help='Copies of the fixture samples per run')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per path')
+    args = parser.parse_args()
+    main(args.copies, args.repeat)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Local stand-in for ebay.at/amazon.de/post.at that serves the saved result pages
+
+Run it and point a scraper at it:
+    python benchmarks/fixture_server.py --port 8069 --delay 0.5
+    python ebay_search.py 'nintendo switch' --max 150 --base-url http://127.0.0.1:8069
+
+With --block page it answers searches with a robot check page instead,
+with --block status with 503 and Retry-After, like a site that noticed us.
+"""
+import re
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES = Path(__file__).resolve().parent.parent / 'fixtures'
+FIXTURE_PAGES = 5
+EMPTY_PAGE = '<!DOCTYPE html><html><body><p>Keine Ergebnisse</p></body></html>'
+
+# path -> (fixture file, page query parameter, item id pattern, items a page
+# shifts by so consecutive pages overlap like the real sites do)
+SITES = {
+    '/sch/i.html': ('ebay_results.html', '_pgn', re.compile(r'/itm/(\d+)'), 68),
+    '/s': ('amazon_results.html', 'page', re.compile(r'/dp/B0(\d+)'), 44),
+}
+
+# post.at tracking page: consent banner, number field, result dialog. The
+# result is the first recorded innerText sample with the number swapped in.
+TRACKING_PATH = '/en'
+TRACKING_SAMPLE_NUMBER = 'RR123456785AT'
+TRACKING_PAGE = '''<!DOCTYPE html>
+<html><head><title>Sendungsverfolgung</title></head><body>
+<div id="consent"><button>Use website with required cookies</button></div>
+<form id="search"><label for="number"></label><input id="number" type="text"><button type="submit">Submit query</button></form>
+<div id="dialog" hidden><button id="close">Close dialogue box</button></div>
+<section aria-label="Ergebnis Sendungsverfolgung"><div id="result"></div></section>
+<script>
+const SAMPLE = %s;
+const SAMPLE_NUMBER = %s;
+const consent = document.getElementById('consent');
+if (document.cookie.includes('consent=')) consent.remove();
+consent.querySelector('button').onclick = () => { document.cookie = 'consent=required; path=/'; consent.remove(); };
+document.getElementById('search').onsubmit = (event) => {
+    event.preventDefault();
+    const number = document.getElementById('number').value.trim();
+    setTimeout(() => {
+        document.getElementById('dialog').hidden = false;
+        const details = document.createElement('div');
+        details.className = 'tracking__details';
+        details.style.whiteSpace = 'pre-line';
+        details.textContent = SAMPLE.split(SAMPLE_NUMBER).join(number);
+        document.getElementById('result').replaceChildren(details);
+    }, 50);
+};
+document.getElementById('close').onclick = () => { document.getElementById('dialog').hidden = true; };
+</script>
+</body></html>'''
+
+ROBOT_CHECK_PAGE = '''<!DOCTYPE html>
+<html><head><title>Amazon.de</title></head><body>
+<h4>Geben Sie die Zeichen unten ein</h4>
+<form method="get" action="/errors/validateCaptcha">
+<img src="/assets/captcha.jpg"><input type="text" id="captchacharacters" name="field-keywords">
+<button type="submit">Weiter</button>
+</form>
+</body></html>'''
+BLOCK_MODES = ('page', 'status')
+BLOCKED_RETRY_AFTER = 30
+
+# Image CDNs of the saved pages are served locally so a run needs no network
+ASSET_HOSTS = ['https://i.ebayimg.com/', 'https://m.media-amazon.com/']
+ASSET_SIZES = {'.webp': 15_000, '.jpg': 15_000, '.css': 12_000, '.woff2': 25_000}
+PAGE_ASSETS = ('<link rel="stylesheet" href="/assets/srp.css">'
+               '<style>@font-face{font-family:Market;src:url(/assets/market.woff2)}body{font-family:Market}</style>')
+
+def render_asset(path):
+    for ext, size in ASSET_SIZES.items():
+        if path.endswith(ext):
+            if ext == '.css':
+                return ('/*' + 'x' * (size - 4) + '*/').encode(), 'text/css'
+            return bytes(size), 'application/octet-stream'
+    return None, None
+
+def render_tracking():
+    lines = (FIXTURES / 'tracking_details.txt').read_text(encoding='utf-8').splitlines()
+    sample = []
+    for line in lines:
+        if line.strip() == '----':
+            break
+        if not line.startswith('#'):
+            sample.append(line)
+    return TRACKING_PAGE % (json.dumps('\n'.join(sample)), json.dumps(TRACKING_SAMPLE_NUMBER))
+
+def render_page(path, query):
+    if path == TRACKING_PATH:
+        return render_tracking()
+    if path not in SITES:
+        return None
+    filename, page_param, id_pattern, shift = SITES[path]
+    page_number = int(query.get(page_param, ['1'])[0])
+    if page_number > FIXTURE_PAGES:
+        return EMPTY_PAGE
+    html = (FIXTURES / filename).read_text(encoding='utf-8')
+    offset = (page_number - 1) * shift
+
+    def renumber(match):
+        digits = match.group(1)
+        return match.group(0).replace(digits, str(int(digits) + offset).zfill(len(digits)))
+
+    html = id_pattern.sub(renumber, html)
+    for host in ASSET_HOSTS:
+        html = html.replace(host, '/assets/')
+    return html.replace('</head>', PAGE_ASSETS + '</head>', 1)
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    block = None  # One of BLOCK_MODES to answer searches like a site that blocks us
+    requests = 0  # Result pages asked for
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if self.delay:
+            time.sleep(self.delay)
+        if parsed.path in SITES:
+            type(self).requests += 1
+        if parsed.path in SITES and self.block == 'status':
+            self.send_response(503)
+            self.send_header('Retry-After', str(BLOCKED_RETRY_AFTER))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if parsed.path in SITES and self.block == 'page':
+            data, content_type = ROBOT_CHECK_PAGE.encode('utf-8'), 'text/html; charset=utf-8'
+        elif parsed.path.startswith('/assets/'):
+            data, content_type = render_asset(parsed.path)
+        else:
+            body = render_page(parsed.path, parse_qs(parsed.query))
+            data, content_type = (body.encode('utf-8'), 'text/html; charset=utf-8') if body is not None else (None, None)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port=0, delay=0.0, block=None):
+    """Start the fixture server in a background thread, returns (server, base_url)
+
+    server.RequestHandlerClass.block can be changed while it runs.
+    """
+    handler = type('Handler', (FixtureHandler,), {'delay': delay, 'block': block})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fixture server for the scrapers')
+    parser.add_argument('--port', type=int, default=8069, help='Port to listen on')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering each request')
+    parser.add_argument('--block', choices=BLOCK_MODES, help='Answer searches with a robot check page or a 503')
+    args = parser.parse_args()
+
+    server, base_url = serve(args.port, args.delay, args.block)
+    print(f"Serving fixtures on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Shared warm browser for all scripts
+
+Start the service once (e.g. from cron @reboot or a systemd user unit):
+    python browser_pool.py --recycle-after 200 --max-memory 1500
+
+Every script then attaches to the running Chromium over CDP instead of
+launching its own, and falls back to an in-process launch when the service
+is not running. Each job gets its own fresh browser context, which is
+thrown away when the job is done. Long-running callers (service.py,
+--batch) keep a few contexts per site warm ahead of time in a ContextPool.
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+from pathlib import Path
+from functools import partial
+from collections import Counter
+from contextlib import asynccontextmanager
+from routing import apply_profile
+from storage_cache import read_state
+
+POOL_ADDRESS = os.environ.get('BROWSER_POOL_ADDR', '127.0.0.1:9321')
+RECYCLE_AFTER_JOBS = 200
+RECYCLE_ABOVE_MB = 1500
+WARM_CONTEXTS = 2  # Contexts a ContextPool keeps ready per site and route profile
+CHECK_INTERVAL = 5
+
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36'
+]
+
+def split_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def lease_endpoint(address=POOL_ADDRESS, timeout=0.2):
+    """Ask the pool service for a CDP endpoint
+
+    Returns (endpoint, lease) or (None, None) when no service is running. The
+    job holds the lease socket open while it uses the browser; closing it
+    tells the service the job is done.
+    """
+    try:
+        lease = socket.create_connection(split_address(address), timeout=timeout)
+    except OSError:
+        return None, None
+    try:
+        lease.settimeout(30)
+        lease.sendall(b'acquire\n')
+        reply = json.loads(lease.makefile('r').readline())
+        lease.settimeout(None)
+        return reply['endpoint'], lease
+    except (OSError, ValueError, KeyError):
+        lease.close()
+        return None, None
+
+@asynccontextmanager
+async def open_browser(playwright, browser_name='chromium', headless=True, args=LAUNCH_ARGS, address=POOL_ADDRESS,
+                       metrics=None):
+    """Attach to the pool service if it is running, otherwise launch a browser here"""
+    start = time.perf_counter()
+    endpoint, lease = lease_endpoint(address) if browser_name == 'chromium' else (None, None)
+    if endpoint:
+        try:
+            browser = await playwright.chromium.connect_over_cdp(endpoint)
+        except Exception:
+            lease.close()
+            endpoint = None
+    if not endpoint:
+        browser = await getattr(playwright, browser_name).launch(headless=headless, args=args)
+    if metrics:
+        metrics.add('launch', time.perf_counter() - start)
+
+    try:
+        yield browser
+    finally:
+        # For a CDP connection this only drops the contexts we created and
+        # disconnects; the shared browser keeps running
+        await browser.close()
+        if lease:
+            lease.close()
+
+class ContextPool:
+    """Browser contexts created ahead of time per site, for callers that run many jobs on one browser
+
+    A context is warmed with the site's cached storage state and request
+    routing. acquire() hands out a warm one if there is one, for one job
+    only: the caller closes it when done, and a replacement is created in
+    the background. The pool lives in the process that uses the contexts,
+    since Playwright can't adopt a context another connection created.
+    """
+
+    def __init__(self, browser, size=WARM_CONTEXTS):
+        self.browser = browser
+        self.size = size
+        self.warm = {}  # (state key, route profile) -> [(context, route_stats, consent)]
+        self.filling = Counter()
+        self.pending = set()
+
+    async def create(self, state_key, route_profile):
+        state, consent = read_state(state_key)
+        context = await self.browser.new_context(storage_state=state)
+        try:
+            route_stats = await apply_profile(context, route_profile)
+        except Exception:
+            await context.close()
+            raise
+        return context, route_stats, consent
+
+    def warm_up(self, state_key, route_profile):
+        """Start creating contexts until size of them are ready for this site and profile"""
+        key = (state_key, route_profile)
+        while len(self.warm.get(key, [])) + self.filling[key] < self.size:
+            self.filling[key] += 1
+            task = asyncio.ensure_future(self.create(*key))
+            self.pending.add(task)
+            task.add_done_callback(partial(self._warmed, key))
+
+    def _warmed(self, key, task):
+        self.pending.discard(task)
+        self.filling[key] -= 1
+        if not task.cancelled() and task.exception() is None:
+            self.warm.setdefault(key, []).append(task.result())
+
+    async def acquire(self, state_key, route_profile):
+        """(context, route_stats, consent given) for one job; close the context when done"""
+        warm = self.warm.get((state_key, route_profile))
+        entry = warm.pop(0) if warm else await self.create(state_key, route_profile)
+        self.warm_up(state_key, route_profile)
+        return entry
+
+    async def close(self):
+        for task in list(self.pending):
+            task.cancel()
+        await asyncio.gather(*self.pending, return_exceptions=True)
+        for entries in self.warm.values():
+            for context, route_stats, consent in entries:
+                await context.close()
+        self.warm.clear()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def process_tree_rss_mb(marker):
+    """Resident memory of the browser process whose command line contains marker, plus its children (Linux only)"""
+    proc = Path('/proc')
+    if not proc.exists():
+        return 0.0
+    parents = {}
+    roots = set()
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+            parents[int(entry.name)] = int(stat.rsplit(')', 1)[1].split()[1])
+            if marker in (entry / 'cmdline').read_bytes().decode(errors='ignore'):
+                roots.add(int(entry.name))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    tree = set(roots)
+    changed = True
+    while changed:
+        children = {pid for pid, parent in parents.items() if parent in tree} - tree
+        tree |= children
+        changed = bool(children)
+
+    total_kb = 0
+    for pid in tree:
+        try:
+            for line in (proc / str(pid) / 'status').read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+class Generation:
+    """One launched browser and the jobs that were handed to it"""
+
+    def __init__(self, browser, port):
+        self.browser = browser
+        self.port = port
+        self.endpoint = f"http://127.0.0.1:{port}"
+        self.jobs = 0
+        self.leases = 0
+        self.retired = False
+        self.rss_mb = 0.0  # Last measured by the daemon's monitor
+
+    def memory_mb(self):
+        return process_tree_rss_mb(f'--remote-debugging-port={self.port}')
+
+class BrowserDaemon:
+    def __init__(self, playwright, headless=True, recycle_after=RECYCLE_AFTER_JOBS, max_memory_mb=RECYCLE_ABOVE_MB):
+        self.playwright = playwright
+        self.headless = headless
+        self.recycle_after = recycle_after
+        self.max_memory_mb = max_memory_mb
+        self.current = None
+        self.lock = asyncio.Lock()
+
+    async def launch(self):
+        port = free_port()
+        browser = await self.playwright.chromium.launch(
+            headless=self.headless,
+            args=LAUNCH_ARGS + [f'--remote-debugging-port={port}']
+        )
+        print(f"Launched browser on port {port}")
+        return Generation(browser, port)
+
+    def worn_out(self, generation):
+        if generation.jobs >= self.recycle_after:
+            return True
+        return self.max_memory_mb and generation.rss_mb > self.max_memory_mb
+
+    async def retire(self, generation):
+        generation.retired = True
+        if generation.leases == 0:
+            await generation.browser.close()
+            print(f"Closed browser on port {generation.port} after {generation.jobs} jobs")
+
+    async def rotate(self):
+        """Swap in a fresh browser if the current one has done enough work; running jobs keep the old one"""
+        async with self.lock:
+            if self.current is None:
+                self.current = await self.launch()
+            elif self.worn_out(self.current):
+                old, self.current = self.current, await self.launch()
+                await self.retire(old)
+            return self.current
+
+    async def handle(self, reader, writer):
+        try:
+            if (await reader.readline()).strip() != b'acquire':
+                return
+            generation = await self.rotate()
+            generation.jobs += 1
+            generation.leases += 1
+            try:
+                writer.write(json.dumps({'endpoint': generation.endpoint}).encode() + b'\n')
+                await writer.drain()
+                await reader.read()  # Returns once the job closes its lease
+            finally:
+                generation.leases -= 1
+                if generation.retired and generation.leases == 0:
+                    await self.retire(generation)
+        finally:
+            writer.close()
+
+    async def monitor(self):
+        """Measure the browser's memory every CHECK_INTERVAL, in a thread: walking /proc blocks"""
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL)
+            generation = self.current
+            if self.max_memory_mb and generation is not None:
+                generation.rss_mb = await asyncio.to_thread(generation.memory_mb)
+            await self.rotate()
+
+    async def serve(self, address=POOL_ADDRESS):
+        await self.rotate()
+        host, port = split_address(address)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Browser pool listening on {address}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.monitor())
+
+async def main(args):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as playwright:
+        daemon = BrowserDaemon(playwright, not args.headed, args.recycle_after, args.max_memory)
+        await daemon.serve(args.address)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shared browser service for the scripts')
+    parser.add_argument('--address', default=POOL_ADDRESS, help='host:port to listen on')
+    parser.add_argument('--recycle-after', type=int, default=RECYCLE_AFTER_JOBS, help='Replace the browser after this many jobs')
+    parser.add_argument('--max-memory', type=int, default=RECYCLE_ABOVE_MB, help='Replace the browser above this much RSS (MB, 0 to disable)')
+    parser.add_argument('--headed', action='store_true', help='Show the browser window')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""One entry point for all scripts: python cli.py <command> [arguments]
+
+    python cli.py ebay "lego 42115" --sort total --json
+    python cli.py amazon kindle --max 10
+    python cli.py screenshot https://example.com --json
+    python cli.py track RR123456785AT --json
+
+Only the module of the command being run is imported, when it runs, and
+--json output never loads rich. The scripts still work on their own too.
+"""
+import sys
+import argparse
+import importlib
+
+# command -> (module with DESCRIPTION, add_arguments(parser) and run_cli(args, parser), summary)
+COMMANDS = {
+    'ebay': ('ebay_search', 'Search eBay.at'),
+    'amazon': ('search_amazon', 'Search Amazon.de'),
+    'screenshot': ('screenshot', 'Screenshots of web pages'),
+    'track': ('post', 'Look up post.at tracking numbers'),
+}
+
+def command_parser():
+    epilog = 'commands:\n' + '\n'.join(f"  {name:<12} {summary}" for name, (module, summary) in COMMANDS.items())
+    parser = argparse.ArgumentParser(description='Playwright scripts', epilog=epilog,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=COMMANDS, help='What to run')
+    parser.add_argument('arguments', nargs=argparse.REMAINDER, help="The command's arguments (see <command> --help)")
+    return parser
+
+def main(argv=None):
+    top = command_parser()
+    args = top.parse_args(argv)
+    module = importlib.import_module(COMMANDS[args.command][0])
+    parser = argparse.ArgumentParser(prog=f"{top.prog} {args.command}", description=module.DESCRIPTION)
+    module.add_arguments(parser)
+    return module.run_cli(parser.parse_args(args.arguments), parser)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,179 +1,181 @@
 #!/usr/bin/env python3
+import re
+import sys
+import json
+import time
 import asyncio
 import argparse
-import json
-import csv
-from pathlib import Path
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-from rich.console import Console
-from rich.table import Table
-
-console = Console()
-
-async def ebay_search(query, max_results=10, headless=False, auction_only=False):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36'
-            ]
-        )
-
-        context = await browser.new_context()
+from playwright.async_api import async_playwright
+from browser_pool import open_browser
+from routing import apply_profile
+from storage_cache import site_key, read_state
+from pagination import DEFAULT_CONCURRENCY, MAX_PAGES
+from watch import WatchStore, watch_key, diff_listings, WATCH_INTERVAL
+import scraper
+from scraper import console, add_search_arguments, run_search_cli
+from sites import EBAY, EBAY_BASE_URL, TIME_LEFT_RE, TIME_LEFT_UNITS, parse_time_left
+
+NEWLY_LISTED = '&_sop=10'  # eBay's newest first; auction_only's own _sop=1 is ending soonest
+
+def build_search_url(query, auction_only=False, page_number=1, base_url=EBAY_BASE_URL):
+    return EBAY.search_url(query, page_number, base_url, auction_only=auction_only)
+
+def build_watch_url(query, auction_only=False, page_number=1, base_url=EBAY_BASE_URL):
+    """Search URL of a watch; auction-only watches list newest first so a cycle can stop at a known listing"""
+    url = build_search_url(query, auction_only, page_number, base_url)
+    return re.sub(r'&_sop=\d+', '', url) + NEWLY_LISTED if auction_only else url
+
+async def extract_items_batched(page, max_results):
+    """Extract all result cards with a single page evaluation"""
+    return await scraper.extract_cards(page, EBAY, max_results)
+
+async def extract_items(page, max_results):
+    """Extract result cards one element handle at a time (one round trip per field)"""
+    return await scraper.extract_cards_per_item(page, EBAY, max_results)
+
+async def scrape_results_page(page, url, page_number, max_results, batched=True, state_key=None, metrics=None):
+    return await scraper.scrape_page(EBAY, page, url, page_number, max_results, batched, state_key, metrics)
+
+async def ebay_search(query, max_results=10, headless=False, auction_only=False, batched=True,
+                      concurrency=DEFAULT_CONCURRENCY, base_url=EBAY_BASE_URL, browser=None,
+                      route_profile='text-only', metrics=None, sort=None, pages=None):
+    return await scraper.search(EBAY, query, max_results, browser, batched, concurrency, base_url, route_profile,
+                                metrics, sort, pages, auction_only=auction_only)
+
+def auction_ends(known, last_seen):
+    """URL -> time.time() an auction has ended by, from its time left when it was last seen
+
+    "1T 16Std." leaves out the minutes, so up to one of its smallest unit
+    (an hour) is added.
+    """
+    ends = {}
+    for url, row in known.items():
+        time_left = row.get('TimeLeft', 'N/A')
+        seconds = parse_time_left(time_left)
+        if seconds is not None and url in last_seen:
+            smallest = min(TIME_LEFT_UNITS[unit.lower()] for number, unit in TIME_LEFT_RE.findall(time_left))
+            ends[url] = last_seen[url] + seconds + smallest
+    return ends
+
+async def ebay_watch(query, interval=WATCH_INTERVAL, max_results=10, auction_only=False, base_url=EBAY_BASE_URL,
+                     route_profile='text-only', cycles=None):
+    """Poll a search and yield (cycle, changes, error) with the differences to the listings seen so far
+
+    One browser page is kept for all cycles. Auction-only searches are
+    listed newest first, so a cycle stops paging once it reaches a known
+    listing. Only a page that loaded without cards ends the results; a page
+    that failed to load fails the cycle.
+    A cycle that fails (a timeout, a block) yields its error instead of
+    changes, and polling goes on.
+    """
+    store = WatchStore()
+    key = watch_key(site_key(base_url), query, auction_only)
+    state_key = site_key(base_url)
+    state, consent = read_state(state_key)
+
+    async with async_playwright() as p, open_browser(p, headless=True) as browser:
+        context = await browser.new_context(storage_state=state)
+        await apply_profile(context, route_profile)
         page = await context.new_page()
 
-        try:
-            base_url = f"https://www.ebay.at/sch/i.html?_nkw={query.replace(' ', '+')}&_sacat=0&_from=R40"
-            if auction_only:
-                base_url += "&LH_Auction=1&_sop=1&rt=nc&LH_PrefLoc=3"  # Auction + Newly Listed
-            else:
-                base_url += "&rt=nc&rt=nc&LH_PrefLoc=3"  # Default sort
-
-            await page.goto(base_url, timeout=60000)
-
-            # Handle cookie banner
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            cycle += 1
+            known = store.load(key)
+            rows = []
+            seen = set()
+            complete = False  # Read every result of the search, so whatever is missing is gone
             try:
-                await page.click('button#gdpr-banner-accept', timeout=3000)
-                console.print("[green]✓[/green] Cookies accepted")
-            except PlaywrightTimeoutError:
-                pass
-
-            await page.wait_for_selector('.s-item', timeout=15000)
-            await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await page.wait_for_timeout(2000)
-            
-            results = []
-            items = await page.query_selector_all('.s-item:not(.s-ad)')
-
-            for item in items:
-                try:
-                    if await item.query_selector('.s-item__title--tag'):
-                        continue  # Skip promoted or header items
-
-                    title = await item.evaluate('el => el.querySelector(".s-item__title")?.textContent.trim() || "N/A"')
-                    if 'new listing' in title.lower():
-                        continue
-
-                    price_text = await item.evaluate('el => el.querySelector(".s-item__price")?.textContent.trim() || "N/A"')
-                    clean_price = price_text.replace('EUR', '').replace('€', '').replace(',', '.').replace(' ', '')
-                    if 'bis' in clean_price:
-                        clean_price = clean_price.split('bis')[0].strip()
-                    try:
-                        price_value = float(clean_price)
-                    except ValueError:
-                        price_value = 0.0
-
-                    condition = await item.evaluate('el => el.querySelector(".s-item__subtitle")?.textContent.trim() || "N/A"')
-                    shipping = await item.evaluate('el => el.querySelector(".s-item__shipping")?.textContent.trim() || "N/A"')
-                    url = await item.evaluate('''
-                        el => {
-                            const link = el.querySelector(".s-item__link");
-                            return link ? link.href.split("?")[0] : "N/A";
-                        }
-                    ''')
-
-                    bids = await item.evaluate('el => el.querySelector(".s-item__bids")?.textContent.trim() || "N/A"')
-                    time_left = await item.evaluate('el => el.querySelector(".s-item__time-left")?.textContent.trim() || "N/A"')
-                    location = await item.evaluate('el => el.querySelector(".s-item__location")?.textContent.trim() || "N/A"')
-
-                    results.append({
-                        'Title': title,
-                        'Price': price_text,
-                        'PriceValue': price_value,
-                        'Condition': condition,
-                        'Shipping': shipping,
-                        'Bids': bids,
-                        'TimeLeft': time_left,
-                        'Location': location,
-                        'URL': url
-                    })
-
-                    if len(results) >= max_results:
+                for page_number in range(1, MAX_PAGES + 1):
+                    url = build_watch_url(query, auction_only, page_number, base_url)
+                    page_rows = await scrape_results_page(page, url, page_number, max_results,
+                                                          state_key=None if consent else state_key)
+                    consent = True
+                    for row in page_rows:
+                        if row['URL'] not in seen:
+                            seen.add(row['URL'])
+                            rows.append(row)
+                    if auction_only and any(r['URL'] in known for r in page_rows):
+                        break  # Everything after this is older and already known
+                    if not page_rows:  # The page loaded without cards: past the last result page (timeouts raise)
+                        complete = True
                         break
+                    if len(rows) >= max_results:
+                        break
+            except Exception as e:
+                yield cycle, [], f"{type(e).__name__}: {e}"
+            else:
+                rows = rows[:max_results]
+                changes = diff_listings(known, rows, complete, auction_ends(known, store.last_seen(key)))
+                store.update(key, rows, [c['URL'] for c in changes if c['Change'] == 'ended'])
+                yield cycle, changes, None
 
-                except Exception as e:
-                    console.print(f"[red]Error parsing item: {e}[/red]")
-                    continue
-
-               
-            sorted_results = sorted(results, key=lambda x: x['PriceValue'], reverse=True)
-            return sorted_results
-
-        finally:
-            await browser.close()
+            if cycles is None or cycle < cycles:
+                await asyncio.sleep(interval)
 
 def display_results(results):
-    table = Table(
-        show_header=True,
-        header_style="bold cyan",
-        box=None,
-        show_lines=False,
-        padding=(0, 1)
-    )
-
-    table.add_column("Price", justify="right", width=15)
-    table.add_column("Title", width=50)
-    table.add_column("Condition", width=18)
-    table.add_column("Shipping", width=18)
-    table.add_column("Bids", width=8, justify="center")
-    table.add_column("Time Left", width=18)
-    table.add_column("Location", width=18)
-    table.add_column("URL", width=40, no_wrap=True)
-
-    for item in results:
-        table.add_row(
-            item['Price'],
-            item['Title'],
-            item['Condition'],
-            item['Shipping'],
-            item['Bids'],
-            item['TimeLeft'],
-            item['Location'],
-            item['URL'][:40] + '...' if len(item['URL']) > 40 else item['URL']
-        )
-
-    console.print(table)
-
-def export_results(results, output_path, fmt='json'):
-    path = Path(output_path)
-    if fmt == 'json':
-        with path.open('w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-            f.close()
-        console.print(f"[blue]✓ Exported results to[/blue] {path.resolve()}")
-    elif fmt == 'csv':
-        with path.open('w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=results[0].keys())
-            writer.writeheader()
-            writer.writerows(results)
-            f.close()
-
-        console.print(f"[blue]✓ Exported results to[/blue] {path.resolve()}")
-    else:
-        console.print(f"[red]✗ Unsupported export format: {fmt}[/red]")
-
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='eBay.at Search CLI')
-    parser.add_argument('query', help='Search term')
-    parser.add_argument('--max', type=int, default=5, help='Max number of results')
-    parser.add_argument('--headless', action='store_true', help='Run browser headlessly')
-    parser.add_argument('--export', help='Export results to file (JSON or CSV)')
-    parser.add_argument('--auction-only', action='store_true', help='Only show auction listings (newest first)')
-
-    args = parser.parse_args()
-
-    console.print(f"\n🔍 Searching eBay.at for [bold yellow]{args.query}[/bold yellow]...")
-    results = asyncio.run(ebay_search(
+    scraper.display_results(EBAY, results)
+
+def export_results(results, output_path, fmt=None, append=False, compression=None, metrics=None):
+    scraper.export_results(EBAY, results, output_path, fmt, append, compression, metrics)
+
+CHANGE_STYLES = {'new': 'green', 'price': 'yellow', 'bids': 'cyan', 'ended': 'red'}
+
+def display_changes(cycle, changes):
+    stamp = time.strftime('%H:%M:%S')
+    if not changes:
+        console.print(f"[dim]{stamp} cycle {cycle}: no changes[/dim]")
+        return
+    console.print(f"\n[bold]{stamp} cycle {cycle}: {len(changes)} changes[/bold]")
+    for change in changes:
+        kind = change['Change']
+        was = f" (was {change['Old']})" if change['Old'] is not None else ''
+        value = change['Bids'] if kind == 'bids' else change['Price']
+        console.print(f"[{CHANGE_STYLES[kind]}]{kind.upper():>6}[/{CHANGE_STYLES[kind]}] {value}{was}  {change['Title'][:60]}  {change['URL']}")
+
+async def watch_loop(args):
+    async for cycle, changes, error in ebay_watch(
         query=args.query,
+        interval=args.interval,
         max_results=args.max + 2,
-        headless=args.headless,
-        auction_only=args.auction_only
-    ))
-    display_results(results)
-    console.print(f"\n[bold green]✓ Found {len(results)} results (sorted by price)[/bold green]")
+        auction_only=args.auction_only,
+        base_url=args.base_url,
+        route_profile=args.profile
+    ):
+        if error and args.json:
+            print(f"cycle {cycle} failed: {error}", file=sys.stderr, flush=True)
+        elif error:
+            console.print(f"[red]{time.strftime('%H:%M:%S')} cycle {cycle} failed: {error}[/red]")
+        elif args.json:
+            for change in changes:
+                print(json.dumps({'Cycle': cycle, **change}, ensure_ascii=False), flush=True)
+        else:
+            display_changes(cycle, changes)
+
+DESCRIPTION = 'eBay.at Search CLI'
+
+def add_arguments(parser):
+    add_search_arguments(parser, EBAY)
+    parser.add_argument('--headless', action='store_true', help='Run browser headlessly')
+    parser.add_argument('--auction-only', action='store_true', help='Only show auction listings (newest first)')
+    parser.add_argument('--watch', action='store_true', help='Poll the search and only print what changed')
+    parser.add_argument('--interval', type=int, default=WATCH_INTERVAL, help='Seconds between --watch cycles')
+
+def run_cli(args, parser):
+    if args.watch and not args.batch:
+        if not args.query:
+            parser.error('a search term is required for --watch')
+        console.quiet = args.json
+        console.print(f"\n👀 Watching eBay.at for [bold yellow]{args.query}[/bold yellow] every {args.interval}s...")
+        try:
+            asyncio.run(watch_loop(args))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
 
-    if args.export:
-        fmt = 'csv' if args.export.endswith('.csv') else 'json'
-        export_results(results, args.export, fmt=fmt)
+    run_search_cli(EBAY, parser, args, auction_only=args.auction_only)
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    run_cli(parser.parse_args(), parser)
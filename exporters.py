@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Streaming result exporters: rows are written as they come in
+
+Formats: json (one array), jsonl/ndjson, csv, parquet and arrow (the last
+two need pyarrow). Text formats can be gzip or zstd compressed (zstd needs
+the zstandard package); parquet uses its own column compression. Both are
+only imported once an export needs them.
+"""
+import csv
+import gzip
+import json
+from pathlib import Path
+
+FORMATS = ('json', 'jsonl', 'csv', 'parquet', 'arrow')
+EXTENSIONS = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv',
+              '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+FLOAT_FIELDS = {'PriceValue', 'PriceMax', 'ShippingValue', 'TotalValue'}
+ARROW_BATCH_ROWS = 1024
+
+def guess_format(path):
+    """(format, compression) from a file name like results.csv.gz"""
+    suffixes = Path(path).suffixes
+    compression = None
+    if suffixes and suffixes[-1] in COMPRESSIONS:
+        compression = COMPRESSIONS[suffixes.pop()]
+    fmt = EXTENSIONS.get(suffixes[-1] if suffixes else '', 'json')
+    return fmt, compression
+
+def export_settings(path, fmt=None, compression=None):
+    """(format, compression) for an export, the file name filling in what is not given"""
+    guessed_fmt, guessed_compression = guess_format(path)
+    fmt = fmt or guessed_fmt
+    compression = compression or guessed_compression
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported export format: {fmt}')
+    if fmt == 'arrow' and compression == 'gzip':
+        # Arrow IPC only compresses its buffers with lz4 or zstd
+        raise ValueError('arrow files cannot be gzip compressed, use --compression zstd')
+    return fmt, compression
+
+def open_text(path, append, compression):
+    mode = 'a' if append else 'w'
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError('zstd compression needs the zstandard package (pip install zstandard)') from None
+        return zstandard.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+class JsonExporter:
+    def __init__(self, path, fields, append, compression):
+        if append:
+            raise ValueError('a JSON array cannot be appended to, use jsonl')
+        self.file = open_text(path, False, compression)
+        self.file.write('[')
+        self.count = 0
+
+    def write(self, row):
+        self.file.write(',\n  ' if self.count else '\n  ')
+        self.file.write(json.dumps(row, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        self.file.write('\n]\n' if self.count else ']\n')
+        self.file.close()
+
+class JsonLinesExporter:
+    def __init__(self, path, fields, append, compression):
+        self.file = open_text(path, append, compression)
+
+    def write(self, row):
+        self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class CsvExporter:
+    def __init__(self, path, fields, append, compression):
+        # Only write a header into a new (or empty) file
+        self.header = not (append and Path(path).exists() and Path(path).stat().st_size > 0)
+        self.file = open_text(path, append, compression)
+        self.fields = fields
+        self.writer = None
+        if fields:
+            self.start(fields)
+
+    def start(self, fields):
+        self.writer = csv.DictWriter(self.file, fieldnames=list(fields), extrasaction='ignore')
+        if self.header:
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.writer is None:
+            self.start(row.keys())
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+class ArrowExporter:
+    """Parquet or Arrow IPC file, written one record batch at a time"""
+
+    def __init__(self, path, fields, append, compression, fmt='parquet'):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            import pyarrow.ipc
+        except ImportError:
+            raise RuntimeError(f'{fmt} export needs pyarrow (pip install pyarrow)') from None
+        if append:
+            raise ValueError(f'{fmt} files cannot be appended to, use jsonl or csv')
+        if not fields:
+            raise ValueError(f'{fmt} export needs the list of fields up front')
+        self.schema = pyarrow.schema([
+            (name, pyarrow.float64() if name in FLOAT_FIELDS else pyarrow.string()) for name in fields
+        ])
+        if fmt == 'parquet':
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression=compression or 'snappy')
+        else:
+            options = pyarrow.ipc.IpcWriteOptions(compression=compression) if compression else None
+            self.writer = pyarrow.ipc.new_file(path, self.schema, options=options)
+        self.pyarrow = pyarrow
+        self.pending = []
+
+    def write(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= ARROW_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        columns = {}
+        for field in self.schema:
+            if field.name in FLOAT_FIELDS:
+                columns[field.name] = [None if r.get(field.name) is None else float(r[field.name]) for r in self.pending]
+            else:
+                columns[field.name] = [None if r.get(field.name) is None else str(r[field.name]) for r in self.pending]
+        self.writer.write_batch(self.pyarrow.record_batch(columns, schema=self.schema))
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+class Exporter:
+    """Write rows to a file as they arrive
+
+        with Exporter('out.jsonl.gz', fields=EBAY_FIELDS) as export:
+            export.write(row)
+    """
+
+    def __init__(self, path, fmt=None, fields=None, append=False, compression=None):
+        self.path = Path(path)
+        self.fmt, compression = export_settings(path, fmt, compression)
+        self.rows = 0
+        if self.fmt == 'json':
+            self.backend = JsonExporter(self.path, fields, append, compression)
+        elif self.fmt == 'jsonl':
+            self.backend = JsonLinesExporter(self.path, fields, append, compression)
+        elif self.fmt == 'csv':
+            self.backend = CsvExporter(self.path, fields, append, compression)
+        else:
+            self.backend = ArrowExporter(self.path, fields, append, compression, self.fmt)
+
+    def write(self, row):
+        self.backend.write(row)
+        self.rows += 1
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def record_writer(exporter):
+    """on_record callback for run_batch() that exports every row of a finished job, tagged with its query"""
+    def write(record):
+        if record['ok']:
+            for row in record['results']:
+                exporter.write({'Query': record['job'], **row})
+    return write
+
+def add_export_arguments(parser):
+    parser.add_argument('--export', help='Export results to file (.json, .jsonl, .csv, .parquet, .arrow; add .gz/.zst to compress)')
+    parser.add_argument('--export-format', choices=FORMATS, help='Export format, if the file name does not tell')
+    parser.add_argument('--compression', choices=['gzip', 'zstd'], help='Compress the export file (parquet/arrow: column compression, arrow only zstd)')
+    parser.add_argument('--append', action='store_true', help='Append to the export file instead of replacing it (jsonl/csv)')
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Per-run performance numbers: time per phase, bytes transferred and peak browser memory
+
+Phase times are summed over all pages of a run. The numbers can be written
+as JSON or in the Prometheus text format, and a Playwright trace is kept
+for every browser context that took longer than a threshold.
+"""
+import sys
+import json
+import time
+from pathlib import Path
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from storage_cache import CACHE_DIR
+
+PHASES = ('launch', 'context', 'navigation', 'consent', 'selector_wait', 'settle', 'extraction', 'export')
+# PhaseTimer marks -> phase names
+TIMER_PHASES = {'navigate': 'navigation', 'consent': 'consent', 'first-card': 'selector_wait',
+                'settled': 'settle', 'extract': 'extraction'}
+TRACE_DIR = CACHE_DIR / 'traces'
+METRIC_FORMATS = ('json', 'prometheus')
+METRIC_OPTIONS = ('--metrics', '--metrics-format', '--trace-slow')
+
+class RunMetrics:
+    def __init__(self, script, trace_slower_than=None, trace_dir=TRACE_DIR):
+        self.script = script
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.phases = defaultdict(float)
+        self.counts = Counter()
+        self.route_stats = set()  # RouteStats of contexts still open
+        self.finished_requests = 0
+        self.finished_bytes = 0
+        self.peak_heap_used = 0
+        self.peak_heap_total = 0
+        self.memory_samples = 0
+        self.trace_slower_than = trace_slower_than
+        self.trace_dir = Path(trace_dir)
+        self.trace_started = {}
+        self.traces = []
+
+    def add(self, phase, seconds):
+        phase = TIMER_PHASES.get(phase, phase)
+        self.phases[phase] += seconds
+        self.counts[phase] += 1
+
+    def track_requests(self, context, route_stats):
+        """Count the requests and bytes of a context (the RouteStats from apply_profile)
+
+        Once the context closes its numbers are added to the totals and the
+        RouteStats let go, so a long-running service doesn't keep them all.
+        """
+        self.route_stats.add(route_stats)
+
+        def closed(*args):
+            self.route_stats.discard(route_stats)
+            self.finished_requests += route_stats.requests
+            self.finished_bytes += route_stats.bytes_loaded
+
+        context.once('close', closed)
+
+    @property
+    def requests(self):
+        return self.finished_requests + sum(stats.requests for stats in self.route_stats)
+
+    @property
+    def bytes_transferred(self):
+        return self.finished_bytes + sum(stats.bytes_loaded for stats in self.route_stats)
+
+    async def sample_memory(self, page):
+        """Keep the largest JS heap seen so far, read over CDP (Chromium only)"""
+        self.memory_samples += 1
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            await cdp.send('Performance.enable')
+            values = {m['name']: m['value'] for m in (await cdp.send('Performance.getMetrics'))['metrics']}
+            await cdp.detach()
+        except Exception:
+            return  # Not Chromium, or the page went away
+        self.peak_heap_used = max(self.peak_heap_used, int(values.get('JSHeapUsedSize', 0)))
+        self.peak_heap_total = max(self.peak_heap_total, int(values.get('JSHeapTotalSize', 0)))
+
+    async def start_trace(self, context):
+        if self.trace_slower_than is None:
+            return
+        await context.tracing.start(screenshots=True, snapshots=True)
+        self.trace_started[id(context)] = time.perf_counter()
+
+    async def stop_trace(self, context, label=''):
+        """Save the context's trace if it ran longer than the threshold, drop it otherwise"""
+        started = self.trace_started.pop(id(context), None)
+        if started is None:
+            return
+        if time.perf_counter() - started < self.trace_slower_than:
+            await context.tracing.stop()
+            return
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        name = '-'.join(filter(None, [self.script, label, time.strftime('%Y%m%d-%H%M%S'), str(len(self.traces))]))
+        path = self.trace_dir / f"{name}.zip"
+        await context.tracing.stop(path=str(path))
+        self.traces.append(str(path))
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def to_dict(self):
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        # The usual phases in pipeline order, then anything a script added
+        phases = [phase for phase in PHASES if phase in self.phases] + [p for p in self.phases if p not in PHASES]
+        return {
+            'script': self.script,
+            'seconds': round(seconds, 4),
+            'phases': {phase: round(self.phases[phase], 4) for phase in phases},
+            'phase_counts': {phase: self.counts[phase] for phase in phases},
+            'requests': self.requests,
+            'bytes_transferred': self.bytes_transferred,
+            'peak_js_heap_used_bytes': self.peak_heap_used,
+            'peak_js_heap_total_bytes': self.peak_heap_total,
+            'traces': self.traces,
+        }
+
+    def to_prometheus(self):
+        data = self.to_dict()
+        script = f'script="{self.script}"'
+        lines = [
+            '# HELP playwright_run_seconds Wall time of the run',
+            '# TYPE playwright_run_seconds gauge',
+            f'playwright_run_seconds{{{script}}} {data["seconds"]}',
+            '# HELP playwright_phase_seconds Time spent in each phase, summed over pages',
+            '# TYPE playwright_phase_seconds gauge',
+        ]
+        lines += [f'playwright_phase_seconds{{{script},phase="{phase}"}} {value}' for phase, value in data['phases'].items()]
+        lines += ['# HELP playwright_phase_count Times each phase ran', '# TYPE playwright_phase_count gauge']
+        lines += [f'playwright_phase_count{{{script},phase="{phase}"}} {value}' for phase, value in data['phase_counts'].items()]
+        lines += [
+            '# HELP playwright_requests Requests finished by the browser',
+            '# TYPE playwright_requests gauge',
+            f'playwright_requests{{{script}}} {data["requests"]}',
+            '# HELP playwright_transferred_bytes Response headers and bodies received',
+            '# TYPE playwright_transferred_bytes gauge',
+            f'playwright_transferred_bytes{{{script}}} {data["bytes_transferred"]}',
+            '# HELP playwright_peak_js_heap_bytes Largest JS heap seen in a page',
+            '# TYPE playwright_peak_js_heap_bytes gauge',
+            f'playwright_peak_js_heap_bytes{{{script},kind="used"}} {data["peak_js_heap_used_bytes"]}',
+            f'playwright_peak_js_heap_bytes{{{script},kind="total"}} {data["peak_js_heap_total_bytes"]}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        data = self.to_dict()
+        parts = ', '.join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in data['phases'].items())
+        return (f"{data['seconds']:.2f}s ({parts}); {data['requests']} requests, "
+                f"{data['bytes_transferred'] / 1024:.0f} KiB, peak heap {data['peak_js_heap_used_bytes'] / 1024 / 1024:.1f} MiB")
+
+    def write(self, path, fmt=None):
+        """Write to path ('-' for stderr); the format follows a .prom/.txt suffix unless given"""
+        fmt = fmt or ('prometheus' if Path(path).suffix in ('.prom', '.txt') else 'json')
+        text = self.to_prometheus() if fmt == 'prometheus' else json.dumps(self.to_dict(), indent=2) + '\n'
+        if path == '-':
+            sys.stderr.write(text)
+        else:
+            Path(path).write_text(text, encoding='utf-8')
+
+@contextmanager
+def timed(metrics, phase):
+    """Add the time spent in the block to a phase; does nothing when metrics is None"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics:
+            metrics.add(phase, time.perf_counter() - start)
+
+def metrics_from_args(script, args):
+    if not (args.metrics or args.trace_slow is not None):
+        return None
+    return RunMetrics(script, args.trace_slow)
+
+def report_metrics(metrics, args):
+    if metrics and args.metrics:
+        metrics.finish().write(args.metrics, args.metrics_format)
+
+def without_metrics_arguments(argv):
+    """argv minus the metrics options, for reruns that must not overwrite this run's metrics"""
+    kept = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in METRIC_OPTIONS:
+            skip = True
+        elif not arg.startswith(tuple(option + '=' for option in METRIC_OPTIONS)):
+            kept.append(arg)
+    return kept
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--metrics', metavar='FILE', help="Write per-phase timings, bytes and peak memory to FILE ('-' for stderr; .prom for Prometheus text)")
+    parser.add_argument('--metrics-format', choices=METRIC_FORMATS, help='Metrics format, if the file name does not tell')
+    parser.add_argument('--trace-slow', type=float, metavar='SECONDS', help=f'Save a Playwright trace of browser contexts slower than this (in {TRACE_DIR})')
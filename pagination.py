@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+import math
+import asyncio
+
+DEFAULT_CONCURRENCY = 4
+MAX_PAGES = 20
+
+def merge_pages(pages, max_results, key='URL'):
+    """Merge per-page rows in page order, dropping listings already seen on an earlier page"""
+    seen = set()
+    merged = []
+    for number in sorted(pages):
+        for row in pages[number]:
+            value = row.get(key, 'N/A')
+            if value != 'N/A':
+                if value in seen:
+                    continue
+                seen.add(value)
+            merged.append(row)
+            if len(merged) >= max_results:
+                return merged
+    return merged
+
+async def fetch_pages(context, scrape_page, max_results, concurrency=DEFAULT_CONCURRENCY, max_pages=MAX_PAGES, key='URL',
+                      ranking=None, failed=None):
+    """Scrape result pages 1..N with a bounded pool of pages in one browser context
+
+    scrape_page(page, page_number) returns the rows of one result page, or an
+    empty list once we are past the last page. Page 1 is fetched on its own so
+    we know how many rows a page holds (and the cookie banner is dealt with
+    once for the whole context); the remaining pages are fetched concurrently.
+
+    Without a ranking the first max_results rows are returned, in page order.
+    With a ranking (a ranking.TopK) every page up to max_pages is pushed into
+    it as it arrives and only its row count is kept; it stops early once the
+    ranking says no later page can change it, and returns its results.
+
+    An error on page 1 is raised. An error on a later page (a timeout, a
+    block, a network error) keeps the rows fetched so far: the results end
+    before that page, and the error is stored in the failed dict under the
+    page number, for the caller to report.
+    """
+    pages = {}
+
+    def add(number, rows):
+        """Store a page, True if no later page can change the ranking"""
+        if ranking is None:
+            pages[number] = rows
+            return False
+        pages[number] = [None] * len(rows)
+        return ranking.add_page(rows)
+
+    def result():
+        if ranking is not None:
+            return ranking.results()
+        return merge_pages({n: rows for n, rows in pages.items() if n <= last_page}, max_results, key)
+
+    first = await context.new_page()
+    try:
+        last_page = 1 if add(1, await scrape_page(first, 1)) else max_pages
+    finally:
+        await first.close()
+
+    per_page = len(pages[1])
+    if per_page == 0 or last_page == 1 or (ranking is None and len(merge_pages(pages, max_results, key)) >= max_results):
+        return result()
+
+    # Guess how many pages we need; duplicates across pages can make it fall
+    # short, in which case the workers keep going until max_pages. A ranking
+    # needs all of them.
+    wanted = max_pages if ranking is not None else min(max_pages, 1 + math.ceil((max_results - per_page) / per_page))
+    queue = list(range(2, max_pages + 1))
+    done = asyncio.Event()
+
+    def enough():
+        # Only count pages that are contiguous from page 1, so the result is
+        # the same as reading the pages one after another
+        contiguous = {}
+        for number in range(1, last_page + 1):
+            if number not in pages:
+                break
+            contiguous[number] = pages[number]
+        if len(contiguous) >= last_page:
+            return True
+        return ranking is None and len(merge_pages(contiguous, max_results, key)) >= max_results
+
+    async def worker():
+        nonlocal last_page
+        page = await context.new_page()
+        try:
+            while queue and not done.is_set():
+                number = queue.pop(0)
+                if number > last_page:
+                    break
+                try:
+                    rows = await scrape_page(page, number)
+                except Exception as e:
+                    if failed is not None:
+                        failed[number] = e
+                    last_page = min(last_page, number - 1)
+                    if enough():
+                        done.set()
+                    continue
+                if add(number, rows):
+                    last_page = min(last_page, number)
+                if not rows:
+                    last_page = min(last_page, number - 1)
+                if enough():
+                    done.set()
+        finally:
+            await page.close()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, wanted - 1)))]
+    try:
+        waiter = asyncio.create_task(done.wait())
+        await asyncio.wait(workers + [waiter], return_when=asyncio.FIRST_COMPLETED)
+        if not done.is_set():
+            # Let the remaining workers drain the queue
+            await asyncio.gather(*workers)
+        waiter.cancel()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    return result()
@@ -1,62 +1,64 @@
-import re
 import sys
-from playwright.sync_api import Playwright, sync_playwright, expect
-
-
-def run(playwright: Playwright) -> None:
-    trackingNumber: str = sys.argv[1]
-    print(f'Connecting To Server')
-    browser = playwright.chromium.launch(headless=True)
-    context = browser.new_context()
-    page = context.new_page()
-    page.goto("https://www.post.at/en")
-    print('Connection Successfully')
-    page.get_by_role("button", name="Use website with required").click()
-    print('Ignoring US Cookies')
-    page.get_by_label("", exact=True).click()
-    print('Closing Login Window')
-    page.get_by_label("", exact=True).fill(trackingNumber)
-    page.get_by_role("button", name="Submit query").click()
-    print(f'Requesting Number: {trackingNumber}')
-    page.get_by_role("button", name="Close dialogue box").click()
-    info = page.get_by_label("Ergebnis Sendungsverfolgung").locator("div").filter(has_text="Item detailsTracking number:").all_text_contents()
-    #page.get_by_label("Ergebnis Sendungsverfolgung").locator("div").filter(has_text="Item detailsTracking number:")
-    # ---------------------
-    context.close()
-    browser.close()
-
-    for i in info:
-        print(i
-            .replace(',', '\n')
-            .replace('Show senderDestination postcode:', '\n  ')
-            .replace('Sender:', ' ')
-            .replace('Postal code 2005', 'Postal code 2005 ')
-            .replace('Item detailsTracking number:', 'Item detailsTracking number: ')
-            .replace('cm', 'cm ').replace('kg', 'kg\n  ')
-            .replace('The sender has provided electronic shipment information', ' The sender has provided electronic shipment information ')
-            .replace('AT', '')
-            .replace(f'Item detailsTracking number: {trackingNumber}', '')
-            .replace('Item delivered to consignee', '\nItem delivered to consignee ')
-            .replace('Postal code 1700', 'Postal code 1700 ')
-            .replace('Postal code 1220', 'Postal code 1220 ')
-            .replace('Item is out for delivery', ' Item is out for delivery ')
-            .replace('Item distributed', ' Item distributed ')
-            .replace('Item delivered', ' Item delivered')
-            .replace('Show destination postcode', 'Show destination postcode INSERT-VARIABLE-HERE ')
-            .replace('Weight', 'Weight ')
-            .replace('Jan', ' Jan ')
-            .replace('Feb', ' Feb ')
-            .replace('Mar', ' Mar ')
-            .replace('Apr', ' Apr ')
-            .replace('May', ' May ')
-            .replace('Jun', ' Jun ')
-            .replace('Jul', ' Jul ')
-            .replace('Aug', ' Aug ')
-            .replace('Sep', ' Sep ')
-            .replace('Oct', ' Oct ')
-            .replace('Nov', ' Nov ')
-            .replace('Dec', ' Dec ')
-            .replace('Dimensions', ' Dimensions '))
-
-with sync_playwright() as playwright:
-    run(playwright)
+import json
+import asyncio
+import argparse
+from playwright.async_api import async_playwright
+from browser_pool import open_browser
+from batch import add_batch_arguments, read_jobs, run_batch
+from tracking import POST_URL, TRACKING_TABS, TrackingSession, format_tracking
+from metrics import metrics_from_args, report_metrics, add_metrics_arguments
+
+
+async def track_numbers(numbers, tabs=TRACKING_TABS, as_json=False, metrics=None, url=POST_URL):
+    """Look up all numbers in one consent-accepted session, printing each as soon as it is done"""
+    print(f'Connecting To Server', file=sys.stderr)
+    async with async_playwright() as playwright, open_browser(playwright, headless=True, args=None, metrics=metrics) as browser:
+        async with TrackingSession(browser, min(tabs, len(numbers)), metrics, url) as session:
+            print('Connection Successfully', file=sys.stderr)
+
+            async def lookup(trackingNumber):
+                print(f'Requesting Number: {trackingNumber}', file=sys.stderr)
+                return await session.track(trackingNumber)
+
+            for finished in asyncio.as_completed([lookup(number) for number in numbers]):
+                details = await finished
+                if as_json:
+                    print(json.dumps(details, ensure_ascii=False))
+                else:
+                    print('\n'.join(format_tracking(details)))
+
+async def track_batch(args, metrics=None):
+    """Look up every tracking number of the batch file in one session, streaming NDJSON"""
+    async with async_playwright() as playwright, open_browser(playwright, headless=True, args=None, metrics=metrics) as browser:
+        async with TrackingSession(browser, args.tabs, metrics, args.url) as session:
+            return await run_batch(read_jobs(args.batch), session.track, args.jobs, args.timeout, args.retries)
+
+DESCRIPTION = 'post.at Tracking Lookup'
+
+def add_arguments(parser):
+    parser.add_argument('numbers', nargs='*', help='Tracking numbers')
+    parser.add_argument('--tabs', type=int, default=TRACKING_TABS, help='Tabs the lookups are spread over (1 = one after another)')
+    parser.add_argument('--json', action='store_true', help='Print one JSON object per tracking number')
+    parser.add_argument('--url', default=POST_URL, help='Tracking page (e.g. a local fixture server)')
+    add_batch_arguments(parser)
+    add_metrics_arguments(parser)
+
+def run_cli(args, parser):
+    metrics = metrics_from_args('post', args)
+
+    if args.batch:
+        succeeded, failed = asyncio.run(track_batch(args, metrics))
+        report_metrics(metrics, args)
+        sys.exit(1 if failed else 0)
+    if not args.numbers:
+        parser.error('a tracking number or --batch is required')
+
+    asyncio.run(track_numbers(args.numbers, args.tabs, args.json, metrics, args.url))
+    if metrics:
+        print(metrics.summary(), file=sys.stderr)
+    report_metrics(metrics, args)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    run_cli(parser.parse_args(), parser)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Locale-aware parsing of marketplace price and shipping strings
+
+"EUR 1.299,00", "1.299,00 €", "EUR 97,19 bis EUR 126,34", "US $1,299.99",
+"+EUR 4,99 Versand" and "Kostenloser Versand" all come out as numbers.
+Anything that is not a price comes out as None instead of 0.0, so it can't
+be ranked as the cheapest item; so does a number among words without a
+currency ("Lieferung bis 12. Okt").
+"""
+import re
+from functools import lru_cache
+from collections import namedtuple
+
+Price = namedtuple('Price', ['min', 'max', 'currency'])
+NO_PRICE = Price(None, None, None)
+
+CURRENCIES = {'EUR': 'EUR', '€': 'EUR', 'US $': 'USD', 'USD': 'USD', '$': 'USD',
+              '£': 'GBP', 'GBP': 'GBP', 'CHF': 'CHF', 'Fr.': 'CHF'}
+# Decimal mark that goes with a currency; other currencies use the caller's
+CURRENCY_DECIMALS = {'USD': '.', 'GBP': '.'}
+_CURRENCY = '|'.join(re.escape(c) for c in sorted(CURRENCIES, key=len, reverse=True))
+_GROUP = r"[.,'\s]"  # \s also covers the (narrow) no-break spaces
+
+# An amount is either digits in groups of three (1.299,00 / 1,299.00 /
+# 1 299,00) or plain digits (1299,00), each with up to two decimals, with
+# an optional currency in front of or after it
+AMOUNT_RE = re.compile(rf'''
+    (?P<before>{_CURRENCY})?\s*
+    (?P<amount>\d{{1,3}}(?:{_GROUP}\d{{3}})+(?:[.,]\d{{1,2}})?|\d+(?:[.,]\d{{1,2}})?)(?!\d)
+    (?:\s*(?P<after>{_CURRENCY}))?
+''', re.VERBOSE)
+# "EUR 1.299,00" (eBay.at) and "1.299,00 €" (Amazon.de) are nearly every
+# price the scrapers see; they and ranges of them skip the general parser
+EURO_RE = re.compile(r'(?:EUR )?(\d{1,3}(?:\.\d{3})+|\d+),(\d\d)(?:[ \u00a0]€)?')
+EURO_RANGE_WORDS = (' bis ', ' - ')
+# A number on its own ("1299"); a bare number next to words or a date ("2 Stück", "bis 12. Okt") is no price
+BARE_RE = re.compile(r'\s*\+?\s*(\d(?:[\d.,\'\s]*\d)?)\s*')
+RANGE_RE = re.compile(r'\s*(?:bis|-|–|to)\s*', re.IGNORECASE)
+FREE_SHIPPING_RE = re.compile(r'kostenlos|gratis|free|versandkostenfrei', re.IGNORECASE)
+SEPARATORS_RE = re.compile(r"['\s]")
+
+def parse_euro(text):
+    """Value of "EUR 1.299,00" or "1.299,00 €", None for any other string"""
+    match = EURO_RE.fullmatch(text)
+    if match is None or not (text[0] == 'E' or text[-1] == '€'):
+        return None
+    return float(match[1].replace('.', '') + '.' + match[2])
+
+new_tuple = tuple.__new__  # Price(...) without its argument handling, which costs as much as the parsing
+
+def to_number(amount, decimal=','):
+    """Float value of an amount like '1.299,00'; decimal is the locale's decimal mark
+
+    With both marks present the last one is the decimal mark. A single mark
+    followed by exactly three digits is a thousands separator unless it is
+    the locale's decimal mark (and appears only once).
+    """
+    amount = SEPARATORS_RE.sub('', amount)
+    last_dot, last_comma = amount.rfind('.'), amount.rfind(',')
+    if last_dot >= 0 and last_comma >= 0:
+        mark = '.' if last_dot > last_comma else ','
+    elif last_dot >= 0 or last_comma >= 0:
+        mark = '.' if last_dot >= 0 else ','
+        if len(amount) - amount.rfind(mark) - 1 == 3 and (mark != decimal or amount.count(mark) > 1):
+            mark = None
+    else:
+        mark = None
+
+    if mark is None:
+        return float(amount.replace('.', '').replace(',', ''))
+    whole, _, fraction = amount.rpartition(mark)
+    return float(whole.replace('.', '').replace(',', '') + '.' + fraction)
+
+@lru_cache(maxsize=65536)
+def parse_price(text, decimal=','):
+    """Price(min, max, currency) of a price string; a range ('bis', '-') gives min < max
+
+    Only amounts with a currency count ("2 Stück EUR 5,00" is 5), unless
+    the string is nothing but a number. A second amount only counts when a
+    range word joins the two.
+    """
+    match = EURO_RE.fullmatch(text)
+    if match is not None and (text[0] == 'E' or text[-1] == '€'):
+        value = float(match[1].replace('.', '') + '.' + match[2])
+        return new_tuple(Price, (value, value, 'EUR'))
+    for word in EURO_RANGE_WORDS:
+        first, found, second = text.partition(word)
+        if found:
+            low, high = parse_euro(first), parse_euro(second)
+            if low is not None and high is not None:
+                return new_tuple(Price, (min(low, high), max(low, high), 'EUR'))
+
+    matches = [m for m in AMOUNT_RE.finditer(text) if m['before'] or m['after']]
+    if not matches:
+        bare = BARE_RE.fullmatch(text)
+        matches = [AMOUNT_RE.fullmatch(bare[1])] if bare else []
+        if not matches or matches[0] is None:
+            return NO_PRICE
+    first = matches[0]
+    currency = CURRENCIES.get(first['before'] or first['after'])
+    decimal = CURRENCY_DECIMALS.get(currency, decimal)
+    low = high = to_number(first['amount'], decimal)
+    if len(matches) > 1 and RANGE_RE.fullmatch(text, first.end(), matches[1].start()):
+        second = matches[1]
+        value = to_number(second['amount'], decimal)
+        low, high = min(low, value), max(high, value)
+        currency = currency or CURRENCIES.get(second['before'] or second['after'])
+    return Price(low, high, currency)
+
+@lru_cache(maxsize=4096)
+def parse_shipping(text, decimal=','):
+    """Shipping cost of a shipping string, 0.0 for free shipping and None when it names no cost
+
+    A cost needs a currency: "Lieferung bis 12. Okt" is no cost of 12.
+    """
+    if FREE_SHIPPING_RE.search(text):
+        return 0.0
+    price = parse_price(text, decimal)
+    return price.min if price.currency else None
+
+def parse_prices(texts, decimal=','):
+    """Price for every string; repeated strings (most of them, on result pages) are parsed once"""
+    return [parse_price(text, decimal) for text in texts]
+
+def total(price, shipping):
+    """Price plus shipping, None unless both are known"""
+    if price is None or shipping is None:
+        return None
+    return round(price + shipping, 2)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Streaming top-K selection of result rows, so ranking many pages keeps only K rows in memory"""
+import heapq
+import itertools
+from collections import namedtuple
+
+# key(row) gives the number to rank by, or None (such rows only fill places
+# no ranked row takes). site_order is the search URL suffix that makes the
+# site list results in the same order itself, None if it has none; only
+# then can a ranking stop before the last page.
+Sort = namedtuple('Sort', ['key', 'descending', 'site_order'], defaults=[None])
+
+class TopK:
+    """The best k rows pushed so far, in a bounded heap
+
+    heap[0] is the worst row kept, so a push is O(log k). Ties go to the row
+    pushed first, like a stable sort would. Rows whose unique field (URL)
+    was pushed before are ignored.
+    """
+
+    def __init__(self, k, sort, unique='URL'):
+        self.k = k
+        self.sort = sort
+        self.unique = unique
+        self.heap = []  # (score, -sequence, row)
+        self.unranked = []
+        self.seen = set()
+        self.sequence = itertools.count()
+
+    def score(self, value):
+        """Bigger is better, whichever the direction of the sort"""
+        return value if self.sort.descending else -value
+
+    def full(self):
+        return len(self.heap) >= self.k
+
+    def push(self, row):
+        """Offer one row, True if it is among the best k for now"""
+        value = row.get(self.unique, 'N/A')
+        if value != 'N/A':
+            if value in self.seen:
+                return False
+            self.seen.add(value)
+        if self.k <= 0:
+            return False
+
+        key = self.sort.key(row)
+        if key is None:
+            if len(self.unranked) < self.k:
+                self.unranked.append(row)
+                return True
+            return False
+        entry = (self.score(key), -next(self.sequence), row)
+        if not self.full():
+            heapq.heappush(self.heap, entry)
+            return True
+        if entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+            return True
+        return False
+
+    def add_page(self, rows):
+        """Push the rows of one result page, True once no later page can change the ranking
+
+        That is only known when the site lists results in this order: the
+        rows of any later page are no better than the worst row of this one,
+        so if that one is no better than the worst row kept, we are done.
+        """
+        for row in rows:
+            self.push(row)
+        if self.sort.site_order is None or not self.full():
+            return False
+        scores = [self.score(key) for key in map(self.sort.key, rows) if key is not None]
+        return bool(scores) and min(scores) <= self.heap[0][0]
+
+    def results(self):
+        """The kept rows, best first, then rows without a key"""
+        ranked = [row for score, sequence, row in sorted(self.heap, key=lambda entry: entry[:2], reverse=True)]
+        return ranked + self.unranked[:self.k - len(ranked)]
+
+def rank(rows, sort, k=None):
+    """The best k (default: all) rows of a list, best first"""
+    ranking = TopK(len(rows) if k is None else k, sort)
+    for row in rows:
+        ranking.push(row)
+    return ranking.results()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import time
+from storage_cache import site_key
+from scheduler import Blocked, BLOCK_SELECTORS, check_response
+
+FIRST_CARD_TIMEOUT = 15000
+LATER_PAGE_TIMEOUT = 5000
+QUIET_MS = 300
+STABLE_ROUNDS = 3
+STEP_INTERVAL_MS = 100
+SETTLE_TIMEOUT_MS = 5000
+
+# Scrolls one viewport per step and returns as soon as the card count has
+# held steady for a few steps, the DOM has had no mutations for a while, or
+# enough cards are there. Runs entirely in the page, so it is one round trip.
+SETTLE_JS = '''
+async ([selector, maxResults, quietMs, stableRounds, intervalMs, timeoutMs]) => {
+    const start = performance.now();
+    let lastMutation = start;
+    const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+    observer.observe(document.body, {childList: true, subtree: true});
+    let count = -1;
+    let stable = 0;
+    try {
+        while (true) {
+            const now = document.querySelectorAll(selector).length;
+            if (now >= maxResults) return {reason: 'max-results', cards: now};
+            stable = now === count ? stable + 1 : 0;
+            count = now;
+            if (stable >= stableRounds) return {reason: 'count-stable', cards: count};
+            if (performance.now() - lastMutation >= quietMs) return {reason: 'dom-quiet', cards: count};
+            if (performance.now() - start >= timeoutMs) return {reason: 'timeout', cards: count};
+            window.scrollBy(0, window.innerHeight);
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    } finally {
+        observer.disconnect();
+    }
+}
+'''
+
+class PhaseTimer:
+    """Milliseconds spent in each phase of loading one result page"""
+
+    def __init__(self, label='', metrics=None):
+        self.label = label
+        self.metrics = metrics
+        self.phases = {}
+        self.last = time.perf_counter()
+        self.details = {}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self.last) * 1000, 1)
+        if self.metrics:
+            self.metrics.add(phase, now - self.last)
+        self.last = now
+
+    def summary(self):
+        parts = ', '.join(f"{phase} {ms:.0f}ms" for phase, ms in self.phases.items())
+        extra = ''
+        if self.details:
+            extra = f" ({self.details.get('reason')}, {self.details.get('cards')} cards)"
+        return f"{self.label}: {parts}{extra}" if self.label else parts + extra
+
+async def navigate(page, url, timer, wait_until='domcontentloaded'):
+    """Go to url without waiting for the full load event; raises Blocked on a block status or captcha redirect
+
+    Run it inside scheduler.request(url), together with wait_for_cards(),
+    so the page only counts as a success once its cards are there.
+    """
+    response = await page.goto(url, wait_until=wait_until, timeout=60000)
+    timer.mark('navigate')
+    check_response(page.url, response)
+
+async def wait_for_cards(page, selector, timer, timeout=FIRST_CARD_TIMEOUT, block_selectors=BLOCK_SELECTORS,
+                         allow_empty=False):
+    """Wait for the first card, or raise Blocked as soon as a robot check shows up instead
+
+    selector has to be plain CSS: it tells the card from a block marker.
+    Cards are server-rendered, so with allow_empty a loaded page that has
+    neither cards nor a robot check is past the last result page: returns
+    False right away. Running into the timeout always raises.
+    """
+    markers = ', '.join([selector, *block_selectors])
+    if allow_empty and not await page.locator(markers).count():
+        timer.mark('first-card')
+        return False
+    if not block_selectors:
+        await page.wait_for_selector(selector, state='attached', timeout=timeout)
+    else:
+        found = await page.wait_for_selector(markers, state='attached', timeout=timeout)
+        if not await found.evaluate('(el, selector) => el.matches(selector)', selector):
+            timer.mark('blocked')
+            raise Blocked(f"{site_key(page.url)} served a robot check instead of results")
+    timer.mark('first-card')
+    return True
+
+async def settle(page, selector, max_results, timer, quiet_ms=QUIET_MS, stable_rounds=STABLE_ROUNDS,
+                 interval_ms=STEP_INTERVAL_MS, timeout_ms=SETTLE_TIMEOUT_MS):
+    """Scroll until the result list stops changing, instead of sleeping a fixed time"""
+    result = await page.evaluate(SETTLE_JS, [selector, max_results, quiet_ms, stable_rounds, interval_ms, timeout_ms])
+    timer.mark('settled')
+    timer.details.update(result)
+    return result
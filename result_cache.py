@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""On-disk cache of search results, shared by all runs on this machine
+
+Entries younger than the TTL are served as they are. Older ones (up to the
+stale TTL) are still served right away while a refresh runs in the
+background; anything older is fetched again. The least recently used
+entries are dropped once there are more than max_entries.
+"""
+import sys
+import json
+import argparse
+import time
+import asyncio
+import sqlite3
+import subprocess
+from storage_cache import CACHE_DIR
+
+CACHE_DB = CACHE_DIR / 'results.sqlite3'
+RESULT_TTL = 15 * 60
+STALE_TTL = 6 * 3600
+MAX_ENTRIES = 1000
+REFRESH_GRACE = 120  # Don't start another refresh of an entry while one is this recent
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+def cache_key(site, query, auction_only=False, max_results=10, sort=None, pages=None, adapter=None):
+    """adapter tells sites apart that were pointed at the same base URL (a fixture server)"""
+    return json.dumps([adapter, site, normalize_query(query), bool(auction_only), int(max_results), sort, pages])
+
+class ResultCache:
+    def __init__(self, path=CACHE_DB, ttl=RESULT_TTL, stale_ttl=STALE_TTL, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.pending = set()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            results TEXT NOT NULL,
+            created REAL NOT NULL,
+            last_used REAL NOT NULL,
+            refreshing REAL NOT NULL DEFAULT 0
+        )''')
+
+    def get(self, key):
+        """Returns (results, age in seconds), or (None, None) when there is no usable entry"""
+        row = self.db.execute('SELECT results, created FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None, None
+        age = time.time() - row[1]
+        if age > self.stale_ttl:
+            return None, None
+        self.db.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0]), age
+
+    def put(self, key, results):
+        now = time.time()
+        self.db.execute('INSERT OR REPLACE INTO results (key, results, created, last_used) VALUES (?, ?, ?, ?)',
+                        (key, json.dumps(results, ensure_ascii=False), now, now))
+        self.db.execute('DELETE FROM results WHERE key NOT IN '
+                        '(SELECT key FROM results ORDER BY last_used DESC LIMIT ?)', (self.max_entries,))
+
+    def claim_refresh(self, key):
+        """True if the caller should refresh the entry (nobody else started doing so recently)"""
+        now = time.time()
+        cursor = self.db.execute('UPDATE results SET refreshing = ? WHERE key = ? AND refreshing < ?',
+                                 (now, key, now - REFRESH_GRACE))
+        return cursor.rowcount == 1
+
+    async def drain(self):
+        """Wait for in-process background refreshes, call before closing their browser"""
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+
+    def summary(self):
+        return f"cache: {self.hits} hits ({self.stale_hits} stale), {self.misses} misses"
+
+    def close(self):
+        self.db.close()
+
+async def cached(cache, key, search, refresh=False, revalidate=None):
+    """Results for key from the cache, or from await search() (stored for next time)
+
+    cache may be None to bypass it entirely; refresh=True skips the lookup but
+    stores the fresh results. For a stale entry revalidate() is called to
+    refresh it in the background; it defaults to an in-process task, which
+    only makes sense for long-running callers.
+    """
+    if cache is None:
+        return await search()
+
+    if not refresh:
+        results, age = cache.get(key)
+        if results is not None:
+            cache.hits += 1
+            if age > cache.ttl:
+                cache.stale_hits += 1
+                if cache.claim_refresh(key):
+                    if revalidate:
+                        revalidate()
+                    else:
+                        task = asyncio.ensure_future(refresh_entry(cache, key, search))
+                        cache.pending.add(task)
+                        task.add_done_callback(cache.pending.discard)
+            return results
+
+    cache.misses += 1
+    results = await search()
+    cache.put(key, results)
+    return results
+
+async def refresh_entry(cache, key, search):
+    cache.put(key, await search())
+
+def revalidate_in_subprocess(script_args):
+    """Background refresh for one-shot CLI runs: rerun the script detached with --revalidate
+
+    --revalidate only stores fresh results in the cache; the rerun prints,
+    exports and appends nothing, whatever else script_args asks for.
+    """
+    def start():
+        subprocess.Popen(
+            [sys.executable, sys.argv[0], *script_args, '--revalidate'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    return start
+
+def add_cache_arguments(parser):
+    parser.add_argument('--no-cache', action='store_true', help='Neither read nor write the result cache')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached results and store fresh ones')
+    parser.add_argument('--cache-ttl', type=int, default=RESULT_TTL, help='Seconds cached results count as fresh')
+    # What a stale cache hit runs in the background: refresh the entry, no output or export
+    parser.add_argument('--revalidate', action='store_true', help=argparse.SUPPRESS)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+from collections import Counter
+from urllib.parse import urlparse
+
+# Ad, analytics and tracking hosts (matched on the host and all its subdomains)
+TRACKER_DOMAINS = {
+    'google-analytics.com', 'googletagmanager.com', 'googletagservices.com', 'doubleclick.net',
+    'googlesyndication.com', 'googleadservices.com', 'adservice.google.com', 'facebook.net',
+    'connect.facebook.net', 'scorecardresearch.com', 'criteo.com', 'criteo.net', 'amazon-adsystem.com',
+    'adnxs.com', 'hotjar.com', 'taboola.com', 'outbrain.com', 'bat.bing.com', 'quantserve.com',
+    'fls-eu.amazon.de', 'unagi.amazon.de', 'unagi-eu.amazon.com', 'tealiumiq.com', 'tiqcdn.com',
+}
+
+# Name -> resource types to abort and whether tracker hosts are aborted
+ROUTE_PROFILES = {
+    'text-only': {'block_types': {'image', 'media', 'font', 'stylesheet', 'texttrack', 'manifest', 'eventsource', 'websocket'},
+                  'block_trackers': True},
+    'no-media': {'block_types': {'image', 'media', 'font'}, 'block_trackers': True},
+    'full': {'block_types': set(), 'block_trackers': False},
+}
+
+# Rough median transfer size per request type, only used to estimate what the
+# aborted requests would have cost (we never see their real size)
+ESTIMATED_BYTES = {
+    'image': 15_000, 'media': 400_000, 'font': 25_000, 'stylesheet': 12_000,
+    'script': 20_000, 'xhr': 2_000, 'fetch': 2_000, 'other': 2_000,
+}
+
+def is_tracker(url):
+    host = urlparse(url).hostname or ''
+    return any(host == domain or host.endswith('.' + domain) for domain in TRACKER_DOMAINS)
+
+class RouteStats:
+    def __init__(self, profile):
+        self.profile = profile
+        self.requests = 0
+        self.bytes_loaded = 0
+        self.blocked = Counter()
+
+    @property
+    def bytes_saved(self):
+        return sum(ESTIMATED_BYTES.get(kind, ESTIMATED_BYTES['other']) * count for kind, count in self.blocked.items())
+
+    def summary(self):
+        return (f"{self.profile}: {self.requests} requests, {self.bytes_loaded / 1024:.0f} KiB loaded, "
+                f"{sum(self.blocked.values())} blocked (~{self.bytes_saved / 1024:.0f} KiB saved)")
+
+async def apply_profile(context, profile='text-only'):
+    """Install the request routing for a profile on a browser context, returns its RouteStats"""
+    rules = ROUTE_PROFILES[profile]
+    stats = RouteStats(profile)
+
+    async def on_finished(request):
+        stats.requests += 1
+        try:
+            sizes = await request.sizes()
+            stats.bytes_loaded += sizes['responseBodySize'] + sizes['responseHeadersSize']
+        except Exception:
+            pass  # Page went away before we asked
+
+    context.on('requestfinished', on_finished)
+
+    if not rules['block_types'] and not rules['block_trackers']:
+        return stats  # Routing every request has a cost of its own, skip it
+
+    async def handle(route):
+        request = route.request
+        if request.resource_type in rules['block_types']:
+            stats.blocked[request.resource_type] += 1
+            await route.abort()
+        elif rules['block_trackers'] and is_tracker(request.url):
+            stats.blocked[request.resource_type] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route('**/*', handle)
+    return stats
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Per-domain request scheduling: adaptive rate limits, block detection and circuit breaking
+
+Every navigation of the scrapers goes through Scheduler.request() (goto()
+for a plain navigation), which waits for its domain's token bucket. A
+request ends when its outcome is known, for a result page once the cards
+or a robot check showed up. The rate goes up a little after every response that
+comes back about as fast as usual and is cut when responses get slow, fail
+or turn out to be a block. A block (403/429/503, a redirect to a captcha
+or a robot check page instead of results) opens the domain's circuit:
+navigations fail right away with CircuitOpen until a backoff has passed,
+then one probe is let through. Each failed probe doubles the backoff.
+
+Rates live in the process and start at SCRAPER_RATE requests per second
+(default 1). Open circuits are also written to
+~/.cache/playwright-scripts/circuits.json, so the next run of a script
+doesn't walk into the same block.
+"""
+import os
+import json
+import time
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from storage_cache import CACHE_DIR, site_key, locked, write_atomic
+
+CIRCUIT_FILE = CACHE_DIR / 'circuits.json'
+START_RATE = float(os.environ.get('SCRAPER_RATE', 1.0))  # Requests per second a domain starts at
+MIN_RATE = 0.1
+MAX_RATE = 10.0
+BURST = 4  # Requests a domain may get at once, e.g. the pages fetched in parallel
+RATE_STEP = 0.2  # Added to the rate after every response that wasn't slow
+SLOW_FACTOR = 2.0  # A response this many times slower than usual counts as a warning
+SLOW_FLOOR = 0.5  # Seconds under which no response counts as slow
+SLOW_CUT = 0.8  # Rate multiplier after a slow response
+ERROR_CUT = 0.5  # Rate multiplier after an error or block
+LATENCY_WEIGHT = 0.2  # Weight of the newest response in the usual latency
+FAILURES_TO_OPEN = 5  # Errors in a row that open the circuit like a block does
+BREAKER_BACKOFF = 30.0  # Seconds a circuit stays open the first time
+MAX_BREAKER_BACKOFF = 900.0
+
+BLOCK_STATUSES = {403: 'forbidden', 429: 'too many requests', 503: 'service unavailable'}
+# Robot checks redirect here (eBay: /splashui/captcha and /splashui/challenge, Amazon: /errors/validateCaptcha)
+BLOCK_URL_MARKERS = ('captcha', '/splashui/challenge')
+# Elements only a robot check page has, waited for together with the result cards (sites add their own)
+BLOCK_SELECTORS = ('form[action*="captcha" i]', 'iframe[src*="captcha" i]')
+
+class Blocked(Exception):
+    """The site answered with a block or robot check instead of the page"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpen(Blocked):
+    """A domain that blocked us is still backing off; nothing was requested"""
+
+def retry_after(response):
+    value = response.headers.get('retry-after', '')
+    return float(value) if value.isdigit() else None
+
+def check_response(url, response):
+    """Raise Blocked if a navigation ended on a block status or a robot check URL"""
+    if response is not None and response.status in BLOCK_STATUSES:
+        raise Blocked(f"{site_key(url)} answered {response.status} ({BLOCK_STATUSES[response.status]})",
+                      retry_after(response))
+    if any(marker in url.lower() for marker in BLOCK_URL_MARKERS):
+        raise Blocked(f"{site_key(url)} redirected to a robot check")
+
+class Domain:
+    """Token bucket, usual latency and circuit breaker of one domain"""
+
+    def __init__(self, name, rate=START_RATE, burst=BURST):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.latency = None
+        self.failures = 0  # Errors in a row
+        self.opened = 0  # Times the circuit opened without a success since
+        self.open_until = 0.0  # time.time() the circuit may be probed again
+        self.probing = False
+        self.counts = Counter()
+
+    def reserve(self):
+        """Take a token, seconds to wait until it is ours
+
+        Tokens may go negative: each waiter reserves the next free slot, so
+        concurrent requests line up without a lock.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def check(self):
+        """Raise CircuitOpen unless a request may go out; the first one after a backoff is the probe"""
+        wait = self.open_until - time.time()
+        if wait > 0:
+            raise CircuitOpen(f"{self.name} is blocking us, backing off for {wait:.0f}s more", wait)
+        if self.opened:
+            if self.probing:
+                raise CircuitOpen(f"{self.name} is blocking us, waiting for a probe request")
+            self.probing = True
+
+    def succeeded(self, seconds):
+        """A response that was not a block; True if it closed the circuit"""
+        self.counts['ok'] += 1
+        self.failures = 0
+        slow = self.latency is not None and seconds > max(SLOW_FLOOR, SLOW_FACTOR * self.latency)
+        self.latency = seconds if self.latency is None else (
+            LATENCY_WEIGHT * seconds + (1 - LATENCY_WEIGHT) * self.latency)
+        if slow:
+            self.counts['slow'] += 1
+            self.rate = max(MIN_RATE, self.rate * SLOW_CUT)
+        else:
+            self.rate = min(MAX_RATE, self.rate + RATE_STEP)
+        closed = self.opened > 0
+        self.opened, self.open_until, self.probing = 0, 0.0, False
+        return closed
+
+    def failed(self, backoff, max_backoff):
+        """An error (timeout, connection); True if it opened the circuit"""
+        self.counts['failed'] += 1
+        self.failures += 1
+        self.rate = max(MIN_RATE, self.rate * ERROR_CUT)
+        if self.failures >= FAILURES_TO_OPEN or self.probing:
+            self.open(backoff, max_backoff)
+            return True
+        return False
+
+    def blocked(self, backoff, max_backoff, retry_after=None):
+        self.counts['blocked'] += 1
+        self.rate = max(MIN_RATE, self.rate * ERROR_CUT)
+        self.open(backoff, max_backoff, retry_after)
+
+    def open(self, backoff, max_backoff, retry_after=None):
+        self.opened += 1
+        seconds = max(min(max_backoff, backoff * 2 ** (self.opened - 1)), retry_after or 0)
+        self.open_until = time.time() + seconds
+        self.probing = False
+
+    def summary(self):
+        state = 'circuit open' if self.opened else f"{self.rate:.1f} req/s"
+        counts = ', '.join(f"{count} {outcome}" for outcome, count in sorted(self.counts.items()))
+        return f"{self.name}: {state}" + (f", {counts}" if counts else '')
+
+class Scheduler:
+    """Domains by site key; path is where open circuits are kept between runs (None: nowhere)"""
+
+    def __init__(self, rate=START_RATE, burst=BURST, backoff=BREAKER_BACKOFF, max_backoff=MAX_BREAKER_BACKOFF,
+                 path=CIRCUIT_FILE):
+        self.rate = rate
+        self.burst = burst
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.path = path
+        self.domains = {}
+
+    def domain(self, url):
+        name = site_key(url)
+        if name not in self.domains:
+            domain = self.domains[name] = Domain(name, self.rate, self.burst)
+            saved = self.read().get(name)
+            if saved:
+                domain.opened, domain.open_until = saved['opened'], saved['open_until']
+                domain.rate = min(domain.rate, saved['rate'])
+        return self.domains[name]
+
+    def read(self):
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with locked(self.path, exclusive=False):
+                return json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, domain):
+        """Record a domain's circuit for later runs, or forget it once it is closed"""
+        if self.path is None:
+            return
+        with locked(self.path):
+            try:
+                circuits = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                circuits = {}
+            if domain.opened:
+                circuits[domain.name] = {'opened': domain.opened, 'open_until': domain.open_until, 'rate': domain.rate}
+            elif circuits.pop(domain.name, None) is None:
+                return
+            write_atomic(self.path, json.dumps(circuits, indent=2))
+
+    @asynccontextmanager
+    async def request(self, url):
+        """Wait for url's domain to allow a request, then record how the request inside went
+
+        Raises CircuitOpen right away while the domain is backing off. A
+        Blocked error raised inside opens the circuit, other errors lower
+        the rate; the time spent inside is the domain's latency.
+        """
+        domain = self.domain(url)
+        domain.check()
+        try:
+            wait = domain.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+            start = time.monotonic()
+            yield domain
+        except CircuitOpen:
+            raise
+        except Blocked as e:
+            domain.blocked(self.backoff, self.max_backoff, e.retry_after)
+            self.save(domain)
+            raise
+        except Exception:
+            if domain.failed(self.backoff, self.max_backoff):
+                self.save(domain)
+            raise
+        else:
+            if domain.succeeded(time.monotonic() - start):
+                self.save(domain)
+        finally:
+            domain.probing = False
+
+    def summary(self, url):
+        return self.domain(url).summary()
+
+SCHEDULER = Scheduler()
+
+async def goto(page, url, scheduler=None, **options):
+    """page.goto() in turn with the other requests to url's domain, failing fast on a block"""
+    scheduler = scheduler or SCHEDULER
+    async with scheduler.request(url):
+        response = await page.goto(url, **options)
+        check_response(page.url, response)
+    return response
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""Shared scraping core: one runner for every marketplace, driven by a SiteAdapter
+
+A SiteAdapter (see sites.py) only says what is different about a site: how
+to build its search URL, which consent button to click, which elements are
+result cards, which fields to read from a card and how to turn them into a
+row. Browser setup, cached consent, request routing, concurrent pagination,
+readiness waits, batched extraction, caching, export and the CLI are shared.
+"""
+import re
+import sys
+import json
+import asyncio
+from pathlib import Path
+from urllib.parse import quote_plus, parse_qsl
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from browser_pool import open_browser, ContextPool
+from routing import ROUTE_PROFILES
+from readiness import PhaseTimer, navigate, wait_for_cards, settle, FIRST_CARD_TIMEOUT, LATER_PAGE_TIMEOUT
+from storage_cache import site_key, write_state
+from scheduler import Blocked, SCHEDULER, BLOCK_SELECTORS
+from pagination import fetch_pages, DEFAULT_CONCURRENCY, MAX_PAGES
+from ranking import TopK, rank
+from batch import add_batch_arguments, read_jobs, run_batch
+from exporters import Exporter, export_settings, record_writer, add_export_arguments
+from result_cache import ResultCache, cache_key, cached, revalidate_in_subprocess, add_cache_arguments
+from metrics import timed, metrics_from_args, report_metrics, add_metrics_arguments, without_metrics_arguments
+
+class LazyConsole:
+    """rich's Console, imported on the first print, so a quiet run (--json, --batch) never loads rich"""
+
+    def __init__(self):
+        self.quiet = False
+        self.console = None
+
+    def print(self, *objects, **options):
+        if self.quiet:
+            return
+        if self.console is None:
+            from rich.console import Console
+            self.console = Console()
+        self.console.print(*objects, **options)
+
+console = LazyConsole()
+
+CONSENT_TIMEOUT = 3000
+ALL_CARDS = 1000  # Row limit per page when every card of a page is ranked
+
+# Reads every card on the page in one round trip instead of one per field.
+# A field is a list of [selector, what] tries, the first non-empty one wins:
+# 'text' is the trimmed textContent, 'href' the absolute link, anything else
+# an attribute. Missing fields are "N/A".
+EXTRACT_CARDS_JS = '''
+(els, [fields, skipSelector]) => els.map(el => {
+    const row = {Skip: !!skipSelector && !!el.querySelector(skipSelector)};
+    for (const [name, tries] of Object.entries(fields)) {
+        row[name] = "N/A";
+        for (const [selector, what] of tries) {
+            const found = el.querySelector(selector);
+            if (!found) continue;
+            const value = what === "text" ? found.textContent.trim()
+                        : what === "href" ? found.href
+                        : (found.getAttribute(what) || "").trim();
+            if (value) { row[name] = value; break; }
+        }
+    }
+    return row;
+})
+'''
+
+# The same for one field of one card, for the per-item path
+READ_FIELD_JS = '''
+(el, tries) => {
+    for (const [selector, what] of tries) {
+        const found = el.querySelector(selector);
+        if (!found) continue;
+        const value = what === "text" ? found.textContent.trim()
+                    : what === "href" ? found.href
+                    : (found.getAttribute(what) || "").trim();
+        if (value) return value;
+    }
+    return "N/A";
+}
+'''
+
+class SiteAdapter:
+    """Everything site-specific about scraping a marketplace's search results
+
+    fields maps a row field to a CSS selector (its text is read) or to a
+    list of (selector, 'text' | 'href' | attribute) tries. build_row() turns
+    the raw fields of a card into a result row, or None to drop the card.
+    options maps a search option to the URL suffix for on and for off.
+    sorts maps a sort name to a ranking.Sort; default_sort is used when
+    none is asked for (None keeps the site's own order). block_selectors
+    are elements of the site's robot check page.
+    table lists (header, field, column options, truncate at) for display.
+    """
+
+    def __init__(self, name, label, base_url, search_path, card_selector, fields, build_row, columns,
+                 ready_selector=None, skip_selector=None, consent_selectors=(), page_param='page',
+                 options=None, sorts=None, default_sort=None, block_selectors=BLOCK_SELECTORS, headless=True, table=(),
+                 table_options=None):
+        self.name = name
+        self.label = label
+        self.base_url = base_url
+        self.search_path = search_path
+        self.card_selector = card_selector
+        self.ready_selector = ready_selector or card_selector
+        self.skip_selector = skip_selector
+        self.consent_selectors = list(consent_selectors)
+        self.page_param = page_param
+        self.fields = {name: [[spec, 'text']] if isinstance(spec, str) else [list(t) for t in spec]
+                       for name, spec in fields.items()}
+        self.build_row = build_row
+        self.columns = columns
+        self.options = options or {}
+        self.sorts = sorts or {}
+        self.default_sort = default_sort
+        self.block_selectors = tuple(block_selectors)
+        self.headless = headless
+        self.table = table
+        self.table_options = table_options or {}
+
+    def search_url(self, query, page_number=1, base_url=None, sort=None, **options):
+        url = (base_url or self.base_url) + self.search_path.format(query=quote_plus(query))
+        for name, (on, off) in self.options.items():
+            url += on if options.get(name) else off
+        if sort and self.sorts[sort].site_order:
+            # The sort's order replaces one an option asked for (eBay auction_only's _sop=1)
+            site_order = self.sorts[sort].site_order
+            for name, value in parse_qsl(site_order.lstrip('&')):
+                url = re.sub(rf'&{re.escape(name)}=[^&]*', '', url)
+            url += site_order
+        if page_number > 1:
+            url += f"&{self.page_param}={page_number}"
+        return url
+
+    def sort(self, rows, sort=None):
+        """Rows best first by a sort name (default: default_sort); rows without a value go last"""
+        sort = sort or self.default_sort
+        if sort is None:
+            return rows
+        return rank(rows, self.sorts[sort])
+
+def collect_rows(adapter, raw_rows, max_results):
+    results = []
+    for raw in raw_rows:
+        if raw.pop('Skip', False):
+            continue
+        row = adapter.build_row(raw)
+        if row is None:
+            continue
+        results.append(row)
+        if len(results) >= max_results:
+            break
+    return results
+
+async def extract_cards(page, adapter, max_results):
+    """Extract all result cards with a single page evaluation"""
+    raw_rows = await page.eval_on_selector_all(adapter.card_selector, EXTRACT_CARDS_JS,
+                                               [adapter.fields, adapter.skip_selector])
+    return collect_rows(adapter, raw_rows, max_results)
+
+async def extract_cards_per_item(page, adapter, max_results):
+    """Extract result cards one element handle at a time (one round trip per field)"""
+    results = []
+    for item in await page.query_selector_all(adapter.card_selector):
+        try:
+            if adapter.skip_selector and await item.query_selector(adapter.skip_selector):
+                continue
+            raw = {}
+            for name, tries in adapter.fields.items():
+                raw[name] = await item.evaluate(READ_FIELD_JS, tries)
+            row = adapter.build_row(raw)
+        except Exception as e:
+            console.print(f"[red]Error parsing item: {e}[/red]")
+            continue
+        if row is None:
+            continue
+        results.append(row)
+        if len(results) >= max_results:
+            break
+    return results
+
+async def accept_consent(page, selectors, timeout=CONSENT_TIMEOUT):
+    """Click the first consent button that shows up, False if none did"""
+    if not selectors:
+        return False
+    try:
+        await page.click(', '.join(selectors), timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+async def scrape_page(adapter, page, url, page_number, max_results, batched=True, state_key=None, metrics=None):
+    """Load one result page and extract its cards
+
+    With state_key set the cookie banner is handled and the resulting
+    storage state cached under that key. Returns [] for a later page that
+    loaded without cards (past the last result page); a page whose cards
+    don't show up in time raises PlaywrightTimeoutError, which counts as a
+    failed request for the scheduler.
+    """
+    timer = PhaseTimer(f"page {page_number}", metrics)
+    # One scheduled request from navigation until the cards (or a robot check) show up
+    async with SCHEDULER.request(url):
+        await navigate(page, url, timer)
+
+        # Handle cookie banner (only shows up once per context, skipped when cached)
+        if state_key:
+            clicked = await accept_consent(page, adapter.consent_selectors)
+            if clicked:
+                console.print("[green]✓[/green] Cookies accepted")
+            write_state(state_key, await page.context.storage_state(), consent=clicked)
+            timer.mark('consent')
+
+        if not await wait_for_cards(page, adapter.ready_selector, timer,
+                                    FIRST_CARD_TIMEOUT if page_number == 1 else LATER_PAGE_TIMEOUT,
+                                    adapter.block_selectors, allow_empty=page_number > 1):
+            return []  # Past the last result page
+
+    # Scroll until the result list stops changing
+    await settle(page, adapter.card_selector, max_results, timer)
+
+    if batched:
+        rows = await extract_cards(page, adapter, max_results)
+    else:
+        rows = await extract_cards_per_item(page, adapter, max_results)
+    timer.mark('extract')
+    console.print(f"[dim]{timer.summary()}[/dim]")
+    if metrics:
+        await metrics.sample_memory(page)
+    return rows
+
+async def search(adapter, query, max_results=10, browser=None, batched=True, concurrency=DEFAULT_CONCURRENCY,
+                 base_url=None, route_profile='text-only', metrics=None, sort=None, pages=None, contexts=None, **options):
+    """Search results of one query, best first by sort (default: the adapter's default_sort)
+
+    Without pages the first max_results rows are read, from as many result
+    pages as that takes, and ranked. With pages the best max_results rows of
+    up to that many pages are kept in a bounded heap as the pages come in;
+    if the site can list results in the sort's order itself, paging stops
+    as soon as no later page can get a row in. A later page that fails is
+    reported and the rows of the pages before it are kept. contexts is a
+    ContextPool of browser to take a warm context from.
+    """
+    base_url = base_url or adapter.base_url
+    sort = sort or adapter.default_sort
+    if browser is None:
+        async with async_playwright() as p, open_browser(p, headless=adapter.headless, metrics=metrics) as browser:
+            return await search(adapter, query, max_results, browser, batched, concurrency, base_url,
+                                route_profile, metrics, sort, pages, **options)
+
+    ranking = TopK(max_results, adapter.sorts[sort]) if sort and pages else None
+    # Without the site's order every card of a page has to be ranked
+    page_limit = ALL_CARDS if ranking and not ranking.sort.site_order else max_results
+
+    state_key = site_key(base_url)
+    contexts = contexts or ContextPool(browser, size=0)  # Without a pool: a new context, nothing kept warm
+    with timed(metrics, 'context'):
+        context, route_stats, consent = await contexts.acquire(state_key, route_profile)
+    if metrics:
+        metrics.track_requests(context, route_stats)
+        await metrics.start_trace(context)
+    try:
+        async def scrape(page, page_number):
+            url = adapter.search_url(query, page_number, base_url, sort, **options)
+            accept_key = state_key if page_number == 1 and not consent else None
+            return await scrape_page(adapter, page, url, page_number, page_limit, batched, accept_key, metrics)
+
+        failed = {}
+        results = await fetch_pages(context, scrape, max_results, concurrency, pages or MAX_PAGES, ranking=ranking,
+                                    failed=failed)
+        for page_number, error in sorted(failed.items()):
+            # Also on stderr when stdout carries only results
+            message = f"! {query}: page {page_number} failed ({type(error).__name__}: {error}), results are incomplete"
+            if console.quiet:
+                print(message, file=sys.stderr)
+            else:
+                console.print(f"[yellow]{message}[/yellow]")
+        console.print(f"[dim]{route_stats.summary()} · {SCHEDULER.summary(base_url)}[/dim]")
+        return results if ranking else adapter.sort(results, sort)
+    finally:
+        if metrics:
+            await metrics.stop_trace(context, adapter.name)
+        await context.close()
+
+def display_results(adapter, results):
+    from rich.table import Table
+
+    table = Table(show_header=True, header_style="bold cyan", **adapter.table_options)
+    for header, field, column, truncate in adapter.table:
+        table.add_column(header, **column)
+
+    for item in results:
+        cells = []
+        for header, field, column, truncate in adapter.table:
+            value = str(item[field])
+            cells.append(value[:truncate] + '...' if truncate and len(value) > truncate else value)
+        table.add_row(*cells)
+
+    console.print(table)
+
+def export_results(adapter, results, output_path, fmt=None, append=False, compression=None, metrics=None):
+    try:
+        with timed(metrics, 'export'), Exporter(output_path, fmt, adapter.columns, append, compression) as exporter:
+            exporter.write_many(results)
+    except (ValueError, RuntimeError) as e:
+        console.print(f"[red]✗ {e}[/red]")
+        return
+    console.print(f"[blue]✓ Exported results to[/blue] {Path(output_path).resolve()}")
+
+def search_cache_key(adapter, args, query, **options):
+    return cache_key(site_key(args.base_url), query, options.get('auction_only', False), args.max + 2,
+                     args.sort, args.pages, adapter.name)
+
+async def search_batch(adapter, args, metrics=None, exporter=None, **options):
+    """Run every query of the batch file on one browser, streaming NDJSON (and its rows to exporter)"""
+    cache = None if args.no_cache else ResultCache(ttl=args.cache_ttl)
+    async with async_playwright() as p, open_browser(p, headless=adapter.headless, metrics=metrics) as browser:
+        contexts = ContextPool(browser)
+        contexts.warm_up(site_key(args.base_url), args.profile)
+
+        async def run(query):
+            return await cached(cache, search_cache_key(adapter, args, query, **options), lambda: search(
+                adapter, query, args.max + 2, browser, not args.per_item, args.concurrency,
+                args.base_url, args.profile, metrics, args.sort, args.pages, contexts, **options
+            ), args.refresh)
+
+        write_rows = record_writer(exporter) if exporter else None
+
+        def on_record(record):
+            with timed(metrics, 'export'):
+                write_rows(record)
+
+        try:
+            counts = await run_batch(read_jobs(args.batch), run, args.jobs, args.timeout, args.retries,
+                                     on_record=on_record if exporter else None)
+        finally:
+            await contexts.close()
+        if cache:
+            await cache.drain()
+        return counts
+
+def add_search_arguments(parser, adapter):
+    """The arguments every site's search CLI shares"""
+    parser.add_argument('query', nargs='?', help='Search term')
+    parser.add_argument('--max', type=int, default=5, help='Max number of results')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Result pages fetched in parallel')
+    parser.add_argument('--base-url', default=adapter.base_url, help='Site to search (e.g. a local fixture server)')
+    parser.add_argument('--profile', choices=ROUTE_PROFILES, default='text-only', help='Which requests to block while scraping')
+    parser.add_argument('--sort', choices=adapter.sorts, default=adapter.default_sort,
+                        help=f"Rank results by (default: {adapter.default_sort or 'site order'})")
+    parser.add_argument('--pages', type=int, help='Rank the best --max results of up to this many result pages '
+                                                  '(default: rank the first --max results)')
+    parser.add_argument('--per-item', action='store_true', help='Extract fields per item instead of in one page evaluation')
+    parser.add_argument('--json', action='store_true', help='Print one JSON object per result instead of a table')
+    add_export_arguments(parser)
+    add_batch_arguments(parser)
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+
+def run_search_cli(adapter, parser, args, **options):
+    """Batch or single search as asked for on the command line; exits with the batch status"""
+    metrics = metrics_from_args(adapter.name, args)
+    if args.export:
+        try:
+            export_settings(args.export, args.export_format, args.compression)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.batch:
+        console.quiet = True  # stdout carries only the NDJSON records
+        try:
+            exporter = Exporter(args.export, args.export_format, ['Query'] + adapter.columns,
+                                args.append, args.compression) if args.export else None
+        except (ValueError, RuntimeError) as e:
+            print(f"✗ {e}", file=sys.stderr)
+            sys.exit(2)
+        try:
+            succeeded, failed = asyncio.run(search_batch(adapter, args, metrics, exporter, **options))
+        finally:
+            if exporter:
+                exporter.close()
+        report_metrics(metrics, args)
+        sys.exit(1 if failed else 0)
+    if not args.query:
+        parser.error('a search term or --batch is required')
+
+    cache = None if args.no_cache else ResultCache(ttl=args.cache_ttl)
+    key = search_cache_key(adapter, args, args.query, **options)
+    if args.revalidate:
+        console.quiet = True
+        if cache:
+            asyncio.run(cached(cache, key, lambda: search(
+                adapter, args.query, args.max + 2, None, not args.per_item, args.concurrency,
+                args.base_url, args.profile, None, args.sort, args.pages, **options
+            ), refresh=True))
+        return
+    if args.json:
+        console.quiet = True  # stdout carries only the results
+
+    console.print(f"\n🔍 Searching {adapter.label} for [bold yellow]{args.query}[/bold yellow]...")
+    try:
+        results = asyncio.run(cached(cache, key, lambda: search(
+            adapter, args.query, args.max + 2, None, not args.per_item, args.concurrency,
+            args.base_url, args.profile, metrics, args.sort, args.pages, **options
+        ), args.refresh, revalidate_in_subprocess(without_metrics_arguments(sys.argv[1:]))))
+    except Blocked as e:
+        if args.json:
+            print(f"✗ {e}", file=sys.stderr)
+        else:
+            console.print(f"[red]✗ {e}[/red]")
+        report_metrics(metrics, args)
+        sys.exit(2)
+    if args.json:
+        for row in results:
+            print(json.dumps(row, ensure_ascii=False))
+    else:
+        display_results(adapter, results)
+    cache_summary = f" · {cache.summary()}" if cache else ''
+    sorted_by = f" (sorted by {args.sort})" if args.sort else ''
+    console.print(f"\n[bold green]✓ Found {len(results)} results{sorted_by}[/bold green]{cache_summary}")
+
+    if args.export:
+        export_results(adapter, results, args.export, args.export_format, args.append, args.compression, metrics)
+    if metrics:
+        console.print(f"[dim]{metrics.summary()}[/dim]")
+    report_metrics(metrics, args)
@@ -1,15 +1,32 @@
 #!/usr/bin/env python3
+import io
+import re
 import sys
+import time
+import base64
 import asyncio
 import json
+import hashlib
+import argparse
+from pathlib import Path
 from urllib.parse import urlparse
 from functools import wraps
-from playwright.async_api import async_playwright, TimeoutError
+from contextlib import redirect_stdout
+from playwright.async_api import async_playwright
+from browser_pool import open_browser
+from routing import apply_profile
+from storage_cache import site_key, read_state, write_state
+from batch import read_jobs
+from metrics import timed, metrics_from_args, report_metrics, add_metrics_arguments
+from screenshot_store import ScreenshotStore, STORE_DIR, THRESHOLD
 
 # Global variables
-WEBSITE: str = sys.argv[1] if len(sys.argv) > 1 else "https://www.example.com"
+WEBSITE: str = "https://www.example.com"
 SCREENSHOT_FILENAME: str = 'page.png'
 BROWSER_CHOICE = 'chromium'
+SCREENSHOT_JOBS = 4
+IMAGE_FORMATS = ('png', 'jpeg', 'webp')
+EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
 
 # Decorator to validate PNG filenames
 def validate_png_filename(func):
@@ -24,37 +41,6 @@ def validate_png_filename(func):
 def process_image_name(filename):
     print(f"Processing {filename}")
 
-def get_cookie_filename(url):
-    """Generate a cookie filename based on website domain"""
-    parsed = urlparse(url)
-    domain = parsed.netloc
-    if not domain:  # Fallback for invalid URLs
-        domain = "default"
-    # Replace special characters to create safe filename
-    domain = domain.replace(":", "_").replace(".", "_")
-    return f"{domain}_cookies.json"
-
-async def load_cookies(context, cookie_file):
-    """Load cookies from file into browser context"""
-    try:
-        with open(cookie_file, "r") as f:
-            cookies = json.load(f)
-            await context.add_cookies(cookies)
-            f.close()
-            print(f"Loaded cookies from {cookie_file}")
-    except FileNotFoundError:
-        print(f"No existing cookie file: {cookie_file}")
-    except Exception as e:
-        print(f"Error loading cookies: {str(e)}")
-
-async def save_cookies(context, cookie_file):
-    """Save current context cookies to file"""
-    cookies = await context.cookies()
-    with open(cookie_file, "w") as f:
-        json.dump(cookies, f, indent=2)
-        f.close()
-    print(f"Saved cookies to {cookie_file}")
-
 async def close_cookie_banners(page):
     """Special handling for Amazon.de's complex cookie banner"""
     # Amazon-specific selectors
@@ -99,42 +85,263 @@ async def handle_amazon_banner(page, selectors):
         print(f"Cookie banner handling failed: {str(e)}")
         return False
 
-async def run(playwright):
-    global SCREENSHOT_FILENAME, WEBSITE, BROWSER_CHOICE
+def screenshot_filename(url, fmt='png', out_dir='.'):
+    """File name for a URL's screenshot: readable host/path plus a short hash so different URLs never collide"""
+    parsed = urlparse(url)
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', f"{parsed.netloc}{parsed.path}").strip('_')[:80] or 'page'
+    digest = hashlib.sha1(url.encode()).hexdigest()[:8]
+    return str(Path(out_dir) / f"{slug}-{digest}{EXTENSIONS[fmt]}")
+
+def parse_viewport(text):
+    width, height = text.lower().split('x')
+    return {'width': int(width), 'height': int(height)}
 
-    # Initialize browser
-    browser_types = {
-        "firefox": playwright.firefox,
-        "chromium": playwright.chromium
-    }
-    browser = await browser_types[BROWSER_CHOICE].launch(headless=True)
+def parse_clip(text):
+    x, y, width, height = (float(v) for v in text.split(','))
+    return {'x': x, 'y': y, 'width': width, 'height': height}
 
-    # Create context and load cookies
-    context = await browser.new_context()
-    cookie_file = get_cookie_filename(WEBSITE)
-    await load_cookies(context, cookie_file)
+def context_options(playwright, browser_name, device=None, viewport=None):
+    """new_context() arguments for a device preset and/or an explicit viewport"""
+    options = {}
+    if device:
+        options = dict(playwright.devices[device])
+        options.pop('default_browser_type', None)
+        if browser_name == 'firefox':
+            options.pop('is_mobile', None)  # Not supported by Firefox
+    if viewport:
+        options['viewport'] = parse_viewport(viewport)
+    return options
 
-    # Browser interactions
-    page = await context.new_page()
-    await page.goto(WEBSITE)
+async def capture_webp(page, quality=None, full_page=True, clip=None):
+    """Chromium can encode WebP itself, Playwright's screenshot() only does PNG/JPEG"""
+    session = await page.context.new_cdp_session(page)
+    try:
+        params = {'format': 'webp'}
+        if quality is not None:
+            params['quality'] = quality
+        if clip is None and full_page:
+            size = (await session.send('Page.getLayoutMetrics'))['cssContentSize']
+            clip = {'x': 0, 'y': 0, 'width': size['width'], 'height': size['height']}
+        if clip:
+            params['clip'] = {**clip, 'scale': 1}
+            params['captureBeyondViewport'] = True
+        data = await session.send('Page.captureScreenshot', params)
+        return base64.b64decode(data['data'])
+    finally:
+        await session.detach()
+
+def convert_to_webp(png_bytes, quality=None):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ValueError('WebP screenshots in Firefox need Pillow (pip install pillow)')
+    out = io.BytesIO()
+    Image.open(io.BytesIO(png_bytes)).save(out, 'WEBP', quality=quality or 80)
+    return out.getvalue()
+
+async def take_screenshot(page, fmt='png', quality=None, full_page=True, clip=None, selector=None):
+    """Screenshot of the page, a clip rectangle or a single element, as image bytes"""
+    if selector:
+        element = page.locator(selector).first
+        if fmt != 'webp':
+            return await element.screenshot(type=fmt, quality=quality if fmt == 'jpeg' else None)
+        await element.scroll_into_view_if_needed()
+        box = await element.bounding_box()
+        scroll_x, scroll_y = await page.evaluate('[window.scrollX, window.scrollY]')
+        clip = {'x': box['x'] + scroll_x, 'y': box['y'] + scroll_y, 'width': box['width'], 'height': box['height']}
 
-    # Handle cookie banner and save cookies if needed
-    if await close_cookie_banners(page):
-        await save_cookies(context, cookie_file)
+    if fmt == 'webp':
+        if page.context.browser.browser_type.name == 'chromium':
+            return await capture_webp(page, quality, full_page, clip)
+        png = await page.screenshot(type='png', full_page=full_page and clip is None, clip=clip)
+        return convert_to_webp(png, quality)
 
-    # Capture screenshot
-    await page.screenshot(path=SCREENSHOT_FILENAME, full_page=True)
-    print(f"Screenshot saved to {SCREENSHOT_FILENAME}")
+    return await page.screenshot(type=fmt, quality=quality if fmt == 'jpeg' else None,
+                                 full_page=full_page and clip is None, clip=clip)
 
-    await browser.close()
+async def capture(browser, url, path, options, metrics=None, store=None):
+    """Load one URL in its own context and write its screenshot to path
 
-async def main():
+    With a ScreenshotStore the screenshot goes into the store instead (only
+    kept if it changed), or with options['check'] is only compared with it.
+    """
+    start = time.perf_counter()
+    result = {'url': url, 'path': path}
+    state_key = site_key(url)
+    state, consent = read_state(state_key)
+    context = None
+    try:
+        # Inside the try, so a context that cannot be created fails only this URL
+        context = await browser.new_context(storage_state=state, **options.get('context', {}))
+        route_stats = await apply_profile(context, 'full')
+        page = await context.new_page()
+        if metrics:
+            metrics.add('context', time.perf_counter() - start)
+            metrics.track_requests(context, route_stats)
+            await metrics.start_trace(context)
+        with timed(metrics, 'navigation'):
+            await page.goto(url)
+
+        # Handle cookie banner (unless already accepted) and save storage state if needed
+        if not consent:
+            with timed(metrics, 'consent'):
+                if await close_cookie_banners(page):
+                    write_state(state_key, await context.storage_state())
+                    print(f"Saved storage state for {state_key}")
+
+        with timed(metrics, 'screenshot'):
+            image = await take_screenshot(page, options.get('format', 'png'), options.get('quality'),
+                                          options.get('full_page', True), options.get('clip'), options.get('selector'))
+        if metrics:
+            await metrics.sample_memory(page)
+        with timed(metrics, 'export'):
+            if store and options.get('check'):
+                result['changed'] = store.has_changed(url, image)
+            elif store:
+                result.update(store.add(url, image))
+            else:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                Path(path).write_bytes(image)
+        result.update(ok=True, bytes=len(image), transferred=route_stats.bytes_loaded)
+    except Exception as e:
+        result.update(ok=False, error=f"{type(e).__name__}: {e}")
+    finally:
+        if context:
+            if metrics:
+                await metrics.stop_trace(context, site_key(url))
+            await context.close()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+async def capture_many(playwright, jobs, options, concurrency=SCREENSHOT_JOBS, browser_name=BROWSER_CHOICE, metrics=None,
+                       store=None):
+    """Capture (url, path) jobs on one browser with at most `concurrency` pages open at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async with open_browser(playwright, browser_name, headless=True, args=None, metrics=metrics) as browser:
+        async def limited(url, path):
+            async with semaphore:
+                return await capture(browser, url, path, options, metrics, store)
+
+        for finished in asyncio.as_completed([limited(url, path) for url, path in jobs]):
+            result = await finished
+            if len(jobs) > 1:
+                status = f"{result['bytes'] / 1024:.0f} KiB" if result['ok'] else result['error']
+                if result.get('status') or 'changed' in result:
+                    status += ', ' + (result.get('status') or ('changed' if result['changed'] else 'unchanged'))
+                print(f"{'✓' if result['ok'] else '✗'} {result['url']} -> {result['path']} ({status})")
+            results.append(result)
+    return results
+
+def print_summary(results, elapsed):
+    print(f"\n{'seconds':>8} {'image KiB':>10} {'loaded KiB':>11}  url")
+    for r in sorted(results, key=lambda r: r['seconds'], reverse=True):
+        if r['ok']:
+            print(f"{r['seconds']:>8.2f} {r['bytes'] / 1024:>10.1f} {r['transferred'] / 1024:>11.1f}  {r['url']}")
+        else:
+            print(f"{r['seconds']:>8.2f} {'failed':>10} {'':>11}  {r['url']}")
+    ok = [r for r in results if r['ok']]
+    total = sum(r.get('stored', r['bytes']) for r in ok)
+    print(f"{len(ok)}/{len(results)} screenshots, {total / 1024 / 1024:.1f} MiB written in {elapsed:.1f}s")
+
+async def run(playwright):
+    results = await capture_many(playwright, [(WEBSITE, SCREENSHOT_FILENAME)], {}, 1, BROWSER_CHOICE)
+    if results[0]['ok']:
+        print(f"Screenshot saved to {SCREENSHOT_FILENAME}")
+    else:
+        print(f"Screenshot failed: {results[0]['error']}")
+
+async def main(args=None, out=None):
+    """Capture as asked for by the command line arguments; with args.json one JSON object per capture goes to out"""
     async with async_playwright() as playwright:
-        await run(playwright)
+        if args is None:
+            await run(playwright)
+            return
 
-if __name__ == '__main__':
+        fmt = args.format
+        options = {
+            'format': fmt,
+            'quality': args.quality,
+            'full_page': not args.viewport_only,
+            'clip': parse_clip(args.clip) if args.clip else None,
+            'selector': args.selector,
+            'context': context_options(playwright, args.browser, args.device, args.viewport),
+        }
+        if args.list:
+            jobs = [(url, screenshot_filename(url, fmt, args.out_dir)) for url in read_jobs(args.list)]
+        else:
+            jobs = [(args.url, str(Path(SCREENSHOT_FILENAME).with_suffix(EXTENSIONS[fmt])))]
+
+        store = None
+        if args.store or args.check:
+            store = ScreenshotStore(args.store or STORE_DIR, args.threshold, args.region_diffs)
+            options['check'] = args.check
+
+        start = time.perf_counter()
+        metrics = metrics_from_args('screenshot', args)
+        results = await capture_many(playwright, jobs, options, args.jobs, args.browser, metrics, store)
+        if args.json:
+            for result in results:
+                print(json.dumps(result, ensure_ascii=False), file=out or sys.stdout)
+        elif args.list:
+            print_summary(results, time.perf_counter() - start)
+        elif not results[0]['ok']:
+            print(f"Screenshot failed: {results[0]['error']}")
+        elif args.check:
+            print('changed' if results[0]['changed'] else 'unchanged')
+        elif store:
+            print(f"Screenshot {results[0]['status']}, stored as {results[0]['path']}")
+        else:
+            print(f"Screenshot saved to {results[0]['path']}")
+        if metrics:
+            print(metrics.summary())
+        report_metrics(metrics, args)
+        if store:
+            store.close()
+        # Like diff: 1 when something changed
+        if args.check and any(r.get('changed') for r in results):
+            return 1
+
+DESCRIPTION = 'Website screenshots'
+
+def add_arguments(parser):
+    parser.add_argument('url', nargs='?', default=WEBSITE, help='Page to capture (writes page.png)')
+    parser.add_argument('--list', metavar='FILE', help="Capture every URL in FILE ('-' for stdin), named after the URL")
+    parser.add_argument('--out-dir', default='.', help='Directory for --list screenshots')
+    parser.add_argument('--jobs', type=int, default=SCREENSHOT_JOBS, help='Pages captured at the same time')
+    parser.add_argument('--browser', choices=['chromium', 'firefox'], default=BROWSER_CHOICE, help='Browser engine')
+    parser.add_argument('--device', help="Device preset, e.g. 'iPhone 13' or 'Desktop Chrome'")
+    parser.add_argument('--viewport', help='Viewport size, e.g. 1920x1080')
+    parser.add_argument('--format', choices=IMAGE_FORMATS, default='png', help='Image format')
+    parser.add_argument('--quality', type=int, help='JPEG/WebP quality (0-100)')
+    parser.add_argument('--clip', help='Only capture the rectangle x,y,width,height')
+    parser.add_argument('--selector', help='Only capture the first element matching this CSS selector')
+    parser.add_argument('--viewport-only', action='store_true', help='Capture the viewport instead of the full page')
+    parser.add_argument('--store', nargs='?', const=str(STORE_DIR), metavar='DIR',
+                        help=f"Keep screenshots in a content-addressed store (default {STORE_DIR}), only when they changed")
+    parser.add_argument('--threshold', type=int, default=THRESHOLD,
+                        help='Perceptual hash bits a screenshot may differ by and still count as unchanged')
+    parser.add_argument('--region-diffs', action='store_true', help='Store changed screenshots as the changed regions only')
+    parser.add_argument('--check', action='store_true',
+                        help='Only tell whether each page visually changed since its last stored screenshot (exit 1 if so)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print one JSON object per capture; everything else goes to stderr')
+    add_metrics_arguments(parser)
+
+def run_cli(args, parser):
+    """Screenshots as asked for on the command line; exits 1 when --check found a change"""
+    stdout = sys.stdout
     try:
-        process_image_name(SCREENSHOT_FILENAME)
-        asyncio.run(main())
+        with redirect_stdout(sys.stderr if args.json else stdout):
+            process_image_name(SCREENSHOT_FILENAME)
+            code = asyncio.run(main(args, stdout))
     except ValueError as e:
         print(f"Error: {e}")
+        return
+    sys.exit(code)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    run_cli(parser.parse_args(), parser)
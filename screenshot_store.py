@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Content-addressed store of screenshots that only keeps captures that look different
+
+Every image is stored once, named after the SHA-256 of its bytes, in
+~/.cache/playwright-scripts/screenshots/objects. An index records each
+capture of a URL with its time, content hash and perceptual hash (dHash),
+so "has this page visually changed?" is one lookup and a Hamming distance.
+A capture within `threshold` bits of the last kept one is only indexed.
+With region diffs, a changed capture of the same size is kept as the
+changed strips on top of the last full image instead of a whole new one.
+
+Perceptual hashes and region diffs need Pillow; without it captures are
+only deduplicated by content hash.
+"""
+import io
+import json
+import time
+import hashlib
+import sqlite3
+from pathlib import Path
+from storage_cache import CACHE_DIR
+
+try:
+    from PIL import Image, ImageChops
+except ImportError:
+    Image = None
+
+STORE_DIR = CACHE_DIR / 'screenshots'
+HASH_SIZE = 16  # dHash of HASH_SIZE x HASH_SIZE bits
+THRESHOLD = 6  # Bits a capture's dHash may differ by and still count as unchanged
+STRIP_HEIGHT = 128  # Region diffs compare the images in strips this high
+PIXEL_TOLERANCE = 16  # Channel difference below which a pixel counts as unchanged (encoder noise)
+MAX_DIFF_AREA = 0.5  # Store the full image once this much of it changed
+KEPT = ('new', 'changed')
+IMAGE_TYPES = {b'\x89PNG': '.png', b'\xff\xd8\xff': '.jpg', b'RIFF': '.webp'}
+
+def image_extension(data):
+    for magic, ext in IMAGE_TYPES.items():
+        if data.startswith(magic):
+            return ext
+    return '.bin'
+
+def dhash(image, size=HASH_SIZE):
+    """Difference hash as hex: is each pixel of a small grayscale copy brighter than its right neighbour"""
+    small = image.convert('L').resize((size + 1, size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+def changed_regions(base, image, strip_height=STRIP_HEIGHT, tolerance=PIXEL_TOLERANCE):
+    """(left, top, right, bottom) boxes of what differs between two images of the same size
+
+    The difference is read one horizontal strip at a time; touching strips
+    are merged into one box.
+    """
+    diff = ImageChops.difference(base.convert('RGB'), image.convert('RGB')).convert('L')
+    diff = diff.point(lambda value: 255 if value >= tolerance else 0)
+    boxes = []
+    for top in range(0, image.height, strip_height):
+        bottom = min(top + strip_height, image.height)
+        box = diff.crop((0, top, image.width, bottom)).getbbox()
+        if box is None:
+            continue
+        box = (box[0], top + box[1], box[2], top + box[3])
+        if boxes and boxes[-1][3] >= top:
+            last = boxes[-1]
+            box = (min(last[0], box[0]), last[1], max(last[2], box[2]), box[3])
+            boxes[-1] = box
+        else:
+            boxes.append(box)
+    return boxes
+
+class ScreenshotStore:
+    """Screenshots of URLs over time, each distinct image stored once"""
+
+    def __init__(self, path=STORE_DIR, threshold=THRESHOLD, region_diffs=False):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.region_diffs = region_diffs
+        if region_diffs and Image is None:
+            raise ValueError('region diffs need Pillow (pip install pillow)')
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path / 'index.sqlite3', timeout=10, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS captures (
+            url TEXT NOT NULL,
+            taken REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            dhash TEXT,
+            status TEXT NOT NULL,
+            object TEXT NOT NULL,
+            regions TEXT,
+            width INTEGER,
+            height INTEGER,
+            stored INTEGER NOT NULL
+        )''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS captures_url ON captures (url, taken)')
+
+    def object_path(self, name):
+        return self.path / 'objects' / name[:2] / name
+
+    def put_object(self, data):
+        """Store bytes under their hash, returns (name, bytes written: 0 if it was there already)"""
+        name = hashlib.sha256(data).hexdigest() + image_extension(data)
+        path = self.object_path(name)
+        if path.exists():
+            return name, 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        return name, len(data)
+
+    def last(self, url, kept_only=False):
+        """Index row of the latest capture of url (the latest kept one with kept_only) as a dict, or None"""
+        query = 'SELECT * FROM captures WHERE url = ?'
+        if kept_only:
+            query += f" AND status IN {KEPT}"
+        cursor = self.db.execute(query + ' ORDER BY taken DESC LIMIT 1', (url,))
+        row = cursor.fetchone()
+        return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def compare(self, url, data):
+        """(last kept capture, sha256, image, dhash, distance) of image bytes against what is stored for url
+
+        Identical bytes (distance 0) are recognised by their hash alone; only
+        otherwise is the image decoded (None without Pillow) for its dHash.
+        distance is None when there is nothing to compare with.
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        last = self.last(url, kept_only=True)
+        if last is not None and last['sha256'] == sha:
+            return last, sha, None, last['dhash'], 0
+        image = Image.open(io.BytesIO(data)) if Image else None
+        perceptual = dhash(image) if image is not None else None
+        if last is None or perceptual is None or last['dhash'] is None:
+            return last, sha, image, perceptual, None
+        return last, sha, image, perceptual, hamming(last['dhash'], perceptual)
+
+    def has_changed(self, url, data, threshold=None):
+        """True if image bytes look different from the last kept capture of url (or there is none)
+
+        Nothing is written or encoded: the bytes are hashed and, unless they
+        are identical, decoded once for the perceptual hash.
+        """
+        last, sha, image, perceptual, distance = self.compare(url, data)
+        if distance is None:
+            return True
+        return distance > (self.threshold if threshold is None else threshold)
+
+    def add(self, url, data, taken=None):
+        """Index one capture of url and store it if it looks different; returns what was done
+
+        status is 'new' (first capture), 'same' (identical bytes), 'similar'
+        (within the threshold, not stored) or 'changed' (stored in full, or
+        as regions on top of the last full image).
+        """
+        taken = time.time() if taken is None else taken
+        last, sha, image, perceptual, distance = self.compare(url, data)
+        size = image.size if image else (last['width'], last['height']) if distance == 0 else (None, None)
+        regions = None
+        stored = 0
+
+        if last is None or distance is None or distance > self.threshold:
+            status = 'new' if last is None else 'changed'
+            regions = self.diff(last, image) if last and self.region_diffs else None
+            if regions is None:
+                name, stored = self.put_object(data)
+            else:
+                name, regions, stored = regions
+        else:
+            status = 'same' if last['sha256'] == sha else 'similar'
+            name, regions = last['object'], last['regions']
+
+        self.db.execute('INSERT INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (url, taken, sha, perceptual, status, name, regions, size[0], size[1], stored))
+        return {'status': status, 'path': str(self.object_path(name)), 'distance': distance,
+                'regions': len(json.loads(regions)) if regions else 0, 'stored': stored}
+
+    def diff(self, last, image):
+        """(base object, regions JSON, bytes written) for a capture stored as regions, None to store it in full"""
+        base_image = Image.open(self.object_path(last['object']))
+        if base_image.size != image.size:
+            return None
+        boxes = changed_regions(base_image, image)
+        area = sum((right - left) * (bottom - top) for left, top, right, bottom in boxes)
+        if area > MAX_DIFF_AREA * image.width * image.height:
+            return None
+        regions, stored = [], 0
+        for box in boxes:
+            out = io.BytesIO()
+            image.crop(box).save(out, 'PNG')
+            name, written = self.put_object(out.getvalue())
+            regions.append({'box': box, 'object': name})
+            stored += written
+        return last['object'], json.dumps(regions), stored
+
+    def load(self, url, taken=None):
+        """Image bytes of the latest capture of url (or the latest at or before taken), None if there is none
+
+        A capture stored as regions is put back together, as PNG.
+        """
+        query, params = 'SELECT object, regions FROM captures WHERE url = ?', [url]
+        if taken is not None:
+            query += ' AND taken <= ?'
+            params.append(taken)
+        row = self.db.execute(query + ' ORDER BY taken DESC LIMIT 1', params).fetchone()
+        if row is None:
+            return None
+        name, regions = row
+        data = self.object_path(name).read_bytes()
+        if not regions:
+            return data
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        for region in json.loads(regions):
+            image.paste(Image.open(self.object_path(region['object'])), tuple(region['box'][:2]))
+        out = io.BytesIO()
+        image.save(out, 'PNG')
+        return out.getvalue()
+
+    def history(self, url):
+        """Every capture of url, oldest first: taken, status, sha256, dhash and bytes stored"""
+        rows = self.db.execute('SELECT taken, status, sha256, dhash, stored FROM captures WHERE url = ? ORDER BY taken',
+                               (url,))
+        return [dict(zip(('taken', 'status', 'sha256', 'dhash', 'stored'), row)) for row in rows]
+
+    def close(self):
+        self.db.close()
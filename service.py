@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""Long-running HTTP service for the scrapers, so callers don't pay startup and launch per call
+
+Start it once, then ask it for JSON:
+    python service.py --address 127.0.0.1:8070
+    curl '127.0.0.1:8070/search/ebay?q=lego+42115&max=10&sort=total'
+    curl '127.0.0.1:8070/search/amazon?q=kindle'
+    curl '127.0.0.1:8070/screenshot?url=https://example.com'
+    curl '127.0.0.1:8070/track?number=RR123456785AT'
+    curl '127.0.0.1:8070/metrics'
+
+One browser is shared by every request. Identical requests that come in
+while one of them is running wait for its result instead of scraping again
+(single flight). Work goes through a bounded queue served by a fixed number
+of workers; when the queue is full the request gets a 429 with Retry-After.
+A site that is blocking us answers 503 with Retry-After until its circuit
+closes again (see scheduler.py).
+With --base-url pointing at benchmarks/fixture_server.py it runs offline.
+"""
+import os
+import json
+import math
+import time
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+from urllib.parse import urlparse, parse_qs
+from browser_pool import split_address, ContextPool
+from metrics import RunMetrics
+from result_cache import normalize_query
+from scheduler import SCHEDULER, Blocked
+
+SERVICE_ADDRESS = os.environ.get('SCRAPER_SERVICE_ADDR', '127.0.0.1:8070')
+WORKERS = 4
+QUEUE_SIZE = 32
+JOB_TIMEOUT = 120
+RETRY_AFTER = 5
+DEFAULT_MAX_RESULTS = 10
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               429: 'Too Many Requests', 500: 'Internal Server Error', 503: 'Service Unavailable',
+               504: 'Gateway Timeout'}
+
+class BadRequest(ValueError):
+    pass
+
+class NotFound(Exception):
+    pass
+
+def flag(value):
+    return value is not None and value.lower() not in ('', '0', 'false', 'no')
+
+def int_param(params, name, default=None):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a number")
+
+class ScrapeService:
+    """Runs scrapes for HTTP requests on one shared browser, with single flight and a bounded queue
+
+    base_url maps a site (ebay, amazon, post) to the address to scrape
+    instead of the real site, e.g. the fixture server.
+    """
+
+    def __init__(self, browser, workers=WORKERS, queue_size=QUEUE_SIZE, timeout=JOB_TIMEOUT, base_url=None,
+                 route_profile='text-only', store=None, tabs=None):
+        self.browser = browser
+        self.workers = workers
+        self.queue = asyncio.Queue(queue_size)
+        self.timeout = timeout
+        self.base_url = base_url or {}
+        self.route_profile = route_profile
+        self.contexts = ContextPool(browser)  # Warm search contexts per site
+        self.store = store
+        self.tabs = tabs
+        self.flights = {}
+        self.tracking = None
+        self.tracking_lock = asyncio.Lock()
+        self.tasks = []
+        self.metrics = RunMetrics('service')
+        self.responses = Counter()  # (endpoint, status) -> count
+        self.latency = defaultdict(float)  # endpoint -> seconds
+        self.jobs = Counter()  # endpoint -> scrapes actually run
+        self.coalesced = Counter()  # endpoint -> requests that joined a running scrape
+        self.rejected = 0
+        self.busy = 0
+
+    def start(self):
+        from sites import SITES
+        from storage_cache import site_key
+
+        for site, adapter in SITES.items():
+            self.contexts.warm_up(site_key(self.base_url.get(site) or adapter.base_url), self.route_profile)
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.contexts.close()
+        if self.tracking:
+            await self.tracking.close()
+
+    async def worker(self):
+        while True:
+            endpoint, work, future = await self.queue.get()
+            self.busy += 1
+            try:
+                result = await asyncio.wait_for(work(), self.timeout)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.busy -= 1
+                self.jobs[endpoint] += 1
+                self.queue.task_done()
+
+    async def submit(self, endpoint, key, work):
+        """Result of await work(), shared with every identical request (same key) already in flight
+
+        Raises asyncio.QueueFull when a new scrape would not fit in the queue.
+        """
+        future = self.flights.get(key)
+        if future is not None:
+            self.coalesced[endpoint] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait((endpoint, work, future))
+            self.flights[key] = future
+            future.add_done_callback(lambda done: self.finished(key, done))
+        # A waiter that goes away must not cancel the scrape for the others
+        return await asyncio.shield(future)
+
+    def finished(self, key, future):
+        self.flights.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # Retrieved here, so nobody waiting is not an error
+
+    async def search(self, site, params):
+        import scraper
+        from sites import SITES
+        from pagination import DEFAULT_CONCURRENCY
+
+        adapter = SITES.get(site)
+        if adapter is None:
+            raise NotFound(f"unknown site {site}")
+        query = params.get('q', '').strip()
+        if not query:
+            raise BadRequest('q is required')
+        max_results = int_param(params, 'max', DEFAULT_MAX_RESULTS)
+        sort = params.get('sort') or adapter.default_sort
+        if sort and sort not in adapter.sorts:
+            raise BadRequest(f"sort must be one of {', '.join(adapter.sorts)}")
+        pages = int_param(params, 'pages')
+        options = {name: flag(params.get(name)) for name in adapter.options}
+
+        async def work():
+            return await scraper.search(adapter, query, max_results, self.browser, True, DEFAULT_CONCURRENCY,
+                                        self.base_url.get(site), self.route_profile, self.metrics, sort, pages,
+                                        self.contexts, **options)
+
+        key = json.dumps(['search', site, normalize_query(query), max_results, sort, pages, options], sort_keys=True)
+        results = await self.submit('search', key, work)
+        return {'site': site, 'query': query, 'sort': sort, 'results': results}
+
+    async def screenshot(self, params):
+        from screenshot import capture, IMAGE_FORMATS
+
+        url = params.get('url')
+        if not url:
+            raise BadRequest('url is required')
+        fmt = params.get('format', 'png')
+        if fmt not in IMAGE_FORMATS:
+            raise BadRequest(f"format must be one of {', '.join(IMAGE_FORMATS)}")
+        options = {'format': fmt, 'quality': int_param(params, 'quality'), 'full_page': not flag(params.get('viewport_only')),
+                   'selector': params.get('selector'), 'check': flag(params.get('check'))}
+
+        async def work():
+            return await capture(self.browser, url, None, options, self.metrics, self.store)
+
+        key = json.dumps(['screenshot', url, options], sort_keys=True)
+        result = await self.submit('screenshot', key, work)
+        if not result['ok']:
+            raise RuntimeError(result['error'])
+        return result
+
+    async def track(self, params):
+        from tracking import TrackingSession, TRACKING_TABS, POST_URL
+
+        number = params.get('number', '').strip().upper()
+        if not number:
+            raise BadRequest('number is required')
+
+        async def work():
+            # One consent-accepted session for the lifetime of the service
+            async with self.tracking_lock:
+                if self.tracking is None:
+                    session = TrackingSession(self.browser, self.tabs or TRACKING_TABS, self.metrics,
+                                              self.base_url.get('post') or POST_URL)
+                    self.tracking = await session.start()
+                session = self.tracking
+            try:
+                return await session.track(number)
+            except Exception:
+                # The session may be what broke (closed page, lost consent): the next lookup starts a new one
+                async with self.tracking_lock:
+                    if self.tracking is session:
+                        self.tracking = None
+                        await session.close()
+                raise
+
+        return await self.submit('track', json.dumps(['track', number]), work)
+
+    def health(self):
+        return {'ok': True, 'queued': self.queue.qsize(), 'busy': self.busy, 'in_flight': len(self.flights)}
+
+    def prometheus(self):
+        lines = ['# HELP scraper_service_responses Responses sent, by endpoint and status',
+                 '# TYPE scraper_service_responses counter']
+        lines += [f'scraper_service_responses{{endpoint="{endpoint}",status="{status}"}} {count}'
+                  for (endpoint, status), count in sorted(self.responses.items())]
+        lines += ['# HELP scraper_service_response_seconds Time spent answering, by endpoint',
+                  '# TYPE scraper_service_response_seconds counter']
+        lines += [f'scraper_service_response_seconds{{endpoint="{endpoint}"}} {round(seconds, 4)}'
+                  for endpoint, seconds in sorted(self.latency.items())]
+        lines += ['# HELP scraper_service_jobs Scrapes run, by endpoint', '# TYPE scraper_service_jobs counter']
+        lines += [f'scraper_service_jobs{{endpoint="{endpoint}"}} {count}' for endpoint, count in sorted(self.jobs.items())]
+        lines += ['# HELP scraper_service_coalesced Requests answered by a scrape already in flight',
+                  '# TYPE scraper_service_coalesced counter']
+        lines += [f'scraper_service_coalesced{{endpoint="{endpoint}"}} {count}'
+                  for endpoint, count in sorted(self.coalesced.items())]
+        lines += [
+            '# HELP scraper_service_rejected Requests turned away with 429 because the queue was full',
+            '# TYPE scraper_service_rejected counter',
+            f'scraper_service_rejected {self.rejected}',
+            '# HELP scraper_service_queued Scrapes waiting for a worker',
+            '# TYPE scraper_service_queued gauge',
+            f'scraper_service_queued {self.queue.qsize()}',
+            '# HELP scraper_service_busy Workers running a scrape',
+            '# TYPE scraper_service_busy gauge',
+            f'scraper_service_busy {self.busy}',
+            '# HELP scraper_domain_rate Requests per second the scheduler allows a domain',
+            '# TYPE scraper_domain_rate gauge',
+        ]
+        domains = sorted(SCHEDULER.domains.values(), key=lambda domain: domain.name)
+        lines += [f'scraper_domain_rate{{domain="{domain.name}"}} {round(domain.rate, 3)}' for domain in domains]
+        lines += ['# HELP scraper_domain_circuit_open Whether a domain is backing off after a block',
+                  '# TYPE scraper_domain_circuit_open gauge']
+        lines += [f'scraper_domain_circuit_open{{domain="{domain.name}"}} {int(domain.opened > 0)}' for domain in domains]
+        lines += ['# HELP scraper_domain_requests Navigations by domain and outcome',
+                  '# TYPE scraper_domain_requests counter']
+        lines += [f'scraper_domain_requests{{domain="{domain.name}",outcome="{outcome}"}} {count}'
+                  for domain in domains for outcome, count in sorted(domain.counts.items())]
+        return '\n'.join(lines) + '\n' + self.metrics.to_prometheus()
+
+    async def route(self, method, target):
+        """(status, body, content type, extra headers) for one request"""
+        parsed = urlparse(target)
+        params = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+        path = parsed.path.rstrip('/') or '/'
+        if method != 'GET':
+            return 405, {'error': 'only GET is supported'}, 'application/json', {'Allow': 'GET'}
+        if path == '/metrics':
+            return 200, self.prometheus(), 'text/plain; version=0.0.4', {}
+        if path == '/health':
+            return 200, self.health(), 'application/json', {}
+
+        try:
+            if path.startswith('/search/'):
+                body = await self.search(path[len('/search/'):], params)
+            elif path == '/screenshot':
+                body = await self.screenshot(params)
+            elif path == '/track':
+                body = await self.track(params)
+            else:
+                return 404, {'error': f"no such endpoint {path}"}, 'application/json', {}
+        except BadRequest as e:
+            return 400, {'error': str(e)}, 'application/json', {}
+        except NotFound as e:
+            return 404, {'error': str(e)}, 'application/json', {}
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return 429, {'error': 'too many requests queued'}, 'application/json', {'Retry-After': str(RETRY_AFTER)}
+        except Blocked as e:
+            retry = math.ceil(e.retry_after) if e.retry_after else RETRY_AFTER
+            return 503, {'error': str(e)}, 'application/json', {'Retry-After': str(retry)}
+        except asyncio.TimeoutError:
+            return 504, {'error': f"timed out after {self.timeout}s"}, 'application/json', {}
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}, 'application/json', {}
+        return 200, body, 'application/json', {}
+
+    async def handle(self, reader, writer):
+        start = time.perf_counter()
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                pass  # Headers: nothing we need, GET has no body
+            if len(request_line) < 2:
+                return
+            method, target = request_line[0], request_line[1]
+            status, body, content_type, headers = await self.route(method, target)
+            if not isinstance(body, str):
+                body = json.dumps(body, ensure_ascii=False)
+            data = body.encode()
+            head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}", f"Content-Type: {content_type}",
+                    f"Content-Length: {len(data)}", 'Connection: close']
+            head += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + data)
+            await writer.drain()
+
+            endpoint = urlparse(target).path.strip('/').split('/')[0] or '/'
+            self.responses[endpoint, status] += 1
+            self.latency[endpoint] += time.perf_counter() - start
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Client went away
+        finally:
+            writer.close()
+
+    async def serve(self, address=SERVICE_ADDRESS, ready=None):
+        """Answer requests until cancelled; ready(port) is called once listening"""
+        host, port = split_address(address)
+        server = await asyncio.start_server(self.handle, host, port)
+        self.start()
+        port = server.sockets[0].getsockname()[1]
+        print(f"Scraper service listening on {host}:{port}")
+        if ready:
+            ready(port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+def fixture_urls(base_url):
+    """Site -> address when every site is served from one place (the fixture server)"""
+    from tracking import POST_URL
+    return {'ebay': base_url, 'amazon': base_url, 'post': base_url + urlparse(POST_URL).path}
+
+async def main(args):
+    from playwright.async_api import async_playwright
+    from browser_pool import open_browser
+    from screenshot_store import ScreenshotStore, STORE_DIR
+    import scraper
+
+    scraper.console.quiet = True  # Progress output of the scrapes is not for the service's log
+    async with async_playwright() as playwright, open_browser(playwright, headless=True) as browser:
+        service = ScrapeService(browser, args.workers, args.queue_size, args.timeout,
+                                fixture_urls(args.base_url) if args.base_url else None, args.profile,
+                                ScreenshotStore(args.store or STORE_DIR), args.tabs)
+        await service.serve(args.address)
+
+if __name__ == '__main__':
+    from routing import ROUTE_PROFILES
+
+    parser = argparse.ArgumentParser(description='HTTP service for search, screenshots and tracking')
+    parser.add_argument('--address', default=SERVICE_ADDRESS, help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Scrapes run at the same time')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='Scrapes that may wait for a worker before requests get 429')
+    parser.add_argument('--timeout', type=float, default=JOB_TIMEOUT, help='Seconds a scrape may take')
+    parser.add_argument('--profile', choices=ROUTE_PROFILES, default='text-only', help='Which requests to block while searching')
+    parser.add_argument('--tabs', type=int, help='Tabs of the tracking session')
+    parser.add_argument('--store', metavar='DIR', help='Screenshot store directory')
+    parser.add_argument('--base-url', help='Scrape this address instead of the real sites (e.g. the fixture server)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Site adapters for the shared scraper; a new marketplace is one more SiteAdapter here"""
+import re
+from operator import itemgetter
+from scraper import SiteAdapter
+from prices import parse_price, parse_shipping, total
+from ranking import Sort
+from scheduler import BLOCK_SELECTORS
+
+EBAY_BASE_URL = 'https://www.ebay.at'
+AMAZON_BASE_URL = 'https://www.amazon.de'
+
+# Selector-to-field map for a single eBay result card. Every field is read
+# as trimmed textContent ("N/A" when missing), the link as its href.
+EBAY_CARD_FIELDS = {
+    'Title': '.s-item__title',
+    'Price': '.s-item__price',
+    'Condition': '.s-item__subtitle',
+    'Shipping': '.s-item__shipping',
+    'Bids': '.s-item__bids',
+    'TimeLeft': '.s-item__time-left',
+    'Location': '.s-item__location',
+    'URL': [('.s-item__link', 'href')],
+}
+# Columns of a result row, in export order
+EBAY_FIELDS = ['Title', 'Price', 'PriceValue', 'PriceMax', 'Currency', 'Condition', 'Shipping', 'ShippingValue',
+               'TotalValue', 'Bids', 'TimeLeft', 'Location', 'URL']
+EBAY_CARD_SELECTOR = '.s-item:not(.s-ad)'
+EBAY_SKIP_SELECTOR = '.s-item__title--tag'  # Promoted or header items
+
+AMAZON_CARD_FIELDS = {
+    'Title': [('h2 a span', 'text'), ('img.s-image', 'alt')],
+    'Price': '.a-price .a-offscreen, .a-color-price',
+    'Rating': '.a-icon-alt',
+    'URL': [('h2 a', 'href')],
+}
+AMAZON_FIELDS = ['Title', 'Price', 'PriceValue', 'Currency', 'Rating', 'URL']
+
+# "1T 16Std.", "12Std. 30Min.", "3d 4h", "45m 10s"
+TIME_LEFT_RE = re.compile(r'(\d+)\s*(Tage?|T|Std|Min|Sek|d|h|m|s)', re.IGNORECASE)
+TIME_LEFT_UNITS = {'t': 86400, 'tag': 86400, 'tage': 86400, 'd': 86400, 'std': 3600, 'h': 3600,
+                   'min': 60, 'm': 60, 'sek': 1, 's': 1}
+
+def clean_url(url):
+    return url.split('?')[0]
+
+def parse_bids(bids_text):
+    """Number of bids of "3 Gebote", None for listings without bids"""
+    match = re.match(r'\s*(\d+)', bids_text)
+    return int(match.group(1)) if match else None
+
+def parse_time_left(time_left_text):
+    """Seconds left of "1T 16Std.", None when it is not an auction"""
+    parts = TIME_LEFT_RE.findall(time_left_text)
+    if not parts:
+        return None
+    return sum(int(number) * TIME_LEFT_UNITS[unit.lower()] for number, unit in parts)
+
+def parse_rating(rating):
+    """Stars of "4.5", None when unrated"""
+    try:
+        return float(rating)
+    except ValueError:
+        return None
+
+# Sort name -> ranking; eBay itself can only order by price plus shipping
+# and by time left, so only those can stop paging early
+EBAY_SORTS = {
+    'price-desc': Sort(itemgetter('PriceValue'), True),
+    'price': Sort(itemgetter('PriceValue'), False),
+    'total': Sort(itemgetter('TotalValue'), False, '&_sop=15'),
+    'total-desc': Sort(itemgetter('TotalValue'), True, '&_sop=16'),
+    'bids': Sort(lambda row: parse_bids(row['Bids']), True),
+    'time-left': Sort(lambda row: parse_time_left(row['TimeLeft']), False, '&_sop=1'),
+}
+AMAZON_SORTS = {
+    'price': Sort(itemgetter('PriceValue'), False, '&s=price-asc-rank'),
+    'price-desc': Sort(itemgetter('PriceValue'), True, '&s=price-desc-rank'),
+    'rating': Sort(lambda row: parse_rating(row['Rating']), True),
+}
+
+def build_ebay_row(fields):
+    """Turn the raw card fields into a result row, or None if it should be skipped"""
+    if 'new listing' in fields['Title'].lower():
+        return None
+    price = parse_price(fields['Price'])
+    shipping = parse_shipping(fields['Shipping'])
+    return {
+        'Title': fields['Title'],
+        'Price': fields['Price'],
+        'PriceValue': price.min,
+        'PriceMax': price.max,
+        'Currency': price.currency,
+        'Condition': fields['Condition'],
+        'Shipping': fields['Shipping'],
+        'ShippingValue': shipping,
+        'TotalValue': total(price.min, shipping),
+        'Bids': fields['Bids'],
+        'TimeLeft': fields['TimeLeft'],
+        'Location': fields['Location'],
+        'URL': clean_url(fields['URL'])
+    }
+
+def build_amazon_row(fields):
+    if all(value == 'N/A' for value in fields.values()):
+        return None
+    title = fields['Title']
+    rating = fields['Rating']
+    price = parse_price(fields['Price'])
+    return {
+        'Title': title[:75] + '...' if len(title) > 75 else title,
+        'Price': fields['Price'].replace('\u00a0', ' '),
+        'PriceValue': price.min,
+        'Currency': price.currency,
+        'Rating': rating.split(' ')[0].replace(',', '.') if rating != 'N/A' else rating,
+        'URL': clean_url(fields['URL'])
+    }
+
+EBAY = SiteAdapter(
+    name='ebay',
+    label='eBay.at',
+    base_url=EBAY_BASE_URL,
+    search_path='/sch/i.html?_nkw={query}&_sacat=0&_from=R40',
+    options={
+        # on: Auction + Newly Listed, off: default sort
+        'auction_only': ('&LH_Auction=1&_sop=1&rt=nc&LH_PrefLoc=3', '&rt=nc&rt=nc&LH_PrefLoc=3'),
+    },
+    page_param='_pgn',
+    consent_selectors=['button#gdpr-banner-accept'],
+    ready_selector='.s-item',
+    card_selector=EBAY_CARD_SELECTOR,
+    skip_selector=EBAY_SKIP_SELECTOR,
+    fields=EBAY_CARD_FIELDS,
+    build_row=build_ebay_row,
+    columns=EBAY_FIELDS,
+    sorts=EBAY_SORTS,
+    default_sort='price-desc',
+    block_selectors=BLOCK_SELECTORS + (':text("Pardon Our Interruption")',),
+    table=[
+        ('Price', 'Price', {'justify': 'right', 'width': 15}, None),
+        ('Title', 'Title', {'width': 50}, None),
+        ('Condition', 'Condition', {'width': 18}, None),
+        ('Shipping', 'Shipping', {'width': 18}, None),
+        ('Bids', 'Bids', {'width': 8, 'justify': 'center'}, None),
+        ('Time Left', 'TimeLeft', {'width': 18}, None),
+        ('Location', 'Location', {'width': 18}, None),
+        ('URL', 'URL', {'width': 40, 'no_wrap': True}, 40),
+    ],
+    table_options={'box': None, 'show_lines': False, 'padding': (0, 1)},
+)
+
+AMAZON = SiteAdapter(
+    name='amazon',
+    label='Amazon.de',
+    base_url=AMAZON_BASE_URL,
+    search_path='/s?k={query}',  # Bypass bot detection with direct search URL
+    page_param='page',
+    consent_selectors=['#sp-cc-accept'],
+    ready_selector='.s-result-item',
+    card_selector='.s-result-item:not(.s-ad-result)',
+    fields=AMAZON_CARD_FIELDS,
+    build_row=build_amazon_row,
+    columns=AMAZON_FIELDS,
+    sorts=AMAZON_SORTS,
+    block_selectors=BLOCK_SELECTORS + ('#captchacharacters', ':text("Geben Sie die Zeichen unten ein")',
+                                       ':text("Enter the characters you see below")'),
+    headless=False,
+    table=[
+        ('Title', 'Title', {'width': 60}, None),
+        ('Price', 'Price', {'justify': 'right'}, None),
+        ('Rating', 'Rating', {'justify': 'center'}, None),
+        ('URL', 'URL', {'width': 50}, 55),
+    ],
+)
+
+SITES = {site.name: site for site in (EBAY, AMAZON)}
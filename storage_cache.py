@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Cookies and localStorage shared by all scripts, one file per site
+
+The cache lives in ~/.cache/playwright-scripts/storage (override with
+PLAYWRIGHT_CACHE_DIR). Files are written atomically and guarded by a lock
+file, so parallel runs can share them.
+"""
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from urllib.parse import urlparse
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: atomic replace only, no locking
+    fcntl = None
+
+CACHE_DIR = Path(os.environ.get('PLAYWRIGHT_CACHE_DIR', Path.home() / '.cache' / 'playwright-scripts'))
+STATE_DIR = CACHE_DIR / 'storage'
+STATE_TTL = 7 * 24 * 3600
+
+def site_key(url):
+    """Cache key for a URL or bare host name: the host without www."""
+    host = urlparse(url).netloc if '//' in url else url
+    host = host.split('@')[-1].split(':')[0] or 'default'
+    return host[4:] if host.startswith('www.') else host
+
+def state_file(key):
+    safe = key.replace(':', '_').replace('.', '_').replace('/', '_')
+    return STATE_DIR / f"{safe}.json"
+
+@contextmanager
+def locked(path, exclusive=True):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_suffix('.lock'), 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def read_entry(key, ttl=STATE_TTL):
+    path = state_file(key)
+    if not path.exists():
+        return None
+    try:
+        with locked(path, exclusive=False):
+            entry = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get('saved_at', 0) > ttl:
+        return None
+    return entry
+
+def read_state(key, ttl=STATE_TTL):
+    """Returns (storage state for new_context(storage_state=...), consent already given)
+
+    The state is None when nothing is cached or it is older than ttl. Cookies
+    that have expired since they were saved are dropped.
+    """
+    entry = read_entry(key, ttl)
+    if entry is None:
+        return None, False
+    state = entry['state']
+    now = time.time()
+    state['cookies'] = [c for c in state.get('cookies', []) if c.get('expires', -1) < 0 or c['expires'] > now]
+    return state, bool(entry.get('consent'))
+
+def write_state(key, state, consent=True):
+    """Store the result of context.storage_state() for a site"""
+    path = state_file(key)
+    entry = {'saved_at': time.time(), 'consent': consent, 'state': state}
+    with locked(path):
+        write_atomic(path, json.dumps(entry, indent=2))
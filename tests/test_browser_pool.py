@@ -0,0 +1,63 @@
+import os
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault('PLAYWRIGHT_CACHE_DIR', tempfile.mkdtemp(prefix='test-cache-'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from browser_pool import ContextPool  # noqa: E402
+
+class FakeContext:
+    def __init__(self, storage_state):
+        self.storage_state = storage_state
+        self.closed = False
+
+    def on(self, event, handler):
+        pass
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.created = []
+
+    async def new_context(self, storage_state=None):
+        await asyncio.sleep(0)
+        self.created.append(FakeContext(storage_state))
+        return self.created[-1]
+
+def test_acquire_hands_out_warm_contexts_and_refills():
+    async def run():
+        browser = FakeBrowser()
+        pool = ContextPool(browser, size=2)
+        pool.warm_up('ebay.at', 'text-only')
+        await asyncio.sleep(0.01)
+        warm = list(browser.created)
+        context, route_stats, consent = await pool.acquire('ebay.at', 'text-only')
+        assert context is warm[0] and route_stats.profile == 'text-only'
+        await asyncio.sleep(0.01)
+        assert len(browser.created) == 3  # One replacement for the context handed out
+        other, *_ = await pool.acquire('amazon.de', 'full')
+        assert other not in warm  # Each site and profile has contexts of its own
+        await pool.close()
+        return browser
+
+    browser = asyncio.run(run())
+    handed_out = browser.created[0], browser.created[3]
+    assert all(context.closed for context in browser.created if context not in handed_out)
+
+def test_pool_of_size_zero_creates_on_demand():
+    async def run():
+        browser = FakeBrowser()
+        pool = ContextPool(browser, size=0)
+        await pool.acquire('ebay.at', 'text-only')
+        await asyncio.sleep(0.01)
+        return browser
+
+    assert len(asyncio.run(run()).created) == 1
@@ -0,0 +1,120 @@
+import sys
+import csv
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from exporters import Exporter, export_settings, guess_format, record_writer  # noqa: E402
+
+FIELDS = ['Title', 'Price', 'PriceValue']
+ROWS = [
+    {'Title': 'LEGO 42100', 'Price': 'EUR 299,99', 'PriceValue': 299.99},
+    {'Title': 'LEGO "Technic", used', 'Price': 'EUR 1.188,40', 'PriceValue': 1188.4},
+]
+
+def export(path, rows=ROWS, **options):
+    with Exporter(path, fields=FIELDS, **options) as exporter:
+        exporter.write_many(rows)
+    return exporter
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def test_guess_format():
+    assert guess_format('out.csv.gz') == ('csv', 'gzip')
+    assert guess_format('out.ndjson') == ('jsonl', None)
+    assert guess_format('out.arrow.zst') == ('arrow', 'zstd')
+    assert guess_format('out') == ('json', None)
+
+def test_json(tmp_path):
+    path = tmp_path / 'out.json'
+    assert export(path).rows == 2
+    assert json.loads(path.read_text(encoding='utf-8')) == ROWS
+
+def test_jsonl_gzip(tmp_path):
+    path = tmp_path / 'out.jsonl.gz'
+    export(path)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == ROWS
+
+def test_csv(tmp_path):
+    path = tmp_path / 'out.csv'
+    export(path)
+    rows = read_csv(path)
+    assert [row['Title'] for row in rows] == ['LEGO 42100', 'LEGO "Technic", used']
+    assert rows[1]['PriceValue'] == '1188.4'
+
+def test_csv_append_writes_one_header(tmp_path):
+    path = tmp_path / 'out.csv'
+    export(path, ROWS[:1])
+    export(path, ROWS[1:], append=True)
+    assert [row['Title'] for row in read_csv(path)] == [row['Title'] for row in ROWS]
+    assert path.read_text(encoding='utf-8').count('Title,Price,PriceValue') == 1
+
+def test_jsonl_append(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    export(path, ROWS[:1])
+    export(path, ROWS[1:], append=True)
+    assert [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()] == ROWS
+
+def test_json_cannot_append(tmp_path):
+    with pytest.raises(ValueError, match='jsonl'):
+        Exporter(tmp_path / 'out.json', append=True)
+
+@pytest.mark.parametrize('name, expected', [
+    ('out.json', '[]\n'),
+    ('out.jsonl', ''),
+    ('out.csv', 'Title,Price,PriceValue\n'),
+])
+def test_empty_export(tmp_path, name, expected):
+    path = tmp_path / name
+    assert export(path, []).rows == 0
+    assert path.read_text(encoding='utf-8') == expected
+
+def test_record_writer_tags_rows_with_the_query(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    with Exporter(path) as exporter:
+        write = record_writer(exporter)
+        write({'ok': True, 'job': 'lego', 'results': ROWS[:1]})
+        write({'ok': False, 'job': 'duplo', 'results': []})
+    assert json.loads(path.read_text(encoding='utf-8')) == {'Query': 'lego', **ROWS[0]}
+
+@pytest.mark.parametrize('path, compression', [('out.arrow.gz', None), ('out.arrow', 'gzip')])
+def test_arrow_rejects_gzip(tmp_path, path, compression):
+    with pytest.raises(ValueError, match='gzip'):
+        export_settings(path, compression=compression)
+    with pytest.raises(ValueError, match='gzip'):
+        Exporter(tmp_path / path, compression=compression, fields=FIELDS)
+    assert not (tmp_path / path).exists()
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError, match='xml'):
+        Exporter(tmp_path / 'out.json', fmt='xml')
+
+@pytest.mark.parametrize('name, compression', [
+    ('out.parquet', None), ('out.parquet', 'gzip'), ('out.arrow', None), ('out.arrow', 'zstd'),
+])
+def test_arrow_formats(tmp_path, name, compression):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    import pyarrow.parquet
+    path = tmp_path / name
+    export(path, compression=compression)
+    if name.endswith('.parquet'):
+        table = pyarrow.parquet.read_table(path)
+    else:
+        table = pyarrow.ipc.open_file(path).read_all()
+    assert table.to_pylist() == ROWS
+    assert table.schema.field('PriceValue').type == pyarrow.float64()
+
+def test_arrow_empty_export(tmp_path):
+    pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    path = tmp_path / 'out.arrow'
+    export(path, [])
+    assert pyarrow.ipc.open_file(path).read_all().num_rows == 0
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from metrics import RunMetrics  # noqa: E402
+from routing import RouteStats  # noqa: E402
+
+class FakeContext:
+    def __init__(self):
+        self.handlers = []
+
+    def once(self, event, handler):
+        self.handlers.append(handler)
+
+    def close(self):
+        for handler in self.handlers:
+            handler(self)
+
+def test_closed_contexts_are_folded_into_totals():
+    metrics = RunMetrics('test')
+    for _ in range(100):
+        context, stats = FakeContext(), RouteStats('full')
+        metrics.track_requests(context, stats)
+        stats.requests, stats.bytes_loaded = 3, 1000
+        context.close()
+    open_context, open_stats = FakeContext(), RouteStats('full')
+    metrics.track_requests(open_context, open_stats)
+    open_stats.requests, open_stats.bytes_loaded = 1, 10
+    assert len(metrics.route_stats) == 1
+    assert metrics.requests == 301
+    assert metrics.bytes_transferred == 100010
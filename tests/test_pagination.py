@@ -0,0 +1,74 @@
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pagination import fetch_pages, merge_pages  # noqa: E402
+from ranking import Sort, TopK  # noqa: E402
+
+PER_PAGE = 4
+
+class FakePage:
+    async def close(self):
+        pass
+
+class FakeContext:
+    async def new_page(self):
+        return FakePage()
+
+def rows_of(number, overlap=1):
+    """Result page `number` of a site with 5 pages; each page repeats the last rows of the one before"""
+    if number > 5:
+        return []
+    start = (number - 1) * (PER_PAGE - overlap)
+    return [{'URL': f"item{i}", 'Price': 100 - i} for i in range(start, start + PER_PAGE)]
+
+def fetcher(fail=(), requested=None):
+    async def scrape_page(page, number):
+        if requested is not None:
+            requested.append(number)
+        await asyncio.sleep(0)
+        if number in fail:
+            raise TimeoutError(f"page {number}")
+        return rows_of(number)
+    return scrape_page
+
+def urls(rows):
+    return [row['URL'] for row in rows]
+
+def test_merge_drops_repeated_listings_in_page_order():
+    merged = merge_pages({2: rows_of(2), 1: rows_of(1)}, 10)
+    assert urls(merged) == [f"item{i}" for i in range(7)]
+
+def test_first_rows_across_pages_without_duplicates():
+    rows = asyncio.run(fetch_pages(FakeContext(), fetcher(), 10))
+    assert urls(rows) == [f"item{i}" for i in range(10)]
+
+def test_stops_at_the_last_page():
+    requested = []
+    rows = asyncio.run(fetch_pages(FakeContext(), fetcher(requested=requested), 100, max_pages=8))
+    assert urls(rows) == [f"item{i}" for i in range(16)]
+    assert 1 in requested and max(requested) <= 8
+
+def test_later_page_failure_keeps_earlier_rows():
+    failed = {}
+    rows = asyncio.run(fetch_pages(FakeContext(), fetcher(fail={3}), 100, concurrency=1, failed=failed))
+    assert urls(rows) == [f"item{i}" for i in range(7)]
+    assert list(failed) == [3] and isinstance(failed[3], TimeoutError)
+
+def test_first_page_failure_raises():
+    try:
+        asyncio.run(fetch_pages(FakeContext(), fetcher(fail={1}), 10))
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError('a failed first page must fail the search')
+
+def test_ranking_in_site_order_stops_early():
+    # Prices fall with every item, so a descending site order lists the best first
+    requested = []
+    ranking = TopK(3, Sort(lambda row: row['Price'], True, '&sort=price-desc'))
+    rows = asyncio.run(fetch_pages(FakeContext(), fetcher(requested=requested), 3, concurrency=1, ranking=ranking))
+    assert urls(rows) == ['item0', 'item1', 'item2']
+    assert requested == [1]
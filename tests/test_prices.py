@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from prices import Price, parse_price, parse_shipping, total  # noqa: E402
+from bench_price_parser import load_corpus  # noqa: E402
+
+CORPUS = load_corpus()
+
+@pytest.mark.parametrize('kind, text, low, high, currency', CORPUS, ids=[repr(line[1]) for line in CORPUS])
+def test_corpus(kind, text, low, high, currency):
+    if kind == 'shipping':
+        assert parse_shipping(text) == low
+    else:
+        assert parse_price(text) == (low, high, currency)
+
+@pytest.mark.parametrize('text, expected', [
+    ('EUR 97,19 bis EUR 126,34', (97.19, 126.34, 'EUR')),
+    ('EUR 126,34 bis EUR 97,19', (97.19, 126.34, 'EUR')),
+    ('EUR 1.188,40 bis EUR 1544,92', (1188.4, 1544.92, 'EUR')),
+    ('$10 to $20', (10.0, 20.0, 'USD')),
+])
+def test_ranges(text, expected):
+    assert parse_price(text) == expected
+
+@pytest.mark.parametrize('text, expected', [
+    ('EUR 1.299,00', 1299.0),
+    ('EUR 12.500', 12500.0),
+    ('1.234.567,89 €', 1234567.89),
+    ('US $1,299.99', 1299.99),
+    ("CHF 1'299.50", 1299.5),
+    ('1 299,00 €', 1299.0),
+])
+def test_thousands_separators(text, expected):
+    assert parse_price(text).min == expected
+
+def test_euro_fast_path_rejects_bad_grouping():
+    assert parse_price('EUR 1.29,00') != (129.0, 129.0, 'EUR')
+
+@pytest.mark.parametrize('text', ['Kostenloser Versand', 'Versandkostenfrei', 'Free shipping', 'Gratis Lieferung'])
+def test_free_shipping(text):
+    assert parse_shipping(text) == 0.0
+
+@pytest.mark.parametrize('text', ['Lieferung bis 12. Okt', 'Lieferung in 3 Tagen', '2 Stück', 'N/A', ''])
+def test_numbers_without_a_currency_in_words_are_no_price(text):
+    assert parse_price(text) == Price(None, None, None)
+    assert parse_shipping(text) is None
+
+def test_bare_number_is_a_price_without_currency():
+    assert parse_price(' 1299 ') == (1299.0, 1299.0, None)
+    assert parse_shipping('4,99') is None  # A shipping cost needs a currency
+
+def test_shipping_with_currency():
+    assert parse_shipping('+EUR 4,99 Versand') == 4.99
+    assert parse_shipping('+ 4,99 € Versand') == 4.99
+
+def test_total_needs_both():
+    assert total(10.0, 4.99) == 14.99
+    assert total(10.0, None) is None
+    assert total(None, 0.0) is None
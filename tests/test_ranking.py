@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+from operator import itemgetter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ranking import Sort, TopK, rank  # noqa: E402
+from result_cache import cache_key  # noqa: E402
+
+CHEAPEST = Sort(itemgetter('Price'), False)
+DEAREST_IN_SITE_ORDER = Sort(itemgetter('Price'), True, '&sort=price-desc')
+
+def row(url, price):
+    return {'URL': url, 'Price': price}
+
+def urls(rows):
+    return [r['URL'] for r in rows]
+
+def test_rank_orders_best_first_and_keeps_ties_stable():
+    rows = [row('a', 3), row('b', 1), row('c', 2), row('d', 1)]
+    assert urls(rank(rows, CHEAPEST)) == ['b', 'd', 'c', 'a']
+    assert urls(rank(rows, CHEAPEST, 2)) == ['b', 'd']
+
+def test_rows_without_a_score_only_fill_free_places():
+    rows = [row('a', None), row('b', 5), row('c', None), row('d', 4)]
+    assert urls(rank(rows, CHEAPEST)) == ['d', 'b', 'a', 'c']
+    assert urls(rank(rows, CHEAPEST, 3)) == ['d', 'b', 'a']
+    assert urls(rank(rows, CHEAPEST, 2)) == ['d', 'b']
+
+def test_repeated_urls_are_ranked_once():
+    ranking = TopK(5, CHEAPEST)
+    assert ranking.push(row('a', 2))
+    assert not ranking.push(row('a', 1))
+    assert urls(ranking.results()) == ['a']
+
+def test_site_order_stops_once_a_page_cannot_improve_the_ranking():
+    ranking = TopK(2, DEAREST_IN_SITE_ORDER)
+    assert not ranking.add_page([row('a', 10)])  # Not full yet
+    assert ranking.add_page([row('b', 9), row('c', 8)])  # c is no better than the worst kept (b)
+    assert urls(ranking.results()) == ['a', 'b']
+
+def test_site_order_pages_until_the_ranking_is_full():
+    ranking = TopK(3, DEAREST_IN_SITE_ORDER)
+    assert not ranking.add_page([row('a', 10), row('b', 9)])
+    assert ranking.add_page([row('c', 8), row('d', 7)])
+    assert urls(ranking.results()) == ['a', 'b', 'c']
+
+def test_no_early_stop_without_site_order():
+    ranking = TopK(1, CHEAPEST)
+    ranking.add_page([row('a', 1)])
+    assert not ranking.add_page([row('b', 2)])
+
+def test_cache_key_tells_sites_on_the_same_base_url_apart():
+    ebay = cache_key('127.0.0.1', 'lego', sort='price', adapter='ebay')
+    amazon = cache_key('127.0.0.1', 'lego', sort='price', adapter='amazon')
+    assert ebay != amazon
@@ -0,0 +1,27 @@
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import result_cache  # noqa: E402
+from result_cache import ResultCache, cached, revalidate_in_subprocess  # noqa: E402
+
+def test_stale_hit_revalidates_in_the_background(tmp_path):
+    cache = ResultCache(tmp_path / 'results.sqlite3', ttl=0)
+    cache.put('key', [{'URL': 'a'}])
+    started = []
+
+    async def search():
+        raise AssertionError('a cached entry must not be searched in the foreground')
+
+    results = asyncio.run(cached(cache, 'key', search, revalidate=lambda: started.append(True)))
+    assert results == [{'URL': 'a'}]
+    assert started == [True]
+
+def test_background_rerun_only_revalidates(monkeypatch):
+    commands = []
+    monkeypatch.setattr(result_cache.subprocess, 'Popen', lambda command, **options: commands.append(command))
+    revalidate_in_subprocess(['lego', '--export', 'out.csv', '--append'])()
+    assert commands[0][-1] == '--revalidate'
+    assert '--refresh' not in commands[0]
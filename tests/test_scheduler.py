@@ -0,0 +1,115 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scheduler import Scheduler, Blocked, CircuitOpen  # noqa: E402
+from readiness import PhaseTimer, navigate, wait_for_cards  # noqa: E402
+
+URL = 'https://www.ebay.at/sch/i.html?_nkw=lego'
+
+class Response:
+    status = 200
+    headers = {}
+
+class Element:
+    def __init__(self, is_card):
+        self.is_card = is_card
+
+    async def evaluate(self, script, selector):
+        return self.is_card
+
+class Locator:
+    def __init__(self, count):
+        self.matches = count
+
+    async def count(self):
+        return self.matches
+
+class FakePage:
+    """Answers 200 with result cards, a robot check page, no cards at all or cards that never show up"""
+
+    def __init__(self, robot_check=False, empty=False, stalls=False):
+        self.robot_check = robot_check
+        self.empty = empty
+        self.stalls = stalls
+        self.url = ''
+
+    async def goto(self, url, **options):
+        self.url = url
+        return Response()
+
+    def locator(self, selector):
+        return Locator(0 if self.empty else 1)
+
+    async def wait_for_selector(self, selector, **options):
+        if self.stalls or self.empty:
+            raise TimeoutError(f"waiting for {selector}")
+        return Element(not self.robot_check)
+
+async def load(scheduler, page, later_page=False):
+    timer = PhaseTimer()
+    async with scheduler.request(URL):
+        await navigate(page, URL, timer)
+        return await wait_for_cards(page, '.s-item', timer, allow_empty=later_page)
+
+def backoff(scheduler):
+    return scheduler.domain(URL).open_until - time.time()
+
+def test_robot_check_backoff_doubles():
+    async def run():
+        scheduler = Scheduler(rate=100, backoff=10, max_backoff=1000, path=None)
+        backoffs = []
+        for _ in range(4):
+            try:
+                await load(scheduler, FakePage(robot_check=True))
+            except Blocked as e:
+                assert not isinstance(e, CircuitOpen)
+            backoffs.append(backoff(scheduler))
+            scheduler.domain(URL).open_until = 0  # The backoff is over, the next load is the probe
+        return backoffs
+
+    backoffs = asyncio.run(run())
+    assert [round(seconds) for seconds in backoffs] == [10, 20, 40, 80]
+
+def test_circuit_open_until_backoff_then_probe_closes_it():
+    async def run():
+        scheduler = Scheduler(rate=100, backoff=10, path=None)
+        try:
+            await load(scheduler, FakePage(robot_check=True))
+        except Blocked:
+            pass
+        try:
+            await load(scheduler, FakePage(robot_check=False))
+        except CircuitOpen:
+            pass
+        else:
+            raise AssertionError('a load went out while the circuit was open')
+        scheduler.domain(URL).open_until = 0
+        await load(scheduler, FakePage(robot_check=False))
+        return scheduler.domain(URL)
+
+    domain = asyncio.run(run())
+    assert domain.opened == 0
+    assert domain.counts['blocked'] == 1 and domain.counts['ok'] == 1
+
+def test_page_past_the_end_is_a_success():
+    scheduler = Scheduler(rate=100, path=None)
+    assert asyncio.run(load(scheduler, FakePage(empty=True), later_page=True)) is False
+    assert scheduler.domain(URL).counts['ok'] == 1
+
+def test_later_page_timeouts_open_the_circuit():
+    async def run():
+        scheduler = Scheduler(rate=100, backoff=10, path=None)
+        for _ in range(5):
+            try:
+                await load(scheduler, FakePage(stalls=True), later_page=True)
+            except TimeoutError:
+                pass
+        return scheduler.domain(URL)
+
+    domain = asyncio.run(run())
+    assert domain.counts['failed'] == 5
+    assert domain.opened == 1
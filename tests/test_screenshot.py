@@ -0,0 +1,24 @@
+import os
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault('PLAYWRIGHT_CACHE_DIR', tempfile.mkdtemp(prefix='test-cache-'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+pytest.importorskip('playwright')
+
+from screenshot import capture  # noqa: E402
+
+class FailingBrowser:
+    async def new_context(self, **options):
+        raise RuntimeError('Browser has been closed')
+
+def test_context_failure_is_the_urls_error(tmp_path):
+    result = asyncio.run(capture(FailingBrowser(), 'https://example.com', str(tmp_path / 'example.png'), {}))
+    assert result['ok'] is False
+    assert result['error'] == 'RuntimeError: Browser has been closed'
+    assert 'seconds' in result
@@ -0,0 +1,132 @@
+import os
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault('PLAYWRIGHT_CACHE_DIR', tempfile.mkdtemp(prefix='test-cache-'))
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+pytest.importorskip('playwright')
+
+from tracking import TrackingSession, parse_tracking  # noqa: E402
+from bench_tracking_parser import load_samples  # noqa: E402
+
+SAMPLES = load_samples()
+
+AMAZON = {
+    'tracking_number': 'RR123456785AT',
+    'destination_postcode': '1220',
+    'sender': 'Amazon EU S.a.r.l.',
+    'weight_kg': 1.2,
+    'dimensions_cm': [30.0, 20.0, 10.0],
+    'events': [
+        {'timestamp': '2024-03-14T09:12', 'status': 'Item delivered to consignee', 'postal_code': '1220'},
+        {'timestamp': '2024-03-14T07:45', 'status': 'Item is out for delivery', 'postal_code': '1220'},
+        {'timestamp': '2024-03-13T22:10', 'status': 'Item distributed', 'postal_code': '2005'},
+        {'timestamp': '2024-03-12T18:03', 'status': 'The sender has provided electronic shipment information',
+         'postal_code': None},
+    ],
+}
+ZALANDO = {
+    'tracking_number': '1012345678901234567890',
+    'destination_postcode': '1700',
+    'sender': 'Zalando SE',
+    'weight_kg': 0.45,
+    'dimensions_cm': [35.0, 25.0, 4.0],
+    'events': [
+        {'timestamp': '2025-01-02T13:30', 'status': 'Item delivered', 'postal_code': '1700'},
+        {'timestamp': '2025-01-02T08:02', 'status': 'Item is out for delivery', 'postal_code': '1700'},
+        {'timestamp': '2024-12-31T19:55', 'status': 'Item distributed', 'postal_code': '2005'},
+        {'timestamp': '2024-12-30T11:20', 'status': 'The sender has provided electronic shipment information',
+         'postal_code': None},
+    ],
+}
+DHL = {
+    'tracking_number': 'CX987654321DE',
+    'destination_postcode': '8010',
+    'sender': 'DHL Paket GmbH',
+    'weight_kg': 3.75,
+    'dimensions_cm': None,
+    'events': [
+        {'timestamp': '2025-02-05T16:41', 'status': 'Item distributed', 'postal_code': '8010'},
+        {'timestamp': '2025-02-04T09:15', 'status': 'Item arrived in Austria', 'postal_code': '5020'},
+        {'timestamp': '2025-02-03T21:00', 'status': 'The sender has provided electronic shipment information',
+         'postal_code': None},
+    ],
+}
+PRIVATE = {
+    'tracking_number': 'RB000111222AT',
+    'destination_postcode': '6020',
+    'sender': 'Privat',
+    'weight_kg': None,
+    'dimensions_cm': None,
+    'events': [
+        {'timestamp': '2024-09-07T10:05', 'status': 'The sender has provided electronic shipment information',
+         'postal_code': None},
+    ],
+}
+
+# innerText and glued textContent of the same lookup parse the same
+@pytest.mark.parametrize('index, expected', [
+    (0, AMAZON), (1, AMAZON), (2, ZALANDO), (3, ZALANDO), (4, DHL), (5, PRIVATE),
+])
+def test_fixture_samples(index, expected):
+    assert parse_tracking(SAMPLES[index]) == expected
+
+def test_fixture_has_six_samples():
+    assert len(SAMPLES) == 6
+
+@pytest.mark.parametrize('text', [
+    'Tracking number: RR123456785AT\n14 Mar 2024, 09:12\nZugestellt an Filiale 123\nPostal code 1220\n'
+    '13 Mar 2024, 22:10\nItem distributed',
+    'Tracking number:RR123456785AT14 Mar 2024, 09:12Zugestellt an Filiale 123Postal code 1220'
+    '13 Mar 2024, 22:10Item distributed',
+])
+def test_status_keeps_digits_to_the_end_of_the_line(text):
+    first, second = parse_tracking(text)['events']
+    assert first == {'timestamp': '2024-03-14T09:12', 'status': 'Zugestellt an Filiale 123', 'postal_code': '1220'}
+    assert second['status'] == 'Item distributed'
+
+def test_single_digit_day_and_hour():
+    parsed = parse_tracking('Tracking number: RR123456785AT\n2 Jan 2025, 8:02\nItem is out for delivery')
+    assert parsed['events'][0]['timestamp'] == '2025-01-02T08:02'
+
+def test_text_without_events():
+    parsed = parse_tracking('Item details\nTracking number: RR123456785AT')
+    assert parsed['tracking_number'] == 'RR123456785AT'
+    assert parsed['events'] == []
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    def on(self, event, handler):
+        pass
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        raise RuntimeError('Target page, context or browser has been closed')
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def new_context(self, storage_state=None):
+        self.contexts.append(FakeContext())
+        return self.contexts[-1]
+
+def test_failed_start_closes_its_context():
+    browser = FakeBrowser()
+    with pytest.raises(RuntimeError):
+        asyncio.run(TrackingSession(browser, tabs=1).start())
+    assert [context.closed for context in browser.contexts] == [True]
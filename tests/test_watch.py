@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from watch import diff_listings  # noqa: E402
+
+def auction(url, price=10.0, bids='1 Gebot'):
+    return {'URL': url, 'Price': f"EUR {price:.2f}", 'PriceValue': price, 'Bids': bids, 'TimeLeft': '1T 2Std.'}
+
+KNOWN = {url: auction(url) for url in 'abc'}
+
+def ended(changes):
+    return sorted(change['URL'] for change in changes if change['Change'] == 'ended')
+
+def test_listings_out_of_the_window_are_not_ended():
+    rows = [auction(url) for url in 'xyz']
+    assert ended(diff_listings(KNOWN, rows)) == []
+    assert sorted(change['URL'] for change in diff_listings(KNOWN, rows)) == ['x', 'y', 'z']
+
+def test_missing_listings_end_when_every_result_was_read():
+    assert ended(diff_listings(KNOWN, [auction('a')], complete=True)) == ['b', 'c']
+
+def test_missing_listings_end_once_their_time_ran_out():
+    ends = {'a': 100.0, 'b': 300.0}
+    assert ended(diff_listings(KNOWN, [], ends=ends, now=200.0)) == ['a']
+
+def test_listing_still_there_is_not_ended():
+    assert ended(diff_listings(KNOWN, [auction('a', bids='2 Gebote')], ends={'a': 0.0}, now=1.0)) == []
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""post.at tracking: one browser session for many lookups, and a parser for the result text"""
+import re
+import asyncio
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from routing import apply_profile
+from readiness import PhaseTimer
+from scheduler import goto
+from metrics import timed
+from storage_cache import site_key, read_state, write_state
+
+POST_URL = "https://www.post.at/en"
+TRACKING_TABS = 3
+
+MONTHS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+_MONTH = '|'.join(MONTHS)
+MONTH_NUMBERS = {name: f"{number:02d}" for name, number in MONTHS.items()}
+_NUMBER = r'[0-9]+(?:[.,][0-9]+)?'
+_S = r'[\ \n]*'
+# Lookahead for a timestamp that starts right here ("14 Mar 2024,")
+_STAMP_AHEAD = rf'[0-9]?\ (?:{_MONTH})\ [0-9]{{4}},'
+
+# The result text comes either as innerText (one field per line) or as the
+# glued textContent ("...Postal code 122014 Mar 2024, 07:45Item is...").
+# Every event is found from the "," of its timestamp: a literal the regex
+# engine jumps to, with the date read back from there by a lookbehind. The
+# status runs to the end of its line, "Postal code" or the next timestamp.
+# The header is matched once from the start, in the order the page shows it.
+# ASCII classes instead of \d and \s keep the character tests to a bitmap.
+EVENT_RE = re.compile(rf'''
+    ,(?<=(?:([0-9])|[^0-9])([0-9])\ ({_MONTH})\ ([0-9]{{4}}),)\ ([0-9])?([0-9]):([0-9][0-9]){_S}
+    ([^\n0-9P]*(?:(?:[0-9](?!{_STAMP_AHEAD})|P(?!ostal\ code))[^\n0-9P]*)*)
+    (?:{_S}Postal\ code{_S}([0-9]{{4,5}}?)(?=[^0-9]|\Z|[0-9]{_STAMP_AHEAD}))?
+''', re.VERBOSE)
+HEADER_RE = re.compile(rf'''
+    (?:Item\ details)?{_S}
+    (?:Tracking\ number:{_S}([A-Z][A-Z][0-9]{{9}}[A-Z][A-Z]|[0-9]{{10,30}}){_S})?
+    (?:Show\ sender{_S})?
+    (?:Destination\ postcode:{_S}([0-9]{{4,5}}){_S})?
+    (?:Sender:{_S}((?:[^\n0-9WD]+|[0-9](?!{_STAMP_AHEAD})|W(?!eight)|D(?!imensions))*))?{_S}
+    (?:Weight{_S}({_NUMBER}){_S}kg{_S})?
+    (?:Dimensions{_S}L?{_S}({_NUMBER}){_S}(?:cm)?{_S}[Bx]?{_S}({_NUMBER}){_S}(?:cm)?{_S}[Hx]?{_S}({_NUMBER}){_S}cm)?
+''', re.VERBOSE)
+
+def to_float(text):
+    return float(text.replace(',', '.'))
+
+def parse_tracking(text):
+    """Structured tracking details: number, destination, sender, weight, dimensions and events (newest first)"""
+    number, destination, sender, weight, length, width, height = HEADER_RE.match(text).groups()
+    return {
+        'tracking_number': number,
+        'destination_postcode': destination,
+        'sender': sender.rstrip() or None if sender else None,
+        'weight_kg': to_float(weight) if weight else None,
+        'dimensions_cm': [to_float(length), to_float(width), to_float(height)] if height else None,
+        'events': [
+            {'timestamp': f"{year}-{MONTH_NUMBERS[month]}-{tens or '0'}{day}T{hour_tens or '0'}{hour}:{minute}",
+             'status': status.rstrip(), 'postal_code': postal or None}
+            for tens, day, month, year, hour_tens, hour, minute, status, postal in EVENT_RE.findall(text)],
+    }
+
+def parse_many(texts):
+    return [parse_tracking(text) for text in texts]
+
+def format_tracking(parsed):
+    """Readable lines for a parsed lookup"""
+    lines = [f"Tracking number: {parsed['tracking_number']}"]
+    if parsed['destination_postcode']:
+        lines.append(f"  Destination postcode: {parsed['destination_postcode']}")
+    if parsed['sender']:
+        lines.append(f"  Sender: {parsed['sender']}")
+    if parsed['weight_kg'] is not None:
+        lines.append(f"  Weight: {parsed['weight_kg']:g} kg")
+    if parsed['dimensions_cm']:
+        lines.append("  Dimensions: " + ' x '.join(f"{d:g}" for d in parsed['dimensions_cm']) + ' cm')
+    for event in parsed['events']:
+        postal = f"  (Postal code {event['postal_code']})" if event['postal_code'] else ''
+        lines.append(f"  {event['timestamp'].replace('T', ' ')}  {event['status']}{postal}")
+    return lines
+
+class TrackingSession:
+    """A consent-accepted post.at session with a few tabs that lookups are spread over
+
+        async with TrackingSession(browser, tabs=3) as session:
+            details = await session.track('RR123456785AT')
+    """
+
+    def __init__(self, browser, tabs=TRACKING_TABS, metrics=None, url=POST_URL):
+        self.browser = browser
+        self.url = url
+        self.tab_count = tabs
+        self.metrics = metrics
+        self.context = None
+        self.tabs = asyncio.Queue()
+        self.used = set()
+
+    async def start(self):
+        state_key = site_key(self.url)
+        state, consent = read_state(state_key)
+        try:
+            with timed(self.metrics, 'context'):
+                self.context = await self.browser.new_context(storage_state=state)
+                route_stats = await apply_profile(self.context, 'no-media')
+            if self.metrics:
+                self.metrics.track_requests(self.context, route_stats)
+                await self.metrics.start_trace(self.context)
+
+            first = await self.context.new_page()
+            with timed(self.metrics, 'navigation'):
+                await goto(first, self.url)
+            if not consent:
+                with timed(self.metrics, 'consent'):
+                    await first.get_by_role("button", name="Use website with required").click()
+                    write_state(state_key, await self.context.storage_state())
+            self.tabs.put_nowait(first)
+
+            async def open_tab():
+                page = await self.context.new_page()
+                await goto(page, self.url)
+                self.tabs.put_nowait(page)
+
+            await asyncio.gather(*(open_tab() for _ in range(self.tab_count - 1)))
+        except BaseException:
+            await self.close()  # a half started session would keep its context open
+            raise
+        return self
+
+    async def close(self):
+        if self.context:
+            if self.metrics:
+                await self.metrics.stop_trace(self.context, 'post')
+            await self.context.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def details_text(self, trackingNumber):
+        """Raw innerText of the tracking details for one number"""
+        page = await self.tabs.get()
+        try:
+            timer = PhaseTimer(trackingNumber, self.metrics)
+            if page in self.used:
+                await goto(page, self.url)
+                timer.mark('navigate')
+            self.used.add(page)
+
+            field = page.get_by_label("", exact=True)
+            await field.click()
+            await field.fill(trackingNumber)
+            await page.get_by_role("button", name="Submit query").click()
+            try:
+                await page.get_by_role("button", name="Close dialogue box").click(timeout=3000)
+            except PlaywrightTimeoutError:
+                pass  # Only shown on some lookups
+            timer.mark('query')
+
+            details = page.get_by_label("Ergebnis Sendungsverfolgung").locator("div.tracking__details")
+            await details.first.wait_for()
+            timer.mark('first-card')
+            text = "\n".join(await details.all_inner_texts())
+            timer.mark('extract')
+            if self.metrics:
+                await self.metrics.sample_memory(page)
+            return text
+        finally:
+            self.tabs.put_nowait(page)
+
+    async def track(self, trackingNumber):
+        return parse_tracking(await self.details_text(trackingNumber))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import json
+import time
+import sqlite3
+from storage_cache import CACHE_DIR
+from result_cache import normalize_query
+
+WATCH_DB = CACHE_DIR / 'watch.sqlite3'
+WATCH_INTERVAL = 60
+
+def watch_key(site, query, auction_only=False):
+    return json.dumps([site, normalize_query(query), bool(auction_only)])
+
+def is_auction(row):
+    return row.get('Bids', 'N/A') != 'N/A' or row.get('TimeLeft', 'N/A') != 'N/A'
+
+def diff_listings(known, rows, complete=False, ends=None, now=None):
+    """Changes between the stored listings (URL -> row) and the rows of this cycle
+
+    Every change is the current row plus 'Change' (new, price, bids or
+    ended) and 'Old' (the previous value, if any). A known auction that is
+    missing only counts as ended when there is evidence for it: the cycle
+    read every result of the search (complete=True), or its end time in
+    ends (URL -> time.time() it ends) has passed. A listing that merely
+    dropped out of the rows read is not ended.
+    """
+    now = time.time() if now is None else now
+    ends = ends or {}
+    changes = []
+    current = set()
+    for row in rows:
+        if row['URL'] == 'N/A':
+            continue
+        current.add(row['URL'])
+        old = known.get(row['URL'])
+        if old is None:
+            changes.append({**row, 'Change': 'new', 'Old': None})
+            continue
+        if row['PriceValue'] != old['PriceValue']:
+            changes.append({**row, 'Change': 'price', 'Old': old['Price']})
+        if row['Bids'] != old['Bids']:
+            changes.append({**row, 'Change': 'bids', 'Old': old['Bids']})
+
+    for url, old in known.items():
+        if url in current or not is_auction(old):
+            continue
+        if complete or ends.get(url, float('inf')) <= now:
+            changes.append({**old, 'Change': 'ended', 'Old': None})
+    return changes
+
+class WatchStore:
+    """Listings seen so far per watched search, keyed by their cleaned URL"""
+
+    def __init__(self, path=WATCH_DB):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS listings (
+            watch TEXT NOT NULL,
+            url TEXT NOT NULL,
+            data TEXT NOT NULL,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            ended INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (watch, url)
+        )''')
+
+    def load(self, watch):
+        """Listings of a watch that have not ended, URL -> row"""
+        rows = self.db.execute('SELECT url, data FROM listings WHERE watch = ? AND ended = 0', (watch,))
+        return {url: json.loads(data) for url, data in rows}
+
+    def last_seen(self, watch):
+        """time.time() each listing of a watch that has not ended was last seen, URL -> seconds"""
+        rows = self.db.execute('SELECT url, last_seen FROM listings WHERE watch = ? AND ended = 0', (watch,))
+        return dict(rows)
+
+    def update(self, watch, rows, ended_urls=()):
+        now = time.time()
+        with self.db:
+            self.db.execute('BEGIN')
+            for row in rows:
+                if row['URL'] == 'N/A':
+                    continue
+                self.db.execute('''INSERT INTO listings (watch, url, data, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)
+                                   ON CONFLICT (watch, url) DO UPDATE SET data = excluded.data,
+                                   last_seen = excluded.last_seen, ended = 0''',
+                                (watch, row['URL'], json.dumps(row, ensure_ascii=False), now, now))
+            self.db.executemany('UPDATE listings SET ended = 1 WHERE watch = ? AND url = ?',
+                                [(watch, url) for url in ended_urls])
+
+    def close(self):
+        self.db.close()